@@ -1,34 +1,24 @@
 import streamlit as st
 import time
-import base64
-import json
 import hashlib
-from PIL import Image
+from assets import get_asset_url
+import chat_store
+import user_store
+from user_store import get_user, create_user
 
 # =================================================================================================
 # HELPER FUNCTIONS
 # =================================================================================================
-def get_base64_of_bin_file(bin_file):
-    try:
-        with open(bin_file, 'rb') as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
-    except FileNotFoundError:
-        return None
-
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def load_users():
-    try:
-        with open("users.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-
-def save_users(users_data):
-    with open("users.json", "w") as f:
-        json.dump(users_data, f, indent=4)
+@st.cache_resource(show_spinner=False)
+def init_storage():
+    # Runs once per process: moves accounts out of the old users.json file into the configured
+    # storage backend (see storage.py) if it is still around, and deletes Pebble transcripts that a
+    # crash or restart left behind.
+    user_store.migrate_from_json()
+    chat_store.sweep_transient_chats()
 
 # =================================================================================================
 # PAGE CONFIGURATION & SESSION STATE
@@ -40,19 +30,21 @@ if 'logged_in' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state.username = ""
 
+init_storage()
+
 # =================================================================================================
 # LOGIN / SPLASH SCREEN VIEW
 # =================================================================================================
 if not st.session_state.logged_in:
     
-    bg_image_base64 = get_base64_of_bin_file("bg.gif")
+    bg_image_url = get_asset_url("bg.gif", max_width=550, quality=50)
     
     # --- Custom CSS for the splash/login screen ---
     st.markdown(f"""
     <style>
         [data-testid="stSidebar"], header, footer {{ visibility: hidden; }}
         .stApp {{
-            background-image: linear-gradient(rgba(0, 4, 40, 0.7), rgba(0, 4, 40, 0.7)), url("data:image/jpeg;base64,{bg_image_base64 if bg_image_base64 else ''}");
+            background-image: linear-gradient(rgba(0, 4, 40, 0.7), rgba(0, 4, 40, 0.7)), url("{bg_image_url or ''}");
             background-size: cover; background-position: center;
         }}
         .main .block-container {{ padding-top: 5vh; }}
@@ -65,9 +57,9 @@ if not st.session_state.logged_in:
     col_agent, col_auth = st.columns([1, 2])
 
     with col_agent:
-        agent_image_base64 = get_base64_of_bin_file("AiAgent.png")
-        if agent_image_base64:
-            st.markdown(f'<div style="text-align: center; padding-top: 50px;"><img src="data:image/png;base64,{agent_image_base64}" alt="waving agent" width="300"></div>', unsafe_allow_html=True)
+        agent_image_url = get_asset_url("AiAgent.png", max_width=600)
+        if agent_image_url:
+            st.markdown(f'<div style="text-align: center; padding-top: 50px;"><img src="{agent_image_url}" alt="waving agent" width="300"></div>', unsafe_allow_html=True)
         else:
             st.warning("`AiAgent.png` not found.")
 
@@ -82,8 +74,8 @@ if not st.session_state.logged_in:
                 username = st.text_input("Username")
                 password = st.text_input("Password", type="password")
                 if st.form_submit_button("Login"):
-                    users = load_users()
-                    if username in users and users[username]['password_hash'] == hash_password(password):
+                    user = get_user(username)
+                    if user and user['password_hash'] == hash_password(password):
                         st.session_state.logged_in = True
                         st.session_state.username = username
                         st.success("Logged in successfully!")
@@ -98,14 +90,13 @@ if not st.session_state.logged_in:
                 new_password = st.text_input("Choose a Password", type="password")
                 mobile_number = st.text_input("Mobile Number (for notifications)", placeholder="+91 1234567890")
                 if st.form_submit_button("Sign Up"):
-                    users = load_users()
-                    if new_username in users:
+                    if get_user(new_username):
                         st.error("Username already exists.")
                     elif not all([new_username, new_password, mobile_number]):
                         st.warning("Please fill in all fields.")
+                    elif not create_user(new_username, hash_password(new_password), mobile_number):
+                        st.error("Username already exists.")
                     else:
-                        users[new_username] = {'password_hash': hash_password(new_password), 'mobile_number': mobile_number}
-                        save_users(users)
                         st.session_state.logged_in = True
                         st.session_state.username = new_username
                         st.success("Account created! You are now logged in.")
@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import streamlit as st
+
+from instrumentation import instrumented
+
+# =================================================================================================
+# STATIC ASSET PIPELINE
+# =================================================================================================
+# Images are recompressed once into content-hashed files under static/cache/ and served by URL
+# through Streamlit's static file serving (see [server] enableStaticServing in .streamlit/config.toml),
+# so pages send a short URL instead of megabytes of inline base64 on every rerun. PIL.Image is only
+# imported when an image is first built.
+#
+# Building an image can take seconds (bg.gif becomes an animated WebP), so the local images pages
+# ask for (PREBUILT_ASSETS and the scene-theme images) are built ahead of time too. Images hosted
+# elsewhere (REMOTE_ASSETS) are vendored into the cache, so browsers never fetch them from third
+# parties and no page waits on a download. Do both when deploying:
+#
+#     python assets.py
+#
+# A page that finds one missing shows its fallback and starts the download on a background thread,
+# tried again at most every REMOTE_RETRY_SECONDS if it fails.
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_ROOT, "static")
+ASSET_CACHE_DIR = os.path.join(STATIC_DIR, "cache")
+STATIC_URL_PREFIX = "app/static"
+REMOTE_ASSET_DIR = os.path.join(ASSET_CACHE_DIR, "remote")
+REMOTE_TIMEOUT_SECONDS = 5
+REMOTE_RETRY_SECONDS = 300
+PEBBLE_ICON_URL = "https://cdn-icons-png.flaticon.com/512/3653/3653195.png"
+REMOTE_ASSETS = [PEBBLE_ICON_URL]
+# (path, max_width, quality) exactly as Home.py's splash screen requests them.
+PREBUILT_ASSETS = [("bg.gif", 550, 50), ("AiAgent.png", 600, 70)]
+THEME_IMAGE_WIDTH = 1280
+
+_vendor_lock = threading.Lock()
+_vendor_attempts = {}  # url -> time.monotonic() of the last background download
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(APP_ROOT, path)
+
+
+def _content_hash(path, *params):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(repr(params).encode())
+    return digest.hexdigest()[:12]
+
+
+def _fit(image, max_width):
+    from PIL import Image
+
+    if max_width and image.width > max_width:
+        height = round(image.height * max_width / image.width)
+        image = image.resize((max_width, height), Image.LANCZOS)
+    return image
+
+
+def _optimize_image(src, dest, max_width, quality):
+    """
+    Writes a resized WebP copy of `src` to `dest`. Animated GIFs stay animated.
+    """
+    from PIL import Image, ImageSequence
+
+    with Image.open(src) as im:
+        if getattr(im, "is_animated", False):
+            frames, durations = [], []
+            for frame in ImageSequence.Iterator(im):
+                durations.append(frame.info.get("duration", im.info.get("duration", 100)))
+                frames.append(_fit(frame.convert("RGBA"), max_width))
+            frames[0].save(dest, format="WEBP", save_all=True, append_images=frames[1:],
+                           duration=durations, loop=0, quality=quality, method=4)
+        else:
+            _fit(im.convert("RGBA"), max_width).save(dest, format="WEBP", quality=quality, method=6)
+
+
+@st.cache_resource(show_spinner=False)
+def _build_asset(path, mtime, max_width, quality):
+    # `mtime` is only part of the cache key, so an edited source file gets rebuilt.
+    stem, ext = os.path.splitext(os.path.basename(path))
+    digest = _content_hash(path, max_width, quality)
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    name = f"{stem}.{digest}.webp"
+    dest = os.path.join(ASSET_CACHE_DIR, name)
+    if not os.path.exists(dest):
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        try:
+            _optimize_image(path, tmp, max_width, quality)
+            os.replace(tmp, dest)
+        except (OSError, ValueError):
+            # Pillow built without WebP support: serve the original bytes under a hashed name.
+            name = f"{stem}.{digest}{ext}"
+            shutil.copyfile(path, os.path.join(ASSET_CACHE_DIR, name))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return f"{STATIC_URL_PREFIX}/cache/{name}"
+
+
+@instrumented("asset.load")
+def get_asset_url(path, max_width=None, quality=70):
+    """
+    Returns a static URL for an optimized copy of the image at `path`, or None if it is missing.
+    """
+    path = _resolve(path)
+    try:
+        mtime = os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+    return _build_asset(path, mtime, max_width, quality)
+
+
+def remote_asset_path(url):
+    ext = os.path.splitext(urllib.parse.urlparse(url).path)[1] or ".img"
+    return os.path.join(REMOTE_ASSET_DIR, hashlib.sha256(url.encode()).hexdigest()[:12] + ext)
+
+
+def vendor(url, timeout=REMOTE_TIMEOUT_SECONDS):
+    """
+    Downloads `url` into the asset cache unless it is already there; returns the local path, or
+    None if it cannot be fetched.
+    """
+    path = remote_asset_path(url)
+    if os.path.exists(path):
+        return path
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            data = response.read()
+    except (OSError, ValueError):
+        return None
+    os.makedirs(REMOTE_ASSET_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def _vendor_in_background(url):
+    now = time.monotonic()
+    with _vendor_lock:
+        last = _vendor_attempts.get(url)
+        if last is not None and now - last < REMOTE_RETRY_SECONDS:
+            return
+        _vendor_attempts[url] = now
+    threading.Thread(target=vendor, args=(url,), name="asset-vendor", daemon=True).start()
+
+
+def get_remote_asset_url(url, max_width=None, quality=70):
+    """
+    Like get_asset_url, for an image hosted elsewhere that has been vendored. Returns None (and
+    starts vendoring it in the background) if it has not been yet.
+    """
+    asset_url = get_asset_url(remote_asset_path(url), max_width, quality)
+    if asset_url is None:
+        _vendor_in_background(url)
+    return asset_url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local images pages use and download the images in "
+                                                 "REMOTE_ASSETS into the asset cache.")
+    parser.parse_args(argv)
+    from page_shell import SCENE_THEMES
+
+    failed = 0
+    images = PREBUILT_ASSETS + [(theme["image"], THEME_IMAGE_WIDTH, 70) for theme in SCENE_THEMES.values()
+                                if theme and theme.get("image")]
+    for path, max_width, quality in images:
+        start = time.perf_counter()
+        url = get_asset_url(path, max_width=max_width, quality=quality)
+        print(f"{path} -> {url or 'MISSING'} ({time.perf_counter() - start:.1f}s)")
+        failed += url is None
+    for url in REMOTE_ASSETS:
+        path = vendor(url, timeout=30)
+        print(f"{url} -> {path or 'FAILED'}")
+        failed += path is None
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import llm_gateway
+from response_cache import cache_key
+
+# =================================================================================================
+# AI ASSISTANT CONFIGURATION
+# =================================================================================================
+# The doubt-solving assistant's model and persona, shared by the AI Tools page and the offline
+# batch tool (batch_answers.py) so that answers precomputed in bulk land under exactly the cache
+# keys live sessions look up.
+
+MODEL_NAME = 'gemini-1.5-flash-latest'
+ASSISTANT_PERSONA = """
+You are the doubt-solving assistant of 'AI Study Buddy', a friendly tutor for students.
+- Explain concepts clearly and step by step, starting from what the student already knows.
+- Use short examples, and show the working for maths and science problems.
+- If a question is ambiguous, state your assumption before answering.
+- Encourage the student to try the next step themselves when it helps them learn.
+"""
+
+
+def get_assistant_model(api_key):
+    return llm_gateway.get_model(api_key, MODEL_NAME, system_instruction=ASSISTANT_PERSONA)
+
+
+def assistant_cache_key(prompt, context):
+    """
+    The response cache key for `prompt` asked after the chat messages in `context`.
+    """
+    return cache_key(prompt, context, MODEL_NAME + ASSISTANT_PERSONA)
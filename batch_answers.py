@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from assistant import assistant_cache_key, get_assistant_model
+from llm import to_gemini_history
+from llm_gateway import GatewayError, get_gateway
+from response_cache import ResponseCache
+
+# =================================================================================================
+# OFFLINE BATCH ANSWERS
+# =================================================================================================
+# Precomputes the assistant's answers to a list of common questions (e.g. before exam season) and
+# stores them in the response cache, so the first student to ask gets a cached answer instead of
+# a live Gemini call. Prompts come from a JSONL file, one object per line with the question in
+# "prompt" (or "question" / "body") and optionally an "id" and the chat "context" it follows:
+#
+#     python batch_answers.py prompts.jsonl [--concurrency 4] [--out prompts.answers.jsonl]
+#     python batch_answers.py prompts.jsonl --fake-model     # no API key or network needed
+#
+# Every result is appended to the output file as soon as it is ready. The output doubles as the
+# checkpoint: a rerun skips prompts already answered there and retries the ones that failed.
+# Calls go through the shared LLM gateway, so LLM_RATE_PER_MINUTE and LLM_BURST cap the request
+# rate whatever the concurrency.
+
+PROMPT_FIELDS = ("prompt", "question", "body")
+DONE_STATUSES = ("answered", "cached")
+DEFAULT_CONCURRENCY = 4
+DEFAULT_ATTEMPTS = 3
+RETRY_PAUSE_SECONDS = 5.0
+
+
+def read_prompts(path, prompt_field=None):
+    """
+    Returns [(id, prompt, context)] from a JSONL file. Lines without an id are numbered by line.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"line {number}: not valid JSON, skipped", file=sys.stderr)
+                continue
+            fields = [prompt_field] if prompt_field else PROMPT_FIELDS
+            prompt = next((record[f] for f in fields if isinstance(record.get(f), str) and record[f].strip()), None)
+            if prompt is None:
+                print(f"line {number}: no prompt found, skipped", file=sys.stderr)
+                continue
+            item_id = str(record.get("id", record.get("request_id", f"line-{number}")))
+            items.append((item_id, prompt, record.get("context") or []))
+    return items
+
+
+def read_checkpoint(out_path):
+    """
+    Returns the ids already answered in an earlier run's output file.
+    """
+    done = set()
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line torn by an interrupted run.
+                if record.get("status") in DONE_STATUSES:
+                    done.add(record["id"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def terminate_torn_line(out_path):
+    # An interrupted run can leave half a line behind; the next result must start on a line of its own.
+    try:
+        with open(out_path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def generate_answer(model, prompt, context, gateway, attempts=DEFAULT_ATTEMPTS):
+    """
+    Returns (answer text, latency in seconds). The gateway already retries transient API errors;
+    being rate limited or finding the circuit open is waited out here as well, since a batch has
+    no student waiting on it.
+    """
+    contents = to_gemini_history(context) + [{"role": "user", "parts": [prompt]}]
+    for attempt in range(attempts):
+        start = time.perf_counter()
+        try:
+            response = gateway.call(model.generate_content, contents, request_options={"timeout": gateway.deadline})
+            return response.text, time.perf_counter() - start
+        except GatewayError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(RETRY_PAUSE_SECONDS * (attempt + 1))
+
+
+def answer_item(item, model, cache, gateway, attempts):
+    item_id, prompt, context = item
+    key = assistant_cache_key(prompt, context)
+    result = {"id": item_id, "key": key, "prompt": prompt}
+    reply = cache.lookup(key)
+    if reply is not None:
+        return dict(result, status="cached", response=reply)
+    try:
+        reply, latency = generate_answer(model, prompt, context, gateway, attempts)
+    except Exception as e:
+        cache.abandon(key)
+        return dict(result, status="error", error=f"{type(e).__name__}: {e}")
+    if not reply:
+        cache.abandon(key)
+        return dict(result, status="error", error="empty answer")
+    cache.fulfil(key, reply, latency)
+    return dict(result, status="answered", response=reply, latency=round(latency, 3))
+
+
+def run_batch(items, model, cache, out, concurrency=DEFAULT_CONCURRENCY, attempts=DEFAULT_ATTEMPTS,
+              gateway=None, done=(), progress=None):
+    """
+    Answers `items` (see read_prompts) with at most `concurrency` calls in flight, writing one
+    JSON line per result to the file object `out` as each finishes. Items whose id is in `done`,
+    and repeats of a question already queued, are skipped. Returns counts per status.
+    """
+    gateway = gateway or get_gateway()
+    counts = {"answered": 0, "cached": 0, "error": 0, "skipped": 0, "duplicate": 0}
+    queued_keys = set()
+    pending = set()
+    finished = 0
+
+    def collect(futures):
+        nonlocal finished
+        for future in futures:
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[result["status"]] += 1
+            finished += 1
+            if progress:
+                progress(finished, result)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-answers") as executor:
+        for item in items:
+            if item[0] in done:
+                counts["skipped"] += 1
+                continue
+            key = assistant_cache_key(item[1], item[2])
+            if key in queued_keys:
+                counts["duplicate"] += 1
+                continue
+            queued_keys.add(key)
+            # Only a couple of items per worker are queued at a time, so long files stream through.
+            while len(pending) >= 2 * concurrency:
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(completed)
+            pending.add(executor.submit(answer_item, item, model, cache, gateway, attempts))
+        while pending:
+            completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(completed)
+    return counts
+
+
+def load_model(fake=False, fake_latency=0.5):
+    if fake:
+        from fake_gemini import FakeModel
+        return FakeModel(latency=fake_latency)
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        import streamlit as st
+        api_key = st.secrets["GEMINI_API_KEY"]  # .streamlit/secrets.toml, as used by the app
+    return get_assistant_model(api_key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute assistant answers for a JSONL file of prompts.")
+    parser.add_argument("prompts", help="JSONL file with one prompt object per line")
+    parser.add_argument("--out", help="results and checkpoint file (default: <prompts>.answers.jsonl)")
+    parser.add_argument("--field", help="JSON field holding the prompt (default: prompt, question or body)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="calls in flight at once")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS, help="tries per prompt when rate limited")
+    parser.add_argument("--fake-model", action="store_true", help="answer with the local fake model")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="seconds per fake answer")
+    args = parser.parse_args(argv)
+
+    out_path = args.out or os.path.splitext(args.prompts)[0] + ".answers.jsonl"
+    items = read_prompts(args.prompts, args.field)
+    done = read_checkpoint(out_path)
+    model = load_model(args.fake_model, args.fake_latency)
+    cache = ResponseCache()
+    total = len({assistant_cache_key(prompt, context) for item_id, prompt, context in items if item_id not in done})
+    print(f"{len(items)} prompts, {sum(item[0] in done for item in items)} already answered in {out_path}",
+          file=sys.stderr)
+
+    def progress(finished, result):
+        detail = f"{result['latency']:.2f}s" if "latency" in result else result.get("error", "")
+        print(f"[{finished}/{total}] {result['id']}: {result['status']} {detail}", file=sys.stderr)
+
+    start = time.perf_counter()
+    terminate_torn_line(out_path)
+    with open(out_path, "a", encoding="utf-8") as out:
+        counts = run_batch(items, model, cache, out, args.concurrency, args.attempts, done=done, progress=progress)
+    print(f"done in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{n} {status}" for status, n in counts.items()),
+          file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Headless benchmark of Home.py and both pages, driven through Streamlit's AppTest with a fake
+Gemini model and Calendar service. For each data size it scripts a login, a new chat, a run of
+messages, switching between saved chats, planner updates and a Mental Health conversation, then
+reports p50/p95 rerun time, approximate bytes sent per rerun, memory per session and disk writes
+for chat saves. Run from the repository root:
+
+    python benchmarks/app_bench.py [--messages 10 50] [--chats 10 200] [--sessions 3] [--out app_bench.json]
+
+Each (messages, chats) combination runs in its own subprocess inside a scratch directory, so
+memory numbers are not polluted by earlier runs.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOME = os.path.join(ROOT, "Home.py")
+AI_TOOLS = os.path.join(ROOT, "pages", "1_🤖_AI_Tools.py")
+MENTAL_HEALTH = os.path.join(ROOT, "pages", "2_💬_Mental_Health_Chatbot.py")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def bytes_written():
+    try:
+        with open("/proc/self/io") as f:
+            return int(next(line for line in f if line.startswith("wchar")).split()[1])
+    except (OSError, StopIteration):
+        return None
+
+
+def tree_bytes(node):
+    # Serialized size of every element proto in the rendered tree: what a full rerun sends.
+    size = node.proto.ByteSize() if getattr(node, "proto", None) is not None else 0
+    for child in getattr(node, "children", {}).values():
+        size += tree_bytes(child)
+    return size
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def run(self, step, action):
+        start = time.perf_counter()
+        at = action()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+        self.samples.setdefault(step, []).append({"seconds": elapsed, "bytes": tree_bytes(at._tree)})
+        return at
+
+    def summary(self):
+        result = {}
+        for step, samples in self.samples.items():
+            seconds = [s["seconds"] * 1000 for s in samples]
+            result[step] = {"reruns": len(samples), "p50_ms": statistics.median(seconds),
+                            "p95_ms": percentile(seconds, 95),
+                            "bytes_per_rerun": statistics.mean(s["bytes"] for s in samples)}
+        return result
+
+
+def button(at, label=None, key=None):
+    for widget in at.button:
+        if (label is not None and widget.label == label) or (key is not None and widget.key == key):
+            return widget
+    raise LookupError(label or key)
+
+
+def seed(username, chats, messages_per_chat):
+    import hashlib
+    import chat_store
+    import user_store
+
+    user_store.create_user(username, hashlib.sha256(b"bench-password").hexdigest(), "+91 0000000000")
+    for i in range(chats):
+        chat_id = f"chat_20250101_{i:06d}"
+        chat_store.create_chat(username, chat_id)
+        chat_store.append_messages(username, chat_id, [
+            {"role": "user" if j % 2 == 0 else "model", "parts": f"seeded message {j} " * 10}
+            for j in range(messages_per_chat)])
+
+
+def run_session(recorder, username, messages, switches):
+    from streamlit.testing.v1 import AppTest
+
+    # Login through the Home page form.
+    home = AppTest.from_file(HOME, default_timeout=60)
+    recorder.run("home_first_load", home.run)
+    home.text_input[0].set_value(username)
+    home.text_input[1].set_value("bench-password")
+    recorder.run("login", button(home, label="Login").click().run)
+
+    tools = AppTest.from_file(AI_TOOLS, default_timeout=60)
+    tools.secrets["GEMINI_API_KEY"] = "fake"
+    tools.session_state["logged_in"] = True
+    tools.session_state["username"] = username
+    recorder.run("tools_first_load", tools.run)
+    recorder.run("new_chat", button(tools, label="➕ New Chat").click().run)
+
+    chat_bytes_before = bytes_written()
+    for i in range(messages):
+        recorder.run("chat_message", tools.chat_input[0].set_value(f"Question {i} from {username}?").run)
+    chat_bytes = (bytes_written() - chat_bytes_before) if chat_bytes_before is not None else None
+
+    load_buttons = [b for b in tools.button if (b.key or "").startswith("load_")]
+    for b in load_buttons[:switches]:
+        recorder.run("switch_chat", button(tools, key=b.key).click().run)
+
+    for i in range(3):
+        next(w for w in tools.text_input if w.label == "Enter Subject").set_value(f"Subject {i}")
+        recorder.run("planner_add", button(tools, label="➕ Add to Plan & Calendar").click().run)
+    for box in list(tools.checkbox)[:3]:
+        recorder.run("planner_toggle", box.check().run)
+    recorder.run("tools_idle_rerun", tools.run)
+
+    pebble = AppTest.from_file(MENTAL_HEALTH, default_timeout=60)
+    pebble.secrets["GEMINI_API_KEY"] = "fake"
+    pebble.session_state["logged_in"] = True
+    pebble.session_state["username"] = username
+    recorder.run("pebble_first_load", pebble.run)
+    for i in range(messages):
+        recorder.run("pebble_message", pebble.chat_input[0].set_value(f"I'm stressed about exam {i}.").run)
+    recorder.run("pebble_idle_rerun", pebble.run)
+    return (home, tools, pebble), chat_bytes
+
+
+def worker(args):
+    os.environ.setdefault("LLM_RATE_PER_MINUTE", "1000000")
+    os.environ.setdefault("LLM_BURST", "1000")
+    sys.path.insert(0, ROOT)
+    import streamlit  # noqa: F401  (imported before the fakes so the real `google` namespace is kept)
+    from benchmarks.fakes import FakeModel, install_fake_calendar, install_fake_model
+
+    install_fake_calendar()
+    install_fake_model(FakeModel())
+    with open("credentials.json", "w") as f:
+        f.write("{}")  # The page only turns Calendar sync on when this exists; the fake ignores it.
+    seed("bench0", args.chats, args.seed_messages)
+
+    recorder = Recorder()
+    baseline_rss = current_rss_mb()
+    sessions, chat_bytes = [], []
+    for s in range(args.sessions):
+        username = f"bench{s}"
+        if s:
+            seed(username, 0, 0)
+        apps, written = run_session(recorder, username, args.messages, args.switches)
+        sessions.append(apps)  # Keep every session alive, like concurrent browser tabs.
+        chat_bytes.append(written)
+    rss = current_rss_mb()
+    return {
+        "messages": args.messages, "chats": args.chats, "sessions": args.sessions,
+        "steps": recorder.summary(),
+        "rss_per_session_mb": (rss - baseline_rss) / args.sessions,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "chat_save_bytes_per_message": (statistics.mean(chat_bytes) / args.messages
+                                        if args.messages and None not in chat_bytes else None),
+        "chat_dir_bytes": sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk("chats") for f in fs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--chats", type=int, nargs="+", default=[10, 200])
+    parser.add_argument("--seed-messages", type=int, default=20, help="messages in each seeded chat")
+    parser.add_argument("--switches", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--out", default="app_bench.json")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.messages, args.chats = args.messages[0], args.chats[0]
+        print(json.dumps(worker(args)))
+        return
+
+    results = []
+    for chats in args.chats:
+        for messages in args.messages:
+            scratch = tempfile.mkdtemp(prefix="app-bench-")
+            try:
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--messages", str(messages),
+                       "--chats", str(chats), "--seed-messages", str(args.seed_messages),
+                       "--switches", str(args.switches), "--sessions", str(args.sessions)]
+                proc = subprocess.run(cmd, cwd=scratch, capture_output=True, text=True)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+            if proc.returncode != 0:
+                sys.exit(f"benchmark worker failed (chats={chats}, messages={messages}):\n{proc.stderr}")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"\nchats={chats} messages={messages} sessions={args.sessions}  "
+                  f"rss/session={result['rss_per_session_mb']:.1f} MB  peak={result['peak_rss_mb']:.0f} MB  "
+                  f"chat save={result['chat_save_bytes_per_message'] or 0:.0f} B/message")
+            print(f"  {'step':<20}{'reruns':>7}{'p50 ms':>10}{'p95 ms':>10}{'bytes/rerun':>13}")
+            for step, stats in result["steps"].items():
+                print(f"  {step:<20}{stats['reruns']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                      f"{stats['bytes_per_rerun']:>13.0f}")
+
+    with open(args.out, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, f, indent=4)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
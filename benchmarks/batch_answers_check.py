@@ -0,0 +1,102 @@
+"""
+Checks the offline batch tool against the fake model: bounded concurrency speeds up a prompt
+list, a rerun after failures only retries the failed prompts, and every precomputed answer is
+found under the key a live AI Tools session looks up. Exits with status 1 on any failure. Run
+from the repository root:
+
+    python benchmarks/batch_answers_check.py [--prompts 60] [--latency 0.1] [--concurrency 8]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant import assistant_cache_key  # noqa: E402
+from batch_answers import read_checkpoint, run_batch  # noqa: E402
+from fake_gemini import FakeModel  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+class FlakyModel(FakeModel):
+    """
+    Fails the first call for every prompt mentioning a number divisible by `every`.
+    """
+
+    def __init__(self, every, **kwargs):
+        super().__init__(**kwargs)
+        self.every = every
+        self.failed = set()
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        prompt = contents[-1]["parts"][0]
+        number = int(prompt.split()[-1].rstrip("?"))
+        if number % self.every == 0 and prompt not in self.failed:
+            self.failed.add(prompt)
+            raise ValueError("simulated API failure")
+        return super().generate_content(contents, stream, request_options)
+
+
+def make_gateway():
+    # Generous limits: the check measures the batch tool, not the production rate limit.
+    return LLMGateway(rate_per_minute=60000, burst=1000, max_workers=32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per fake answer")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="batch-answers-"))
+    items = [(f"q{i}", f"What is exam question {i}?", []) for i in range(args.prompts)]
+    failures = []
+
+    timings = {}
+    for concurrency in (1, args.concurrency):
+        cache = ResponseCache(f"cache-{concurrency}.db")
+        start = time.perf_counter()
+        counts = run_batch(items, FakeModel(latency=args.latency), cache, io.StringIO(), concurrency,
+                           gateway=make_gateway())
+        timings[concurrency] = time.perf_counter() - start
+        if counts["answered"] != len(items):
+            failures.append(f"concurrency {concurrency}: {counts}")
+    speedup = timings[1] / timings[args.concurrency]
+    print(f"concurrency 1: {timings[1]:.2f}s  concurrency {args.concurrency}: {timings[args.concurrency]:.2f}s  "
+          f"speedup {speedup:.1f}x")
+    if speedup < args.concurrency / 2:
+        failures.append(f"speedup {speedup:.1f}x is below {args.concurrency / 2:.1f}x")
+
+    cache = ResponseCache("cache-resume.db")
+    model = FlakyModel(every=7, latency=args.latency / 10)
+    with open("answers.jsonl", "a", encoding="utf-8") as out:
+        first = run_batch(items, model, cache, out, args.concurrency, gateway=make_gateway())
+    with open("answers.jsonl", "a", encoding="utf-8") as out:
+        second = run_batch(items, model, cache, out, args.concurrency, gateway=make_gateway(),
+                           done=read_checkpoint("answers.jsonl"))
+    expected_errors = len(range(0, args.prompts, 7))
+    print(f"first run: {first}\nresumed run: {second}")
+    if first["error"] != expected_errors or second["answered"] != expected_errors or \
+            second["skipped"] != len(items) - expected_errors:
+        failures.append("the resumed run did not retry exactly the failed prompts")
+    if model.calls != len(items):
+        failures.append(f"{model.calls} successful model calls for {len(items)} prompts")
+
+    live_hits = sum(cache.lookup(assistant_cache_key(prompt, [])) is not None for _, prompt, _ in items)
+    print(f"live lookups answered from the cache: {live_hits}/{len(items)}")
+    if live_hits != len(items):
+        failures.append("some precomputed answers are not found by a live session")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
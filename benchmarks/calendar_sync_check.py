@@ -0,0 +1,134 @@
+"""
+Checks the background Calendar sync against a local stand-in for the Calendar API
+(benchmarks/fake_calendar.py), using the real googleapiclient client: tasks are inserted once
+and updated afterwards, transient errors are retried, a batch whose reply was lost does not
+create duplicate events, sync state and event ids are saved on the tasks where another process
+can read them, and tasks left unsynced by a restart are sent by the next process. Exits with
+status 1 on any failure. Run from the repository root:
+
+    python benchmarks/calendar_sync_check.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plan_store  # noqa: E402
+from calendar_sync import FAILED, SYNCED, CalendarSyncQueue, calendar_event_id  # noqa: E402
+from fake_calendar import build_service, start_server  # noqa: E402
+from storage import FileBackend  # noqa: E402
+
+USERNAME = "student"
+
+
+def add_tasks(storage, prefix, count):
+    ids = [f"{prefix}{i}" for i in range(count)]
+    for task_id in ids:
+        plan_store.add_task(USERNAME, {"id": task_id, "date": "2025-01-06", "subject": f"Revise {task_id}",
+                                       "priority": "High", "start": "09:00:00", "end": "10:00:00", "done": False},
+                            storage)
+    return ids
+
+
+def make_queue(server, storage, **kwargs):
+    options = dict(flush_interval=0.05, backoff_base=0.05, storage=storage)
+    options.update(kwargs)
+    return CalendarSyncQueue(lambda: build_service(server), **options)
+
+
+def check_synced(failures, step, server, storage, task_ids):
+    # A fresh read, as another process would see it.
+    plan_store._plans_cache.clear()
+    for task_id in task_ids:
+        sync = (plan_store.get_task(USERNAME, task_id, storage) or {}).get("sync") or {}
+        event = server.calendar.events.get(("primary", sync.get("event_id")))
+        if sync.get("state") != SYNCED or event is None or event["summary"] != f"📚 Revise {task_id}":
+            failures.append(f"{step}: {task_id} is {sync}, Calendar has {event}")
+    if plan_store.unfinished_syncs(storage):
+        failures.append(f"{step}: outbox still lists {plan_store.unfinished_syncs(storage)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+    storage = FileBackend(tempfile.mkdtemp(prefix="calendar-sync-"))
+    server = start_server()
+    calendar = server.calendar
+    failures = []
+
+    queue = make_queue(server, storage)
+    first = add_tasks(storage, "a", 5)
+    for task_id in first:
+        queue.enqueue(USERNAME, task_id)
+    if not queue.flush(timeout=30):
+        failures.append("insert: queue did not drain")
+    check_synced(failures, "insert", server, storage, first)
+    print(f"insert: {calendar.counts['inserts']} events in {calendar.counts['batches']} batch(es)")
+
+    queue.enqueue(USERNAME, first[0])
+    queue.flush(timeout=30)
+    if calendar.counts["updates"] != 1 or len(calendar.events) != len(first):
+        failures.append(f"update: re-sending a synced task should update it, counts {calendar.counts}")
+    print(f"update: re-sent task updated, {len(calendar.events)} events")
+
+    calendar.fail_requests = 3
+    retried = add_tasks(storage, "b", 3)
+    for task_id in retried:
+        queue.enqueue(USERNAME, task_id)
+    queue.flush(timeout=30)
+    check_synced(failures, "retry", server, storage, retried)
+    print(f"retry: {calendar.counts['failed']} requests answered 503, all tasks synced")
+
+    calendar.lose_replies = 1
+    lost = add_tasks(storage, "c", 2)
+    for task_id in lost:
+        queue.enqueue(USERNAME, task_id)
+    queue.flush(timeout=30)
+    check_synced(failures, "lost reply", server, storage, lost)
+    if len(calendar.events) != len(first + retried + lost):
+        failures.append(f"lost reply: {len(calendar.events)} events for {len(first + retried + lost)} tasks")
+    print(f"lost reply: {calendar.counts['conflicts']} re-sent inserts turned into updates, no duplicates")
+
+    # A process whose sends keep failing goes away with tasks unsynced; the next one sends them.
+    def unreachable():
+        raise ConnectionError("Calendar unreachable")
+
+    interrupted = add_tasks(storage, "d", 2)
+    stalled = CalendarSyncQueue(unreachable, flush_interval=0.05, backoff_base=1000, storage=storage)
+    for task_id in interrupted:
+        stalled.enqueue(USERNAME, task_id)
+    stalled.flush(timeout=0.5)
+    plan_store._plans_cache.clear()
+    states = {plan_store.get_task(USERNAME, t, storage)["sync"]["state"] for t in interrupted}
+    print(f"restart: {len(interrupted)} tasks left {', '.join(sorted(states))}")
+    calendar.lose_replies = 1  # The first resumed batch is applied but its reply is lost, too.
+    resumed = make_queue(server, storage)
+    resumed.flush(timeout=30)
+    check_synced(failures, "restart", server, storage, interrupted)
+    expected = len(first + retried + lost + interrupted)
+    if len(calendar.events) != expected:
+        failures.append(f"restart: {len(calendar.events)} events for {expected} tasks")
+    if set(calendar.events) != {("primary", calendar_event_id(USERNAME, t)) for t in first + retried + lost + interrupted}:
+        failures.append("restart: events are not keyed by their tasks")
+    print(f"restart: next process synced them, {len(calendar.events)} events for {expected} tasks")
+
+    failed = add_tasks(storage, "e", 1)
+    gone = make_queue(server, storage, max_attempts=2)
+    calendar.fail_requests = 2
+    gone.enqueue(USERNAME, failed[0])
+    gone.flush(timeout=30)
+    plan_store._plans_cache.clear()
+    if plan_store.get_task(USERNAME, failed[0], storage)["sync"]["state"] != FAILED or plan_store.unfinished_syncs(storage):
+        failures.append("give up: a task out of attempts should be failed and leave the outbox")
+    print("give up: out of attempts -> failed")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
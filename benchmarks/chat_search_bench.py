@@ -0,0 +1,104 @@
+"""
+Full-text chat search at scale: seeds one user with thousands of saved conversations, then
+reports the one-time backfill of the search index, the extra cost of indexing each saved turn
+and ranked query latency. Queries must not open any chat file. Run from the repository root:
+
+    python benchmarks/chat_search_bench.py [--chats 500 5000] [--messages 20] [--queries 500]
+"""
+import argparse
+import builtins
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_store  # noqa: E402
+from storage import get_storage  # noqa: E402
+
+TOPICS = ["photosynthesis", "integration by parts", "newton's laws", "the french revolution", "mitochondria",
+          "quadratic equations", "supply and demand", "plate tectonics", "organic chemistry", "shakespeare"]
+VOCABULARY = [f"word{i}" for i in range(20000)]
+ZIPF_WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def message(rng, role):
+    # Word frequencies follow Zipf's law, as in real text; some messages mention a study topic.
+    words = rng.choices(VOCABULARY, ZIPF_WEIGHTS, k=rng.randint(10, 60))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), rng.choice(TOPICS))
+    return {"role": role, "parts": " ".join(words)}
+
+
+def seed(username, chats, messages, rng):
+    for i in range(chats):
+        chat_id = f"chat_20250101_{i:06d}"
+        chat_store.create_chat(username, chat_id)
+        # Written straight to the log, as chats saved before search existed were.
+        get_storage().append(chat_store.chat_log(username, chat_id),
+                             [message(rng, "user" if j % 2 == 0 else "model") for j in range(messages)])
+        chat_store._update_index(username, chat_id, added=[{}] * messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--messages", type=int, default=20, help="messages per seeded chat")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'chats':>6}  {'backfill s':>10}  {'index/turn ms':>13}  {'query p50 ms':>12}  {'query p95 ms':>12}")
+    for chats in args.chats:
+        rng = random.Random(chats)
+        os.chdir(tempfile.mkdtemp(prefix="chat-search-"))
+        username = "student"
+        seed(username, chats, args.messages, rng)
+
+        start = time.perf_counter()
+        chat_store.sync_search_index(username)
+        backfill = time.perf_counter() - start
+
+        turn_ms = []
+        for i in range(50):
+            chat_id = f"chat_20250101_{rng.randrange(chats):06d}"
+            turn = [message(rng, "user"), message(rng, "model")]
+            start = time.perf_counter()
+            chat_store.append_messages(username, chat_id, turn)
+            elapsed = time.perf_counter() - start
+            turn_ms.append(elapsed * 1000)
+
+        opened = []
+        real_open = builtins.open
+
+        def tracking_open(file, *a, **kw):
+            if str(file).endswith(".jsonl") and not str(file).endswith(chat_store.INDEX_LOG + ".jsonl"):
+                opened.append(file)
+            return real_open(file, *a, **kw)
+
+        builtins.open = tracking_open
+        try:
+            query_ms = []
+            for _ in range(args.queries):
+                text = rng.choice(TOPICS) if rng.random() < 0.5 else " ".join(rng.sample(VOCABULARY[:2000], 2))
+                start = time.perf_counter()
+                results = chat_store.search_chats(username, text)
+                query_ms.append((time.perf_counter() - start) * 1000)
+        finally:
+            builtins.open = real_open
+        print(f"{chats:>6}  {backfill:>10.2f}  {statistics.median(turn_ms):>13.2f}  "
+              f"{statistics.median(query_ms):>12.2f}  {percentile(query_ms, 95):>12.2f}")
+        if opened:
+            print(f"  warning: {len(opened)} chat files opened while querying")
+        assert results is not None
+
+
+if __name__ == "__main__":
+    main()
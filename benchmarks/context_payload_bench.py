@@ -0,0 +1,74 @@
+"""
+Request payload size versus turn count for the Mental Health chatbot: the old approach (resend
+the whole history every turn) against the token-budgeted ConversationContext. Uses a local
+summarizer, so no API key or network is needed. Run from the repository root:
+
+    python benchmarks/context_payload_bench.py [--turns 200] [--budget 2000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_context import ConversationContext, estimate_tokens  # noqa: E402
+
+SYSTEM_PROMPT = "You are Pebble, a supportive study companion. " * 20
+STUDENT_LINES = [
+    "I have three exams next week and I can't focus at all.",
+    "Every time I open my notes I feel like I'm already behind everyone else.",
+    "My parents keep asking about my grades and it makes me anxious.",
+    "I tried studying late last night but ended up scrolling on my phone until 3am.",
+]
+
+
+def local_summarize(summary, turns):
+    # Stand-in for the model: a bounded summary, like the real one.
+    text = summary + " " + " ".join(t["text"] for t in turns if t["role"] == "user")
+    return text[-600:]
+
+
+def payload_size(contents):
+    parts = [p for c in contents for p in c["parts"]]
+    return sum(len(p) for p in parts), sum(estimate_tokens(p) for p in parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--json", help="also write the per-turn results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pinned = [{"role": "user", "parts": [SYSTEM_PROMPT]}]
+    context = ConversationContext(token_budget=args.budget, pinned=pinned)
+    full_history = list(pinned)
+    rows = []
+    for turn in range(1, args.turns + 1):
+        prompt = rng.choice(STUDENT_LINES)
+        reply = "That sounds really hard. " + " ".join(rng.choice(STUDENT_LINES) for _ in range(rng.randint(2, 6)))
+        full_chars, full_tokens = payload_size(full_history + [{"role": "user", "parts": [prompt]}])
+        compact_chars, compact_tokens = payload_size(context.request_contents(prompt))
+        rows.append({"turn": turn, "full_chars": full_chars, "full_tokens": full_tokens,
+                     "compact_chars": compact_chars, "compact_tokens": compact_tokens})
+        full_history += [{"role": "user", "parts": [prompt]}, {"role": "model", "parts": [reply]}]
+        context.add("user", prompt)
+        context.add("model", reply)
+        context.compact(local_summarize)
+        context.wait()
+
+    print(f"{'turn':>5}  {'full history tokens':>20}  {'budgeted tokens':>16}")
+    for row in rows:
+        if row["turn"] in (1, 5, 10, 25, 50, 100, 200, 500, 1000) or row["turn"] == args.turns:
+            print(f"{row['turn']:>5}  {row['full_tokens']:>20}  {row['compact_tokens']:>16}")
+    print(f"\nmax budgeted request: {max(r['compact_tokens'] for r in rows)} tokens (budget {args.budget})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
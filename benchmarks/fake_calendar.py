@@ -0,0 +1,126 @@
+"""
+A small in-memory stand-in for the Google Calendar API, answering the batch requests the
+calendar sync queue sends (event insert and update) over real HTTP, so the queue can be tested
+with the real googleapiclient client and no Google account. Failures can be injected: single
+requests answered with 503, and whole batches applied but answered with 500, as if the reply had
+been lost. Start it from code with `start_server()` and build a client with `build_service()`.
+"""
+import email.parser
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOUNDARY = "batch_fake_calendar"
+EVENT_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/?]+))?")
+
+
+class FakeCalendar:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = {}  # (calendar id, event id) -> event
+        self.counts = {"batches": 0, "inserts": 0, "updates": 0, "conflicts": 0, "failed": 0, "lost": 0}
+        self.fail_requests = 0  # Answer this many upcoming requests with 503.
+        self.lose_replies = 0   # Apply this many upcoming batches, then answer them with 500.
+        self._ids = itertools.count()
+
+    def handle(self, method, path, body):
+        """
+        Applies one request from a batch; returns (status, reason, response body).
+        """
+        match = EVENT_PATH.match(path)
+        if not match:
+            return 404, "Not Found", {"error": {"code": 404, "message": f"no route for {path}"}}
+        calendar_id, event_id = match.groups()
+        with self.lock:
+            if self.fail_requests:
+                self.fail_requests -= 1
+                self.counts["failed"] += 1
+                return 503, "Service Unavailable", {"error": {"code": 503, "message": "backend error"}}
+            if method == "POST" and event_id is None:
+                event_id = body.get("id") or f"generated{next(self._ids)}"
+                if (calendar_id, event_id) in self.events:
+                    self.counts["conflicts"] += 1
+                    return 409, "Conflict", {"error": {"code": 409, "message": "The requested identifier already exists."}}
+                self.counts["inserts"] += 1
+            elif method == "PUT" and event_id is not None:
+                if (calendar_id, event_id) not in self.events:
+                    return 404, "Not Found", {"error": {"code": 404, "message": "Not Found"}}
+                self.counts["updates"] += 1
+            else:
+                return 405, "Method Not Allowed", {"error": {"code": 405, "message": method}}
+            event = self.events[(calendar_id, event_id)] = dict(body, id=event_id)
+            return 200, "OK", event
+
+
+def _parse_part(payload):
+    request_line, _, rest = payload.replace("\r\n", "\n").partition("\n")
+    method, target, _ = request_line.split(" ", 2)
+    _, _, body = rest.partition("\n\n")
+    return method, target.split("?", 1)[0], json.loads(body) if body.strip() else {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, reason, body, content_type):
+        self.send_response(status, reason)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        calendar = self.server.calendar
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/batch/calendar/v3":
+            self._reply(404, "Not Found", b"{}", "application/json")
+            return
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + data)
+        parts = []
+        for part in message.get_payload():
+            status, reason, body = calendar.handle(*_parse_part(part.get_payload()))
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(f"--{BOUNDARY}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                         f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+                         f"{json.dumps(body)}\r\n")
+        with calendar.lock:
+            calendar.counts["batches"] += 1
+            lost = calendar.lose_replies > 0
+            if lost:
+                calendar.lose_replies -= 1
+                calendar.counts["lost"] += 1
+        if lost:
+            self._reply(500, "Internal Server Error", b'{"error": {"code": 500}}', "application/json")
+            return
+        self._reply(200, "OK", ("".join(parts) + f"--{BOUNDARY}--\r\n").encode(),
+                    f"multipart/mixed; boundary={BOUNDARY}")
+
+
+def start_server(host="127.0.0.1", port=0):
+    """
+    Starts the server on a background thread; its FakeCalendar is `server.calendar`.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.calendar = FakeCalendar()
+    threading.Thread(target=server.serve_forever, name="fake-calendar", daemon=True).start()
+    return server
+
+
+def build_service(server):
+    """
+    Builds a real googleapiclient Calendar client whose requests go to `server`.
+    """
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    host, port = server.server_address
+    document = get_static_doc("calendar", "v3").replace("https://www.googleapis.com/", f"http://{host}:{port}/")
+    return build_from_document(document, http=httplib2.Http(timeout=10))
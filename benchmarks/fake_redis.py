@@ -0,0 +1,219 @@
+"""
+A small in-memory stand-in for a Redis server, speaking the Redis protocol (RESP2) for the
+commands the redis storage backend uses. Lets the backend and the load test run without
+installing Redis. Start it on its own, or from code with `start_server()`:
+
+    python benchmarks/fake_redis.py [--port 6390]
+    STORAGE_BACKEND=redis REDIS_URL=redis://localhost:6390/0 streamlit run Home.py
+"""
+import argparse
+import itertools
+import socket
+import socketserver
+import threading
+
+_lock = threading.Lock()
+_data = {}
+_versions = {}  # key -> number of the last write to it, for WATCH
+_writes = itertools.count(1)
+WRITE_COMMANDS = {"DEL", "HSET", "HSETNX", "HDEL", "HINCRBY", "RPUSH", "LPUSH", "LTRIM", "SADD", "SREM"}
+
+
+class Error(Exception):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, Error):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode(v) for v in value)
+
+
+def _typed(key, kind):
+    value = _data.get(key)
+    if value is None:
+        value = _data[key] = kind()
+    elif not isinstance(value, kind):
+        raise Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+    return value
+
+
+def _range(items, start, stop):
+    n = len(items)
+    start, stop = int(start), int(stop)
+    start = max(0, start + n if start < 0 else start)
+    stop = stop + n if stop < 0 else stop
+    return items[start:stop + 1]
+
+
+def run_command(name, args):
+    """
+    Executes one command against the in-memory data. Must be called with _lock held.
+    """
+    if name in WRITE_COMMANDS:
+        for key in (args if name == "DEL" else args[:1]):
+            _versions[key] = next(_writes)
+    if name == "PING":
+        return "PONG"
+    if name in ("SELECT", "FLUSHDB"):
+        if name == "FLUSHDB":
+            _data.clear()
+        return "OK"
+    if name == "DEL":
+        return sum(_data.pop(k, None) is not None for k in args)
+    if name == "HGET":
+        return _data.get(args[0], {}).get(args[1])
+    if name == "HSET":
+        fields = _typed(args[0], dict)
+        added = sum(f not in fields for f in args[1::2])
+        fields.update(zip(args[1::2], args[2::2]))
+        return added
+    if name == "HSETNX":
+        fields = _typed(args[0], dict)
+        if args[1] in fields:
+            return 0
+        fields[args[1]] = args[2]
+        return 1
+    if name == "HDEL":
+        fields = _typed(args[0], dict)
+        return sum(fields.pop(f, None) is not None for f in args[1:])
+    if name == "HINCRBY":
+        fields = _typed(args[0], dict)
+        value = int(fields.get(args[1], b"0")) + int(args[2])
+        fields[args[1]] = str(value).encode()
+        return value
+    if name == "HGETALL":
+        return [x for item in _data.get(args[0], {}).items() for x in item]
+    if name == "RPUSH":
+        items = _typed(args[0], list)
+        items.extend(args[1:])
+        return len(items)
+    if name == "LPUSH":
+        items = _typed(args[0], list)
+        items[:0] = reversed(args[1:])
+        return len(items)
+    if name == "LTRIM":
+        items = _data.get(args[0], [])
+        kept = _range(items, args[1], args[2])
+        if kept:
+            _data[args[0]] = kept
+        else:
+            _data.pop(args[0], None)
+        return "OK"
+    if name == "LINDEX":
+        items = _data.get(args[0], [])
+        index = int(args[1])
+        return items[index] if -len(items) <= index < len(items) else None
+    if name == "LRANGE":
+        return _range(_data.get(args[0], []), args[1], args[2])
+    if name == "LLEN":
+        return len(_data.get(args[0], []))
+    if name == "SADD":
+        members = _typed(args[0], set)
+        before = len(members)
+        members.update(args[1:])
+        return len(members) - before
+    if name == "SREM":
+        members = _typed(args[0], set)
+        before = len(members)
+        members.difference_update(args[1:])
+        return before - len(members)
+    if name == "SMEMBERS":
+        return sorted(_data.get(args[0], set()))
+    raise Error(f"unknown command '{name}'")
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        queued = None
+        watched = {}
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            name = command[0].decode().upper()
+            if name == "MULTI":
+                queued = []
+                reply = "OK"
+            elif name == "WATCH":
+                with _lock:
+                    watched.update((key, _versions.get(key)) for key in command[1:])
+                reply = "OK"
+            elif name == "UNWATCH":
+                watched = {}
+                reply = "OK"
+            elif name == "EXEC":
+                with _lock:
+                    if any(_versions.get(key) != version for key, version in watched.items()):
+                        reply = None  # A watched key was written since WATCH: the transaction is dropped.
+                    else:
+                        reply = []
+                        for queued_name, args in queued or []:
+                            try:
+                                reply.append(run_command(queued_name, args))
+                            except Error as e:
+                                reply.append(e)
+                queued = None
+                watched = {}
+            elif queued is not None:
+                queued.append((name, command[1:]))
+                reply = "QUEUED"
+            else:
+                with _lock:
+                    try:
+                        reply = run_command(name, command[1:])
+                    except Error as e:
+                        reply = e
+            self.wfile.write(_encode(reply))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server(port=0):
+    """
+    Serves on localhost:`port` (0 picks a free port) from a daemon thread; returns the server.
+    """
+    server = Server(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="fake-redis", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = Server(("127.0.0.1", args.port), Handler)
+    print(f"fake redis listening on 127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
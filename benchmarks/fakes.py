@@ -0,0 +1,63 @@
+"""
+Local stand-ins for the Google Calendar client, and helpers that install them and the fake Gemini
+model (fake_gemini.py, re-exported here) into the pages, so the benchmarks run without API keys or
+network access.
+"""
+import sys
+import types
+
+from fake_gemini import FakeChat, FakeChunk, FakeModel, FakeResponse, FakeUsage  # noqa: F401  (re-exported)
+
+
+class FakeBatch:
+    def __init__(self):
+        self._requests = []
+
+    def add(self, request, callback, request_id):
+        self._requests.append((request, callback, request_id))
+
+    def execute(self):
+        for request, callback, request_id in self._requests:
+            callback(request_id, {"id": f"event-{request_id}-{id(request)}"}, None)
+
+
+class FakeEvents:
+    def insert(self, calendarId, body):
+        return ("insert", calendarId, body)
+
+    def update(self, calendarId, eventId, body):
+        return ("update", calendarId, eventId, body)
+
+
+class FakeCalendarService:
+    def events(self):
+        return FakeEvents()
+
+    def new_batch_http_request(self):
+        return FakeBatch()
+
+
+def install_fake_calendar():
+    """
+    Makes `from google.oauth2 import service_account` and `from googleapiclient.discovery import
+    build` resolve to stubs that hand out a FakeCalendarService.
+    """
+    service_account = types.ModuleType("google.oauth2.service_account")
+    service_account.Credentials = types.SimpleNamespace(from_service_account_file=lambda *a, **k: object())
+    discovery = types.ModuleType("googleapiclient.discovery")
+    discovery.build = lambda *a, **k: FakeCalendarService()
+    for name in ("google", "google.oauth2", "googleapiclient"):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules["google.oauth2"].service_account = service_account
+    sys.modules["googleapiclient"].discovery = discovery
+    sys.modules["google.oauth2.service_account"] = service_account
+    sys.modules["googleapiclient.discovery"] = discovery
+
+
+def install_fake_model(model):
+    """
+    Routes the pages' get_model() to `model`.
+    """
+    import llm_gateway
+
+    llm_gateway.get_model = lambda *args, **kwargs: model
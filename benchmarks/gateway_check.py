@@ -0,0 +1,158 @@
+"""
+Checks the shared LLM gateway against local fake calls: transient errors are retried and others
+are not, the deadline cuts off a hanging call, the circuit breaker opens, half-opens and closes
+again (also when the half-open trial is a stream its caller abandons), and the token bucket caps
+the call rate. Exits with status 1 on any failure. Run from the repository root:
+
+    python benchmarks/gateway_check.py
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import FakeModel  # noqa: E402
+from llm_gateway import CircuitOpen, DeadlineExceeded, LLMGateway, RateLimited  # noqa: E402
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class Flaky:
+    """
+    Raises `error` on the first `failures` calls, then returns "ok".
+    """
+
+    def __init__(self, failures, error=Unavailable):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("simulated failure")
+        return "ok"
+
+
+def make_gateway(**kwargs):
+    options = dict(rate_per_minute=60000, burst=1000, max_workers=4, deadline=5.0, backoff_base=0.01,
+                   backoff_cap=0.05, failure_threshold=3, reset_timeout=0.3)
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+def expect(failures, condition, message):
+    if not condition:
+        failures.append(message)
+
+
+def check_retry(failures):
+    gateway = make_gateway(failure_threshold=10)
+    flaky = Flaky(2)
+    expect(failures, gateway.call(flaky) == "ok" and flaky.calls == 3,
+           f"retry: 2 transient errors should be retried, got {flaky.calls} calls")
+    permanent = Flaky(1, ValueError)
+    try:
+        gateway.call(permanent)
+        failures.append("retry: a non-retryable error was swallowed")
+    except ValueError:
+        expect(failures, permanent.calls == 1, f"retry: a non-retryable error was retried ({permanent.calls} calls)")
+    hopeless = Flaky(100)
+    try:
+        gateway.call(hopeless)
+        failures.append("retry: endless transient errors did not raise")
+    except Unavailable:
+        expect(failures, hopeless.calls == gateway.max_retries + 1,
+               f"retry: expected {gateway.max_retries + 1} attempts, got {hopeless.calls}")
+    print(f"retry: recovered after 2 errors; gave up after {hopeless.calls} attempts")
+
+
+def check_deadline(failures):
+    gateway = make_gateway(deadline=0.2)
+    release = threading.Event()
+    start = time.perf_counter()
+    try:
+        gateway.call(release.wait, 5)
+        failures.append("deadline: a hanging call returned")
+    except DeadlineExceeded:
+        elapsed = time.perf_counter() - start
+        expect(failures, elapsed < 0.5, f"deadline: gave up after {elapsed:.2f}s, deadline was 0.2s")
+        print(f"deadline: hanging call cut off after {elapsed:.2f}s")
+    finally:
+        release.set()
+
+
+def trip(gateway):
+    for _ in range(gateway.breaker.failure_threshold):
+        gateway.breaker.record_failure()
+
+
+def check_breaker(failures):
+    gateway = make_gateway()
+    trip(gateway)
+    try:
+        gateway.call(Flaky(0))
+        failures.append("breaker: an open circuit let a call through")
+    except CircuitOpen:
+        pass
+    time.sleep(gateway.breaker.reset_timeout)
+    expect(failures, gateway.breaker.state == "half-open", f"breaker: expected half-open, is {gateway.breaker.state}")
+    expect(failures, gateway.call(Flaky(0)) == "ok" and gateway.breaker.state == "closed",
+           "breaker: a successful trial call did not close the circuit")
+    print("breaker: open -> half-open -> closed after a successful trial")
+
+    # The half-open trial is a stream whose caller stops reading after the first chunk.
+    trip(gateway)
+    time.sleep(gateway.breaker.reset_timeout)
+    model = FakeModel(reply_words=40)
+    stream = gateway.stream(model.generate_content, "Explain osmosis", stream=True)
+    next(stream)
+    stream.close()
+    try:
+        expect(failures, gateway.call(Flaky(0)) == "ok", "breaker: call after an abandoned trial stream failed")
+        print("breaker: an abandoned trial stream lets the next call probe")
+    except CircuitOpen:
+        failures.append("breaker: an abandoned trial stream left the circuit stuck open")
+
+
+def check_bucket(failures):
+    rate, burst, calls = 600, 5, 15
+    gateway = make_gateway(rate_per_minute=rate, burst=burst)
+    start = time.perf_counter()
+    for _ in range(calls):
+        gateway.call(Flaky(0))
+    elapsed = time.perf_counter() - start
+    expected = (calls - burst) / (rate / 60)
+    expect(failures, elapsed >= expected * 0.9,
+           f"bucket: {calls} calls took {elapsed:.2f}s, the rate limit allows no less than {expected:.2f}s")
+    gateway = make_gateway(rate_per_minute=60, burst=1, deadline=0.1)
+    gateway.call(Flaky(0))
+    try:
+        gateway.call(Flaky(0))
+        failures.append("bucket: a call beyond the burst was not rate limited before its deadline")
+    except RateLimited:
+        pass
+    print(f"bucket: {calls} calls at {rate}/min with burst {burst} took {elapsed:.2f}s (minimum {expected:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+    failures = []
+    check_retry(failures)
+    check_deadline(failures)
+    check_breaker(failures)
+    check_bucket(failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
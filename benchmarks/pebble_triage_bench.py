@@ -0,0 +1,100 @@
+"""
+Accuracy and latency of Pebble's local triage (pebble_triage) on labeled student messages
+(trivial / distress / normal, plus the previous Pebble reply where it matters). Two sets are
+scored: pebble_triage_dataset.jsonl, which the phrase lists and distress patterns are tuned
+against, and pebble_triage_heldout.jsonl, which is never used for tuning, so its scores show how
+the lexicon does on phrasings nobody fitted it to. Add new failure cases to the tuning set; keep
+the held-out set for measuring. Reports how many Gemini calls the template fast path avoids,
+precision and recall of the fast path and of the distress classifier, and the time until the
+first reply or disclaimer compared with a model round-trip. Exits with status 1 if a message that
+needs the model is answered from a template in either set, or if held-out distress recall drops
+below --min-recall. Run from the repository root:
+
+    python benchmarks/pebble_triage_bench.py [--model-latency 1.5] [--repeat 200] [--min-recall 0.95]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pebble_triage import triage  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pebble_triage_dataset.jsonl")
+HELDOUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pebble_triage_heldout.jsonl")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def precision_recall(predicted, actual):
+    true_positives = sum(p and a for p, a in zip(predicted, actual))
+    precision = true_positives / sum(predicted) if any(predicted) else 1.0
+    recall = true_positives / sum(actual) if any(actual) else 1.0
+    return precision, recall
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(name, rows):
+    """
+    Prints the fast path and distress scores on `rows` and the messages it gets wrong; returns
+    (fast path precision, distress recall).
+    """
+    results = [triage(row["text"], row.get("after", "")) for row in rows]
+    fast_path = [r["reply"] is not None for r in results]
+    distressed = [r["distressed"] for r in results]
+    fast_precision, fast_recall = precision_recall(fast_path, [row["label"] == "trivial" for row in rows])
+    distress_precision, distress_recall = precision_recall(distressed, [row["label"] == "distress" for row in rows])
+    counts = {label: sum(row["label"] == label for row in rows) for label in ("trivial", "distress", "normal")}
+    print(f"{name}: {len(rows)} messages ({', '.join(f'{n} {label}' for label, n in counts.items())})")
+    print(f"  fast path: {sum(fast_path)} answered locally = {sum(fast_path) / len(rows):.0%} of Gemini calls avoided; "
+          f"precision {fast_precision:.2f}, recall {fast_recall:.2f}")
+    print(f"  distress: precision {distress_precision:.2f}, recall {distress_recall:.2f}")
+    for row, r in zip(rows, results):
+        if (r["reply"] is not None) != (row["label"] == "trivial"):
+            print(f"    fast path {'wrongly taken' if r['reply'] else 'missed'}: {row['text']!r}")
+        if r["distressed"] != (row["label"] == "distress"):
+            print(f"    distress {'false alarm' if r['distressed'] else 'missed'} (score {r['score']}): {row['text']!r}")
+    return fast_precision, distress_recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-latency", type=float, default=1.5, help="assumed seconds per Gemini round-trip")
+    parser.add_argument("--repeat", type=int, default=200, help="timed passes over the dataset")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="required held-out distress recall")
+    args = parser.parse_args()
+    rows = load(DATASET)
+    heldout = load(HELDOUT)
+
+    tuned_precision, _ = score("tuning set", rows)
+    heldout_precision, heldout_recall = score("held-out set", heldout)
+
+    samples = []
+    for _ in range(args.repeat):
+        for row in rows:
+            start = time.perf_counter()
+            triage(row["text"], row.get("after", ""))
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    avoided = sum(triage(row["text"], row.get("after", ""))["reply"] is not None for row in heldout) / len(heldout)
+    print(f"triage latency: p50 {statistics.median(samples):.1f} us, p99 {percentile(samples, 99):.1f} us")
+    print(f"first reply for trivial messages: {statistics.median(samples) / 1000:.3f} ms instead of ~{args.model_latency:.1f} s; "
+          f"disclaimer shown before the model call instead of after ~{args.model_latency:.1f} s")
+    print(f"model time saved per 1000 such messages (held-out mix): ~{avoided * 1000 * args.model_latency / 60:.0f} min")
+
+    failed = tuned_precision < 1.0 or heldout_precision < 1.0 or heldout_recall < args.min_recall
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
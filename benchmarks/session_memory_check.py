@@ -0,0 +1,107 @@
+"""
+Checks that per-session memory stays bounded however long conversations get. Simulates many
+browser sessions, each with an AI Tools chat window over a long saved conversation and a Pebble
+conversation, and measures the Python heap they retain (tracemalloc) at two conversation
+lengths, then again after idle eviction. Exits with status 1 if memory grows with conversation
+length or exceeds the per-session limit. Run from the repository root:
+
+    python benchmarks/session_memory_check.py [--sessions 300] [--lengths 100 2000] [--limit-kb 256]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_store  # noqa: E402
+from chat_context import ConversationContext  # noqa: E402
+from session_memory import ChatWindow, evict_idle, get_session_memory  # noqa: E402
+
+MESSAGE_TEXT = "Could you explain how photosynthesis turns light into chemical energy? " * 6
+
+
+def local_summarize(summary, turns):
+    return (summary + " " + " ".join(t["text"][:40] for t in turns))[-600:]
+
+
+def seed_chat(username, chat_id, length):
+    chat_store.create_chat(username, chat_id)
+    chat_store.append_messages(username, chat_id, [
+        {"role": "user" if i % 2 == 0 else "model", "parts": f"{i}: {MESSAGE_TEXT}"} for i in range(length)])
+
+
+def simulate(sessions, length, turns):
+    """
+    Opens `sessions` sessions over conversations of `length` messages, sends `turns` turns in each,
+    and returns (session states, retained bytes per session, retained bytes per session after eviction).
+    """
+    for s in range(sessions):
+        seed_chat(f"student{s}", "chat_main", length)
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    states = []
+    for s in range(sessions):
+        state = {}
+        memory = get_session_memory(state)
+        memory.touch()
+        window = memory.track(ChatWindow(f"student{s}", "chat_main"))
+        window.latest(20)
+        pebble = memory.track(ChatWindow(f"student{s}", "_pebble_bench", transient=True))
+        context = ConversationContext(token_budget=2000)
+        for t in range(turns):
+            reply = f"Answer {t}: {MESSAGE_TEXT}"
+            window.append([{"role": "user", "parts": f"Question {t}"}, {"role": "model", "parts": reply}])
+            pebble.append([{"role": "user", "parts": f"Worry {t}"}, {"role": "model", "parts": reply}])
+            context.add("user", f"Worry {t}")
+            context.add("model", reply)
+            context.compact(local_summarize)
+        context.wait()
+        state.update(window=window, pebble=pebble, context=context)
+        states.append(state)
+    gc.collect()
+    retained = (tracemalloc.get_traced_memory()[0] - baseline) / sessions
+    evict_idle(max_idle=0)
+    gc.collect()
+    after_eviction = (tracemalloc.get_traced_memory()[0] - baseline) / sessions
+    tracemalloc.stop()
+    return states, retained, after_eviction
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 2000])
+    parser.add_argument("--turns", type=int, default=60, help="turns sent in each session")
+    parser.add_argument("--limit-kb", type=float, default=256, help="maximum retained KB per session")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="session-memory-"))
+    naive_kb = max(args.lengths) * len(MESSAGE_TEXT) / 1024
+    print(f"{'messages':>9}  {'KB/session':>11}  {'after eviction':>15}")
+    results = []
+    for length in args.lengths:
+        states, retained, after = simulate(args.sessions, length, args.turns)
+        results.append(retained)
+        print(f"{length:>9}  {retained / 1024:>11.1f}  {after / 1024:>15.1f}")
+        del states
+    print(f"\nfull history in memory would need at least {naive_kb:.0f} KB/session at {max(args.lengths)} messages")
+
+    growth = results[-1] / results[0]
+    failures = []
+    if max(results) / 1024 > args.limit_kb:
+        failures.append(f"retained {max(results) / 1024:.1f} KB/session, limit {args.limit_kb} KB")
+    if growth > 1.5:
+        failures.append(f"memory grew {growth:.2f}x with conversation length")
+    for failure in failures:
+        print("FAIL:", failure)
+    if not failures:
+        print("OK: per-session memory is bounded")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
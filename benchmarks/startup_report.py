@@ -0,0 +1,141 @@
+"""
+Startup cost of the AI Tools page before and after moving its heavy imports and clients behind
+lazy imports and st.cache_resource, measured on real runs of the page. Run from the repository root:
+
+    python benchmarks/startup_report.py [--before REV] [--reruns 10] [--json startup_report.json]
+
+"before" is pages/1_🤖_AI_Tools.py as of REV (default: the repository's first commit), "after" is
+the working tree. Each page runs in a fresh interpreter inside a scratch directory, driven through
+Streamlit's AppTest with a logged-in student, a placeholder Gemini key and a generated service
+account in credentials.json, so the Calendar client really is built (no network is needed until a
+task is sent). Streamlit itself is imported before the clock starts; everything the page imports
+or builds on top of it is counted. Reported per page:
+    first load      the first run of the script in the process (imports, clients, rendering)
+    rerun           median of the following idle reruns
+    add task        submitting the planner form once
+and which heavy modules had been loaded after the first load and after adding a task. Note that
+google.generativeai itself imports googleapiclient.discovery and google.oauth2, so those modules are
+loaded with Gemini either way; what the new page defers is building the Calendar client.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = os.path.join("pages", "1_🤖_AI_Tools.py")
+HEAVY_MODULES = ["google.generativeai", "googleapiclient.discovery", "google.oauth2.service_account", "pandas",
+                 "plotly.express", "PIL.Image"]
+
+
+def write_credentials(path):
+    """
+    Writes a service account file with a freshly generated key; enough for build() to succeed offline.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    with open(path, "w") as f:
+        json.dump({"type": "service_account", "project_id": "startup-report", "private_key_id": "0",
+                   "private_key": pem, "client_email": "startup-report@startup-report.iam.gserviceaccount.com",
+                   "client_id": "0", "token_uri": "https://oauth2.googleapis.com/token"}, f)
+
+
+def loaded_heavy_modules():
+    return [m for m in HEAVY_MODULES if m in sys.modules]
+
+
+def worker(page, reruns):
+    """
+    Runs in the scratch directory: first load, idle reruns, then one task added through the form.
+    """
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(page, default_timeout=120)
+    at.secrets["GEMINI_API_KEY"] = "startup-report"
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "student"
+
+    def timed(action):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return elapsed
+
+    first_load = timed(at.run)
+    after_first_load = loaded_heavy_modules()
+    rerun = statistics.median(timed(at.run) for _ in range(reruns))
+    next(w for w in at.text_input if w.label == "Enter Subject").set_value("Chemistry")
+    add_task = timed(next(b for b in at.button if b.label == "➕ Add to Plan & Calendar").click().run)
+    # The new page builds the Calendar client on its sync thread; give it a moment to get there.
+    end = time.monotonic() + 10
+    while "googleapiclient.discovery" not in sys.modules and time.monotonic() < end:
+        time.sleep(0.05)
+    return {"first_load_s": first_load, "rerun_s": rerun, "add_task_s": add_task,
+            "modules_after_first_load": after_first_load, "modules_after_add_task": loaded_heavy_modules()}
+
+
+def run_page(source, reruns):
+    scratch = tempfile.mkdtemp(prefix="startup-report-")
+    try:
+        page = os.path.join(scratch, "page.py")
+        with open(page, "w", encoding="utf-8") as f:
+            f.write(source)
+        write_credentials(os.path.join(scratch, "credentials.json"))
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", page, "--reruns", str(reruns)],
+                                cwd=scratch, capture_output=True, text=True, encoding="utf-8")
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "worker failed")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--before", help="git revision of the page to compare against (default: first commit)")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Only this line goes to stdout; Streamlit logs to stderr.
+        print(json.dumps(worker(args.worker, args.reruns)))
+        return
+
+    before = args.before or subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=ROOT,
+                                           capture_output=True, text=True, check=True).stdout.split()[0]
+    sources = {
+        "before": subprocess.run(["git", "show", f"{before}:{PAGE}"], cwd=ROOT, capture_output=True,
+                                 check=True).stdout.decode("utf-8"),
+        "after": open(os.path.join(ROOT, PAGE), encoding="utf-8").read(),
+    }
+    report = {phase: run_page(source, args.reruns) for phase, source in sources.items()}
+
+    print(f"{'':<8}{'first load':>12}{'rerun':>12}{'add task':>12}")
+    for phase, result in report.items():
+        print(f"{phase:<8}" + "".join(f"{result[k] * 1000:9.1f} ms" for k in ("first_load_s", "rerun_s", "add_task_s")))
+    print()
+    for phase, result in report.items():
+        print(f"{phase} first load imported: {', '.join(result['modules_after_first_load']) or 'none'}")
+        late = [m for m in result["modules_after_add_task"] if m not in result["modules_after_first_load"]]
+        print(f"{phase} adding a task imported: {', '.join(late) or 'nothing more'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Load test for the storage backends: several app processes serve the same students at once, the
+way a multi-instance deployment would. Every simulated page rerun looks the student up, reads
+their conversation index and today's plan, and sometimes saves a chat turn, starts a new chat or
+adds a task. Reports reruns per second and the storage time per rerun for each backend and process
+count, then checks that no saved message, chat or task was lost and that the conversation index
+agrees with the chat logs. Exits with status 1 on any inconsistency. Redis runs against
+benchmarks/fake_redis.py unless --redis-url points at a real server. Run from the repository root:
+
+    python benchmarks/storage_load_test.py [--backends file sqlite redis] [--workers 1 2 4] [--reruns 300]
+
+By default the processes share two students and do nothing but storage calls (--think-ms 0), so
+their writes to the same index overlap and each index log is compacted several times during a run;
+reruns per second is then storage throughput. Pass --think-ms and --users to model real traffic.
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_store  # noqa: E402
+import plan_store  # noqa: E402
+import user_store  # noqa: E402
+from storage import create_storage, set_storage  # noqa: E402
+
+TODAY = datetime.date(2025, 1, 1).isoformat()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def chat_ids(user):
+    return [f"chat_20250101_{user:02d}{i:04d}" for i in range(3)]
+
+
+def seed(users):
+    for user in range(users):
+        username = f"student{user}"
+        user_store.create_user(username, "hash", "+91 0000000000")
+        for chat_id in chat_ids(user):
+            chat_store.create_chat(username, chat_id)
+
+
+def worker(job):
+    """
+    Runs `reruns` simulated page reruns in a fresh process; returns latencies and what it wrote.
+    """
+    os.chdir(job["directory"])
+    set_storage(create_storage(job["backend"], job["path"], job["url"]))
+    rng = random.Random(job["seed"])
+    latencies, appended, tasks, created = [], {}, {}, []
+    for i in range(job["reruns"]):
+        user = rng.randrange(job["users"])
+        username = f"student{user}"
+        start = time.perf_counter()
+        assert user_store.get_user(username) is not None
+        chat_store.get_chat_index(username)
+        plan_store.tasks_for_date(username, TODAY)
+        roll = rng.random()
+        if roll < 0.3:
+            chat_id = rng.choice(chat_ids(user))
+            chat_store.append_messages(username, chat_id, [{"role": "user", "parts": f"question {i}"},
+                                                           {"role": "model", "parts": f"answer {i}"}])
+            appended[(username, chat_id)] = appended.get((username, chat_id), 0) + 2
+        elif roll < 0.35:
+            chat_id = f"chat_20250102_{job['seed']:02d}{i:04d}"
+            chat_store.create_chat(username, chat_id)
+            created.append((username, chat_id))
+        elif roll < 0.4:
+            plan_store.add_task(username, {"id": f"task_{job['seed']}_{i}", "date": TODAY, "start": "09:00",
+                                           "end": "10:00", "title": "Revise", "priority": "Medium",
+                                           "done": False})
+            tasks[username] = tasks.get(username, 0) + 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        if job["think_ms"]:
+            time.sleep(job["think_ms"] / 1000)  # Time a rerun spends outside storage (rendering, the model).
+    return {"latencies": latencies, "appended": appended, "tasks": tasks, "created": created}
+
+
+def check(users, appended, tasks, created):
+    """
+    Returns a list of inconsistencies between what the workers wrote and what storage holds.
+    """
+    chat_store._index_cache.clear()
+    plan_store._plans_cache.clear()
+    problems = []
+    for user in range(users):
+        username = f"student{user}"
+        index = {entry["id"]: entry for entry in chat_store.get_chat_index(username)}
+        for chat_id in chat_ids(user):
+            expected = appended.get((username, chat_id), 0)
+            stored = chat_store.count_messages(username, chat_id)
+            indexed = index.get(chat_id, {}).get("messages")
+            if not expected == stored == indexed:
+                problems.append(f"{username}/{chat_id}: wrote {expected}, log has {stored}, index says {indexed}")
+        for owner, chat_id in created:
+            if owner == username and index.get(chat_id, {}).get("messages") != 0:
+                problems.append(f"{username}/{chat_id}: created, index has {index.get(chat_id)}")
+        listed = len(chat_store.list_chats(username))
+        if listed != len(index):
+            problems.append(f"{username}: {listed} chat logs, {len(index)} in the index")
+        stored_tasks = len(plan_store.tasks_for_date(username, TODAY))
+        if stored_tasks != tasks.get(username, 0):
+            problems.append(f"{username}: added {tasks.get(username, 0)} tasks, plan has {stored_tasks}")
+    return problems
+
+
+def run(backend, workers, args, url):
+    directory = tempfile.mkdtemp(prefix=f"storage-load-{backend}-")
+    os.chdir(directory)
+    path = os.path.join(directory, "storage.db") if backend == "sqlite" else None
+    storage = create_storage(backend, path, url)
+    if backend == "redis":
+        storage._execute(("FLUSHDB",))
+    set_storage(storage)
+    chat_store._index_cache.clear()
+    chat_store._search_synced.clear()
+    plan_store._plans_cache.clear()
+    seed(args.users)
+
+    jobs = [{"directory": directory, "backend": backend, "path": path, "url": url, "seed": n,
+             "users": args.users, "reruns": args.reruns, "think_ms": args.think_ms} for n in range(workers)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - start
+
+    latencies = [ms for result in results for ms in result["latencies"]]
+    appended, tasks = {}, {}
+    created = [chat for result in results for chat in result["created"]]
+    for result in results:
+        for chat, count in result["appended"].items():
+            appended[chat] = appended.get(chat, 0) + count
+        for username, count in result["tasks"].items():
+            tasks[username] = tasks.get(username, 0) + count
+    problems = check(args.users, appended, tasks, created)
+    print(f"{backend:>7}  {workers:>7}  {len(latencies) / elapsed:>9.1f}  {statistics.median(latencies):>9.2f}  "
+          f"{percentile(latencies, 95):>9.2f}  {'yes' if not problems else 'NO'}")
+    for problem in problems[:10]:
+        print(f"  {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["file", "sqlite", "redis"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--reruns", type=int, default=300, help="page reruns per worker process")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--think-ms", type=float, default=0, help="non-storage time per rerun")
+    parser.add_argument("--redis-url", help="a real Redis server to test instead of the fake one")
+    args = parser.parse_args()
+
+    url = args.redis_url
+    if "redis" in args.backends and url is None:
+        from fake_redis import start_server
+        url = f"redis://127.0.0.1:{start_server().server_address[1]}/0"
+
+    print(f"{'backend':>7}  {'workers':>7}  {'reruns/s':>9}  {'p50 ms':>9}  {'p95 ms':>9}  consistent")
+    ok = True
+    for backend in args.backends:
+        for workers in args.workers:
+            ok = run(backend, workers, args, url) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
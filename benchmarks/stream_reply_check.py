@@ -0,0 +1,145 @@
+"""
+Checks AI Assistant streaming against the fake Gemini model: stream_reply yields the chunks in
+order and fills in time-to-first-token and total latency, an error in the middle of an answer is
+recorded in metrics["error"] and re-raised, and the AI Tools page saves nothing to the chat when
+an answer breaks off. Exits with status 1 on any failure. Run from the repository root:
+
+    python benchmarks/stream_reply_check.py [--chunk-delay 0.02]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit  # noqa: E402,F401  (imported before the fakes so the real `google` namespace is kept)
+
+from benchmarks.fakes import FakeModel, FakeResponse, install_fake_calendar, install_fake_model  # noqa: E402
+from llm import stream_reply  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+
+AI_TOOLS = os.path.join(ROOT, "pages", "1_🤖_AI_Tools.py")
+
+
+class BrokenResponse(FakeResponse):
+    """
+    Streams `fail_after` chunks of a normal answer, then raises as a dropped connection would.
+    """
+
+    def __init__(self, text, prompt_chars, fail_after, **kwargs):
+        super().__init__(text, prompt_chars, **kwargs)
+        self.fail_after = fail_after
+
+    def __iter__(self):
+        for i, chunk in enumerate(super().__iter__()):
+            if i == self.fail_after:
+                raise RuntimeError("stream interrupted")
+            yield chunk
+
+
+class StreamingModel(FakeModel):
+    """
+    Streams its answers a few words at a time, `chunk_delay` seconds apart; with `fail_after` set,
+    every answer breaks off after that many chunks.
+    """
+
+    def __init__(self, chunk_delay=0.0, fail_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_delay = chunk_delay
+        self.fail_after = fail_after
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        response = super().generate_content(contents, stream, request_options)
+        if self.fail_after is not None:
+            return BrokenResponse(response.text, 0, self.fail_after, chunk_delay=self.chunk_delay)
+        return FakeResponse(response.text, 0, chunk_delay=self.chunk_delay)
+
+
+def make_gateway():
+    return LLMGateway(rate_per_minute=60000, burst=1000, max_workers=4, deadline=10)
+
+
+def check_stream(chunk_delay, failures):
+    model = StreamingModel(chunk_delay=chunk_delay, reply_words=40)
+    expected = list(FakeResponse(model.generate_content([]).text, 0))
+    metrics = {}
+    chunks = list(stream_reply(model.start_chat(), "Explain osmosis", metrics, gateway=make_gateway()))
+    if chunks != [chunk.text for chunk in expected]:
+        failures.append(f"chunks out of order or missing: got {len(chunks)}, expected {len(expected)}")
+    if metrics["ttft"] is None or metrics["total"] is None or not 0 < metrics["ttft"] <= metrics["total"]:
+        failures.append(f"ttft/total not filled in: {metrics}")
+    elif metrics["total"] < chunk_delay * len(expected):
+        failures.append(f"total {metrics['total']:.3f}s is shorter than the stream itself")
+    if metrics["error"] is not None or metrics["chars"] != sum(map(len, chunks)):
+        failures.append(f"unexpected metrics for a complete answer: {metrics}")
+    print(f"complete answer: {len(chunks)} chunks, ttft {metrics['ttft']:.3f}s, total {metrics['total']:.3f}s")
+
+
+def check_interrupted_stream(chunk_delay, failures):
+    model = StreamingModel(chunk_delay=chunk_delay, fail_after=3)
+    metrics = {}
+    received = []
+    try:
+        for chunk in stream_reply(model.start_chat(), "Explain osmosis", metrics, gateway=make_gateway()):
+            received.append(chunk)
+        failures.append("an interrupted stream ended without raising")
+    except RuntimeError as e:
+        if str(e) != "stream interrupted":
+            failures.append(f"wrong error re-raised: {e!r}")
+    if len(received) != 3:
+        failures.append(f"expected the 3 chunks sent before the error, got {len(received)}")
+    if metrics.get("error") != "stream interrupted" or metrics.get("total") is None:
+        failures.append(f"error or total missing from metrics: {metrics}")
+    print(f"interrupted answer: {len(received)} chunks, then error {metrics.get('error')!r}")
+
+
+def check_page_saves_nothing(failures):
+    from streamlit.testing.v1 import AppTest
+
+    import chat_store
+    import user_store
+
+    os.chdir(tempfile.mkdtemp(prefix="stream-reply-"))
+    install_fake_calendar()
+    install_fake_model(StreamingModel(fail_after=2))
+    user_store.create_user("student", hashlib.sha256(b"check").hexdigest(), "+91 0000000000")
+    chat_store.create_chat("student", "chat_20250101_000000")
+    chat_store.append_messages("student", "chat_20250101_000000", [{"role": "user", "parts": "Hi"},
+                                                                   {"role": "model", "parts": "Hello!"}])
+
+    at = AppTest.from_file(AI_TOOLS, default_timeout=60)
+    at.secrets["GEMINI_API_KEY"] = "fake"
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "student"
+    at.session_state["active_chat"] = "chat_20250101_000000"
+    at.run()
+    at.chat_input[0].set_value("Explain osmosis").run()
+    if at.exception:
+        failures.append(f"page raised instead of showing the error: {at.exception[0].message}")
+    if not any("couldn't finish" in e.value for e in at.error):
+        failures.append("page did not tell the student the answer broke off")
+    stored = chat_store.count_messages("student", "chat_20250101_000000")
+    if stored != 2:
+        failures.append(f"chat has {stored} messages after a broken answer, expected the original 2")
+    print(f"page after a broken answer: chat still has {stored} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between fake chunks")
+    args = parser.parse_args()
+    failures = []
+    check_stream(args.chunk_delay, failures)
+    check_interrupted_stream(args.chunk_delay, failures)
+    check_page_saves_nothing(failures)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
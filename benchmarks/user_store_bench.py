@@ -0,0 +1,90 @@
+"""
+Login latency of the user store on the file and SQLite storage backends versus the old
+whole-file users.json, as the number of accounts grows. Run from the repository root:
+
+    python benchmarks/user_store_bench.py [--sizes 1000 10000 100000] [--lookups 2000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_store  # noqa: E402
+from storage import FileBackend, SQLiteBackend  # noqa: E402
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def populate(backends, json_path, size):
+    users = {f"user{i}": {"password_hash": hash_password(f"pw{i}"), "mobile_number": "+91 0000000000"}
+             for i in range(size)}
+    with open(json_path, "w") as f:
+        json.dump(users, f, indent=4)
+    for storage in backends.values():
+        user_store.migrate_from_json(json_path, storage)
+        os.replace(json_path + ".migrated", json_path)
+
+
+def time_logins(login, size, lookups):
+    samples = []
+    for _ in range(lookups):
+        i = random.randrange(size)
+        start = time.perf_counter()
+        assert login(f"user{i}", f"pw{i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--json-lookups", type=int, default=20, help="logins timed against users.json")
+    args = parser.parse_args()
+
+    print(f"{'users':>8}  {'file p50 ms':>12}  {'file p95 ms':>12}  {'sqlite p50 ms':>14}  {'sqlite p95 ms':>14}  "
+          f"{'json p50 ms':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = {"file": FileBackend(os.path.join(tmp, "files")),
+                        "sqlite": SQLiteBackend(os.path.join(tmp, "storage.db"))}
+            json_path = os.path.join(tmp, "users.json")
+            populate(backends, json_path, size)
+
+            def storage_login(storage):
+                def login(username, password):
+                    user = user_store.get_user(username, storage)
+                    return user and user["password_hash"] == hash_password(password)
+                return login
+
+            def json_login(username, password):
+                with open(json_path, "r") as f:
+                    users = json.load(f)
+                return username in users and users[username]["password_hash"] == hash_password(password)
+
+            row = f"{size:>8}"
+            for name, storage in backends.items():
+                samples = time_logins(storage_login(storage), size, args.lookups)
+                width = len(name) + 7
+                row += f"  {statistics.median(samples):>{width}.3f}  {percentile(samples, 95):>{width}.3f}"
+            json_ms = time_logins(json_login, size, args.json_lookups)
+            print(f"{row}  {statistics.median(json_ms):>12.3f}")
+            backends["sqlite"]._connection().close()
+
+
+if __name__ == "__main__":
+    main()
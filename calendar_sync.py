@@ -0,0 +1,205 @@
+import datetime
+import hashlib
+import random
+import threading
+import time
+
+import plan_store
+
+# =================================================================================================
+# BACKGROUND GOOGLE CALENDAR SYNC
+# =================================================================================================
+# Planner tasks are queued here and a background thread sends them to the Calendar API in batch
+# requests, so adding a task never waits on a Calendar round-trip. Queueing a task again before
+# it has been sent just replaces the pending copy, and the event is built from the stored task
+# when it is sent, so it carries the latest edit. Failed sends are retried with backoff. The
+# Calendar client (and googleapiclient with it) is only built by the sync thread when the first
+# task is sent, so pages that never add a task do not pay for it.
+#
+# Sync state and the Calendar event id are saved on the task in plan_store, so any replica can
+# show them and a restarted process re-queues what was left unfinished. Each task is inserted
+# under an event id derived from the task, so an insert that is sent twice (its reply was lost,
+# or two processes resumed the same task) gets a 409 and is turned into an update instead of a
+# duplicate event.
+
+CALENDAR_SCOPES = ['https://www.googleapis.com/auth/calendar']
+CREDENTIALS_FILE = "credentials.json"
+MAX_BATCH_SIZE = 50  # Calendar API limit per batch request is 1000; keep batches small and quick.
+RETRYABLE_STATUS_CODES = {403, 429, 500, 502, 503, 504}
+CONFLICT = 409
+
+PENDING = "pending"
+SYNCING = "syncing"
+SYNCED = "synced"
+RETRYING = "retrying"
+FAILED = "failed"
+
+
+def task_to_event(task):
+    """
+    Builds a Calendar event body from a planner task. Times use the server's local UTC offset.
+    """
+    date = datetime.date.fromisoformat(task["date"])
+    start = datetime.datetime.combine(date, datetime.time.fromisoformat(task["start"])).astimezone()
+    end = datetime.datetime.combine(date, datetime.time.fromisoformat(task["end"])).astimezone()
+    return {
+        "summary": f"📚 {task['subject']}",
+        "description": f"{task['priority']} priority study task (AI Study Buddy)",
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    }
+
+
+def build_calendar_service(credentials_file=CREDENTIALS_FILE):
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    creds = service_account.Credentials.from_service_account_file(credentials_file, scopes=CALENDAR_SCOPES)
+    # build() parses the Calendar discovery document; the queue keeps the client for the process.
+    return build('calendar', 'v3', credentials=creds, cache_discovery=False)
+
+
+def calendar_event_id(username, task_id):
+    # Calendar event ids may use the characters 0-9 and a-v; hex digits qualify.
+    return hashlib.sha256(f"{username}/{task_id}".encode()).hexdigest()[:32]
+
+
+def _status_code(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _is_retryable(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is None:
+        return True  # Network-level failure; no HTTP response at all.
+    return int(status) in RETRYABLE_STATUS_CODES
+
+
+class CalendarSyncQueue:
+    def __init__(self, service_factory=build_calendar_service, calendar_id="primary", flush_interval=2.0,
+                 max_attempts=5, backoff_base=2.0, storage=None, resume=True):
+        self.service_factory = service_factory
+        self.service = None
+        self.calendar_id = calendar_id
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.storage = storage
+        self._pending = {}   # key -> {"attempts": ..., "not_before": ...}
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="calendar-sync", daemon=True)
+        self._thread.start()
+        if resume:
+            self.resume()
+
+    def resume(self):
+        """
+        Queues every task whose sync was left unfinished, e.g. by a restart. Returns how many.
+        """
+        tasks = plan_store.unfinished_syncs(self.storage)
+        for username, task_id in tasks:
+            self.enqueue(username, task_id)
+        return len(tasks)
+
+    def enqueue(self, username, task_id):
+        if plan_store.set_task_sync(username, task_id, True, self.storage, state=PENDING, error=None) is None:
+            return
+        with self._cond:
+            self._pending[(username, task_id)] = {"attempts": 0, "not_before": 0.0}
+            self._cond.notify()
+
+    def status(self, username, task_id):
+        task = plan_store.get_task(username, task_id, self.storage) or {}
+        return dict(task.get("sync") or {"state": None})
+
+    def flush(self, timeout=10.0):
+        """
+        Blocks until nothing is waiting to be sent (or `timeout` passes). Returns True if drained.
+        """
+        end = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending or self._in_flight:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def _take_batch(self):
+        now = time.monotonic()
+        batch = []
+        for key, item in list(self._pending.items()):
+            if item["not_before"] > now:
+                continue
+            del self._pending[key]
+            batch.append((key, item))
+            if len(batch) >= MAX_BATCH_SIZE:
+                break
+        self._in_flight += len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+                while not batch:
+                    self._cond.wait(self.flush_interval)
+                    batch = self._take_batch()
+            try:
+                self._send(batch)
+            except Exception as e:
+                # The batch request itself failed; every task in it gets retried.
+                for key, item in batch:
+                    self._finish(key, item, None, None, e)
+            finally:
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    self._cond.notify_all()
+
+    def _send(self, batch):
+        if self.service is None:
+            self.service = self.service_factory()
+        events = self.service.events()
+        request = self.service.new_batch_http_request()
+        for index, (key, item) in enumerate(batch):
+            task = plan_store.set_task_sync(*key, True, self.storage, state=SYNCING)
+            if task is None:
+                continue  # Deleted since it was queued.
+            event_id = task["sync"].get("event_id")
+            if event_id:
+                call = events.update(calendarId=self.calendar_id, eventId=event_id, body=task_to_event(task))
+            else:
+                event_id = calendar_event_id(*key)
+                call = events.insert(calendarId=self.calendar_id, body={**task_to_event(task), "id": event_id})
+
+            def callback(request_id, response, exception, key=key, item=item, event_id=event_id):
+                self._finish(key, item, event_id, response, exception)
+
+            request.add(call, callback=callback, request_id=str(index))
+        request.execute()
+
+    def _finish(self, key, item, event_id, response, error):
+        with self._cond:
+            superseded = key in self._pending  # A newer edit is queued; it will carry the latest data.
+            if error is not None and _status_code(error) == CONFLICT:
+                # Inserted before (a lost reply or another process): send it again as an update.
+                self._pending[key] = dict(item, not_before=0.0)
+                self._cond.notify()
+                changes, unfinished = {"state": PENDING, "event_id": event_id}, True
+            elif error is None:
+                changes = {"event_id": response.get("id", event_id), "error": None}
+                changes["state"], unfinished = (PENDING, True) if superseded else (SYNCED, False)
+            elif superseded:
+                changes, unfinished = {"state": PENDING}, True
+            else:
+                attempts = item["attempts"] + 1
+                changes, unfinished = {"state": FAILED, "error": str(error)}, False
+                if _is_retryable(error) and attempts < self.max_attempts:
+                    delay = random.uniform(0.5, 1.0) * self.backoff_base ** attempts
+                    self._pending[key] = {"attempts": attempts, "not_before": time.monotonic() + delay}
+                    changes, unfinished = {"state": RETRYING, "error": str(error)}, True
+            self._cond.notify_all()
+        plan_store.set_task_sync(*key, unfinished, self.storage, **changes)
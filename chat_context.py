@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import get_gateway
+
+# =================================================================================================
+# TOKEN-BUDGETED CONVERSATION CONTEXT
+# =================================================================================================
+# Keeps what is sent to Gemini under a token budget however long the conversation gets: the most
+# recent turns are sent verbatim and older ones are folded into a rolling summary. Folding happens
+# as soon as the budget is exceeded; the summary itself is written by a background thread, so no
+# user request ever waits for it. Folded turns are dropped from memory once summarized; pages that
+# need to show them keep a transcript elsewhere (see session_memory.ChatWindow).
+
+SUMMARY_MAX_TOKENS = 300
+FALLBACK_SNIPPET_CHARS = 160
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+SUMMARY_PROMPT = """Summarize the earlier part of a conversation between a student and 'Pebble', a supportive study companion.
+Keep what matters for continuing the conversation: what the student is feeling, their stressors and circumstances,
+and the advice or coping strategies already suggested. Write at most 120 words in the third person.
+
+Summary so far:
+{summary}
+
+New turns to add:
+{turns}
+"""
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text; good enough for budgeting.
+    return max(1, len(text) // 4)
+
+
+def merge_roles(contents):
+    """
+    Joins consecutive contents from the same role so user and model turns strictly alternate.
+    """
+    merged = []
+    for content in contents:
+        if merged and merged[-1]["role"] == content["role"]:
+            merged[-1] = {"role": content["role"], "parts": merged[-1]["parts"] + content["parts"]}
+        else:
+            merged.append(content)
+    return merged
+
+
+def summarize_turns(model, summary, turns):
+    transcript = "\n".join(f"{'Student' if t['role'] == 'user' else 'Pebble'}: {t['text']}" for t in turns)
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", turns=transcript)
+    return get_gateway().call(model.generate_content, prompt).text.strip()
+
+
+class ConversationContext:
+    def __init__(self, token_budget=2000, recent_turns=6, pinned=()):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.pinned = list(pinned)
+        self.pinned_tokens = sum(estimate_tokens(p) for c in self.pinned for p in c["parts"])
+        self.turns = []          # the verbatim window: {"role", "text", "tokens"}
+        self.summary = ""
+        self._unsummarized = []  # folded turns the summary does not cover yet
+        self._summarizing = None
+        self._lock = threading.Lock()
+
+    def add(self, role, text):
+        with self._lock:
+            self.turns.append({"role": role, "text": text, "tokens": estimate_tokens(text)})
+
+    def _summary_contents(self):
+        if not self.summary:
+            return []
+        return [{"role": "user", "parts": [f"(Context from earlier in our conversation: {self.summary})"]},
+                {"role": "model", "parts": ["Thanks, I remember."]}]
+
+    def request_contents(self, prompt):
+        """
+        Returns the contents to send for `prompt`: pinned turns, the summary, the verbatim window
+        and the new message.
+        """
+        with self._lock:
+            window = [{"role": t["role"], "parts": [t["text"]]} for t in self.turns]
+            return merge_roles(self.pinned + self._summary_contents() + window + [{"role": "user", "parts": [prompt]}])
+
+    def request_tokens(self, prompt=""):
+        with self._lock:
+            return (self.pinned_tokens + (estimate_tokens(self.summary) if self.summary else 0)
+                    + sum(t["tokens"] for t in self.turns) + estimate_tokens(prompt))
+
+    def compact(self, summarize):
+        """
+        Folds the oldest verbatim turns out of the window while the context is over budget,
+        always keeping the last `recent_turns`, and hands them to `summarize(summary, turns)` on
+        a background thread.
+        """
+        with self._lock:
+            fixed = self.pinned_tokens + max(estimate_tokens(self.summary) if self.summary else 0, SUMMARY_MAX_TOKENS)
+            window_tokens = sum(t["tokens"] for t in self.turns)
+            cut = 0
+            last_cut = len(self.turns) - self.recent_turns
+            while fixed + window_tokens > self.token_budget and cut < last_cut:
+                window_tokens -= self.turns[cut]["tokens"]
+                cut += 1
+            # Start the window on a student turn so it lines up after the summary exchange.
+            while 0 < cut < len(self.turns) and self.turns[cut]["role"] != "user":
+                window_tokens -= self.turns[cut]["tokens"]
+                cut += 1
+            if cut == 0:
+                return
+            self._unsummarized.extend(self.turns[:cut])
+            del self.turns[:cut]
+            if self._summarizing is None:
+                self._start_summary(summarize)
+
+    def _start_summary(self, summarize):
+        turns, self._unsummarized = self._unsummarized, []
+        previous = self.summary
+        self._summarizing = _summary_executor.submit(self._summarize, summarize, previous, turns)
+
+    def _summarize(self, summarize, previous, turns):
+        try:
+            summary = summarize(previous, turns)
+        except Exception:
+            # Keep going without the model: carry a clipped excerpt of what the student said.
+            snippets = [t["text"][:FALLBACK_SNIPPET_CHARS] for t in turns if t["role"] == "user"]
+            summary = " ".join(filter(None, [previous, "The student also said: " + " / ".join(snippets)]))
+        max_chars = SUMMARY_MAX_TOKENS * 4
+        with self._lock:
+            self.summary = summary if len(summary) <= max_chars else summary[-max_chars:]
+            self._summarizing = None
+            if self._unsummarized:
+                self._start_summary(summarize)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until no summary is being written. Only needed by tools and benchmarks.
+        """
+        while True:
+            with self._lock:
+                future = self._summarizing
+            if future is None:
+                return
+            future.result(timeout)
@@ -0,0 +1,156 @@
+import re
+import sqlite3
+import threading
+
+from instrumentation import span
+
+# =================================================================================================
+# CHAT SEARCH INDEX
+# =================================================================================================
+# Every user has a full-text index (SQLite FTS5, an inverted index with BM25 ranking) over their
+# saved messages, in a local database file (see chat_store.search_db_path). The chat store adds each
+# turn to it as the turn is saved, so a search is one indexed query and never opens a chat file.
+# Each message is stored with its position in the conversation, so a hit can be scrolled into view.
+
+SEARCH_DB_EXT = ".db"
+SNIPPET_WORDS = 16
+SNIPPET_MARK = "**"
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5 (
+    text,
+    chat_id UNINDEXED,
+    seq UNINDEXED,
+    role UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id  TEXT PRIMARY KEY,
+    messages INTEGER NOT NULL
+);
+"""
+
+
+def get_connection(db_path):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if db_path not in connections:
+        conn = sqlite3.connect(db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[db_path] = conn
+    conn = connections[db_path]
+    if db_path not in _initialized:
+        with _init_lock:
+            if db_path not in _initialized:
+                conn.executescript(SCHEMA)
+                _initialized.add(db_path)
+    return conn
+
+
+def message_text(message):
+    parts = message.get("parts", "")
+    if isinstance(parts, list):
+        return " ".join(p for p in parts if isinstance(p, str))
+    return parts if isinstance(parts, str) else ""
+
+
+def index_messages(db_path, chat_id, messages, start=None, total=None):
+    """
+    Adds `messages` to the index as positions start, start + 1, ... of the conversation. By default
+    they follow the messages already indexed for the chat. `total` overrides the message count
+    recorded for the chat (used when re-indexing a log with unreadable lines).
+    """
+    conn = get_connection(db_path)
+    with span("search.index"), conn:
+        if start is None:
+            row = conn.execute("SELECT messages FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+            start = row["messages"] if row else 0
+        conn.executemany("INSERT INTO messages (text, chat_id, seq, role) VALUES (?, ?, ?, ?)",
+                         [(message_text(m), chat_id, start + i, m.get("role", "")) for i, m in enumerate(messages)])
+        conn.execute("INSERT INTO chats (chat_id, messages) VALUES (?, ?) "
+                     "ON CONFLICT(chat_id) DO UPDATE SET messages = excluded.messages",
+                     (chat_id, start + len(messages) if total is None else total))
+
+
+def remove_chat(db_path, chat_id):
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+        conn.execute("DELETE FROM chats WHERE chat_id = ?", (chat_id,))
+
+
+def indexed_counts(db_path):
+    """
+    Returns {chat_id: number of messages indexed}.
+    """
+    rows = get_connection(db_path).execute("SELECT chat_id, messages FROM chats").fetchall()
+    return {row["chat_id"]: row["messages"] for row in rows}
+
+
+def build_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match, and the last one may be a prefix
+    of a word so results show up while the student is still typing.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def make_snippet(text, words, context_words=SNIPPET_WORDS):
+    """
+    Returns about `context_words` words of `text` around the first word starting with one of
+    `words`, with every such word marked.
+    """
+    tokens = text.split()
+
+    def matches(token):
+        token = re.sub(r"\W+", "", token.lower())
+        return any(token.startswith(w) for w in words)
+    first = next((i for i, token in enumerate(tokens) if matches(token)), 0)
+    start = max(0, first - context_words // 3)
+    shown = [f"{SNIPPET_MARK}{t}{SNIPPET_MARK}" if matches(t) else t for t in tokens[start:start + context_words]]
+    return ("…" if start > 0 else "") + " ".join(shown) + ("…" if start + context_words < len(tokens) else "")
+
+
+def search(db_path, text, limit=10):
+    """
+    Returns the best-matching conversations for `text`, best first, as dicts with chat_id, the
+    position (seq) and role of the best-matching message, a snippet with the matches marked, and
+    how many of the top-ranked messages came from that conversation.
+    """
+    query = build_query(text)
+    if query is None:
+        return []
+    with span("search.query") as s:
+        conn = get_connection(db_path)
+        rows = conn.execute("SELECT rowid, chat_id, seq, role FROM messages WHERE messages MATCH ? ORDER BY rank LIMIT ?",
+                            (query, limit * 20)).fetchall()
+        results = {}
+        for row in rows:
+            hit = results.get(row["chat_id"])
+            if hit is None:
+                if len(results) < limit:
+                    results[row["chat_id"]] = {"chat_id": row["chat_id"], "seq": row["seq"], "role": row["role"],
+                                               "rowid": row["rowid"], "hits": 1}
+            else:
+                hit["hits"] += 1
+        # Snippets are only built for the messages that are shown.
+        hits = list(results.values())
+        rowids = [hit.pop("rowid") for hit in hits]
+        texts = dict(conn.execute(f"SELECT rowid, text FROM messages WHERE rowid IN ({', '.join('?' * len(rowids))})",
+                                  rowids).fetchall()) if rowids else {}
+        words = re.findall(r"\w+", text.lower())
+        for hit, rowid in zip(hits, rowids):
+            hit["snippet"] = make_snippet(texts.get(rowid, ""), words)
+        s["results"] = len(hits)
+    return hits
@@ -0,0 +1,369 @@
+import datetime
+import json
+import os
+import threading
+import time
+import urllib.parse
+import uuid
+
+import chat_search
+from instrumentation import span
+from storage import get_storage, key
+
+# =================================================================================================
+# APPEND-ONLY CHAT LOG STORAGE
+# =================================================================================================
+# Each conversation is a log of messages at chats/<username>/<chat_id> in the shared storage
+# backend (see storage.py; with the file backend that is chats/<username>/<chat_id>.jsonl).
+# Saving a turn appends its messages in one write, so the cost does not depend on how long the
+# conversation already is.
+#
+# A per-user conversation index (id, title, last update, message count) is kept the same way in
+# the chats/<username>/_index log: every create / append / delete adds one record, and the
+# in-process copy only reads records added since it was last refreshed, including those written
+# by other app processes. Appends record how many messages they added rather than a total, so
+# concurrent writers never lose each other's counts. Once the log is mostly superseded records it
+# is compacted with storage's replace_head, which keeps anything appended meanwhile and fails
+# if another process compacted first; every compaction starts the log with a fresh header, which
+# is how other processes notice it.
+#
+# Chat ids starting with "_" are unlisted: they are stored the same way but never appear in the
+# index (e.g. Pebble's per-session transcripts).
+#
+# Transient chats (see session_memory.ChatWindow) are deleted when their session ends. They are
+# also registered under transient_chats/ with the time they were last written, so that a process
+# that crashed or restarted before deleting them does not leave them behind: the next startup
+# sweeps every transient chat idle for longer than TRANSIENT_MAX_IDLE_SECONDS.
+#
+# Listed chats are also added to a full-text search index (see chat_search) as they are saved.
+# That index is local to each process and catches up with chats saved elsewhere when searched.
+
+CHATS = "chats"
+INDEX_LOG = "_index"
+LEGACY_CHATS_DIR = "chats"
+LEGACY_CHAT_EXT = ".json"
+SEARCH_INDEX_DIR = "search_index"
+TITLE_LENGTH = 40
+TRANSIENT_CHATS = "transient_chats"
+TRANSIENT_MAX_IDLE_SECONDS = 6 * 60 * 60
+
+_index_cache = {}
+_index_lock = threading.Lock()
+_search_synced = {}  # username -> index log position the search index was last checked against
+
+
+def chat_log(username, chat_id):
+    return key(CHATS, username, chat_id)
+
+
+def _index_log(username):
+    return key(CHATS, username, INDEX_LOG)
+
+
+def is_unlisted(chat_id):
+    return chat_id.startswith("_")
+
+
+def _payload_bytes(messages):
+    """
+    Size of the messages as stored: one JSON line each.
+    """
+    return sum(len(json.dumps(m, ensure_ascii=False).encode("utf-8")) + 1 for m in messages)
+
+
+def create_chat(username, chat_id):
+    get_storage().append(chat_log(username, chat_id), [])
+    if not is_unlisted(chat_id):
+        _update_index(username, chat_id, title="", messages=0)
+
+
+def append_messages(username, chat_id, messages):
+    with span("chat.append") as s:
+        get_storage().append(chat_log(username, chat_id), messages)
+        s["records"] = len(messages)
+        if s.recording:
+            s["bytes"] = _payload_bytes(messages)
+    if not is_unlisted(chat_id):
+        _update_index(username, chat_id, added=messages)
+        chat_search.index_messages(search_db_path(username), chat_id, messages)
+
+
+def read_messages(username, chat_id, start=0, stop=None):
+    """
+    Returns messages[start:stop] of a conversation; only that range is decoded.
+    """
+    with span("chat.read") as s:
+        messages = [m for m in get_storage().read(chat_log(username, chat_id), start, stop) if m is not None]
+        s["records"] = len(messages)
+        if s.recording:
+            s["bytes"] = _payload_bytes(messages)
+    return messages
+
+
+def load_chat(username, chat_id):
+    return read_messages(username, chat_id)
+
+
+def count_messages(username, chat_id):
+    return get_storage().length(chat_log(username, chat_id))
+
+
+def read_tail(username, chat_id, count):
+    """
+    Returns (last `count` messages, total message count), without reading the rest of the
+    conversation into memory.
+    """
+    total = count_messages(username, chat_id)
+    return read_messages(username, chat_id, max(0, total - count)), total
+
+
+def read_message_range(username, chat_id, start, stop):
+    return read_messages(username, chat_id, start, stop)
+
+
+def delete_chat(username, chat_id):
+    get_storage().drop(chat_log(username, chat_id))
+    if not is_unlisted(chat_id):
+        _update_index(username, chat_id, deleted=True)
+        chat_search.remove_chat(search_db_path(username), chat_id)
+
+
+def _transient_key(username, chat_id):
+    return key(TRANSIENT_CHATS, key(username, chat_id))
+
+
+def touch_transient_chat(username, chat_id):
+    get_storage().put(_transient_key(username, chat_id),
+                      {"username": username, "chat_id": chat_id, "touched": time.time()})
+
+
+def create_transient_chat(username, chat_id):
+    touch_transient_chat(username, chat_id)
+    create_chat(username, chat_id)
+
+
+def delete_transient_chat(username, chat_id):
+    delete_chat(username, chat_id)
+    get_storage().delete(_transient_key(username, chat_id))
+
+
+def sweep_transient_chats(max_idle=TRANSIENT_MAX_IDLE_SECONDS, now=None):
+    """
+    Deletes transient chats not written for `max_idle` seconds, whose session is gone or long idle.
+    Returns how many were deleted.
+    """
+    now = time.time() if now is None else now
+    swept = 0
+    for entry in get_storage().scan(TRANSIENT_CHATS).values():
+        if now - entry["touched"] >= max_idle:
+            delete_transient_chat(entry["username"], entry["chat_id"])
+            swept += 1
+    return swept
+
+
+def list_chats(username):
+    return [chat_id for chat_id in get_storage().logs(key(CHATS, username)) if not is_unlisted(chat_id)]
+
+
+def migrate_legacy_chats(username):
+    """
+    Converts the user's old whole-file chats/<username>/chat_*.json histories into chat logs. Each
+    log is written in full before the old file is removed, so an interrupted migration is simply
+    redone on the next call. Returns the number of chats converted.
+    """
+    legacy_dir = os.path.join(LEGACY_CHATS_DIR, username)
+    try:
+        filenames = os.listdir(legacy_dir)
+    except FileNotFoundError:
+        return 0
+    migrated = 0
+    for filename in filenames:
+        if not filename.endswith(LEGACY_CHAT_EXT):
+            continue
+        legacy_path = os.path.join(legacy_dir, filename)
+        chat_id = filename[:-len(LEGACY_CHAT_EXT)]
+        try:
+            with open(legacy_path, "r") as f:
+                messages = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue  # Leave unreadable files in place rather than replacing them with an empty log.
+        if not isinstance(messages, list):
+            continue
+        updated = os.path.getmtime(legacy_path)
+        get_storage().replace(chat_log(username, chat_id), messages)
+        os.remove(legacy_path)
+        _update_index(username, chat_id, title="", messages=0, added=messages, updated=updated)
+        migrated += 1
+    return migrated
+
+
+# =================================================================================================
+# CONVERSATION INDEX
+# =================================================================================================
+def _title_for(messages):
+    for message in messages:
+        if message.get("role") == "user" and isinstance(message.get("parts"), str) and message["parts"].strip():
+            title = " ".join(message["parts"].split())
+            return title if len(title) <= TITLE_LENGTH else title[:TITLE_LENGTH - 1] + "…"
+    return ""
+
+
+def _created_from_id(chat_id):
+    try:
+        return datetime.datetime.strptime(chat_id, "chat_%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _rebuild_index(username):
+    """
+    Builds the index from the chat logs themselves; used once when a user has no index yet.
+    """
+    entries = {}
+    for chat_id in list_chats(username):
+        entries[chat_id] = {"id": chat_id, "title": _title_for(read_messages(username, chat_id, 0, 20)),
+                            "updated": _created_from_id(chat_id), "messages": count_messages(username, chat_id)}
+    if _write_snapshot(username, entries, 0, None):
+        return entries
+    return _load_index(username)  # Another process wrote the index first.
+
+
+def _write_snapshot(username, entries, position, head):
+    """
+    Replaces the first `position` records of the index log, whose first record is `head`, with one
+    record per entry, keeping whatever other processes appended after them. Returns False, changing
+    nothing, if another process compacted the log first.
+    """
+    header = {"compacted": uuid.uuid4().hex, "time": time.time()}
+    records = [header] + [dict(entry) for entry in entries.values()]
+    if not get_storage().replace_head(_index_log(username), position, records, head):
+        return False
+    _index_cache[username] = {"entries": entries, "position": len(records), "records": len(records), "head": header}
+    return True
+
+
+def _fold(entries, record):
+    if record is None or "id" not in record:
+        return  # A torn line, or the header of a compacted log.
+    if record.get("deleted"):
+        entries.pop(record["id"], None)
+    elif "messages" in record:
+        entries[record["id"]] = {name: record[name] for name in ("id", "title", "updated", "messages")}
+    else:
+        entry = entries.setdefault(record["id"], {"id": record["id"], "title": "", "updated": 0.0, "messages": 0})
+        entry["messages"] += record.get("added", 0)
+        entry["title"] = entry["title"] or record.get("title", "")
+        entry["updated"] = max(entry["updated"], record["updated"])
+
+
+def _load_index(username):
+    """
+    Returns the cached index for `username`, first applying any records other sessions or
+    processes appended since the last call. Must be called with _index_lock held.
+    """
+    storage = get_storage()
+    log = _index_log(username)
+    cached = _index_cache.get(username)
+    if cached is not None:
+        records = storage.read(log, cached["position"])
+        head = storage.read(log, 0, 1)
+        # Compaction always writes a new first record, so an unchanged one means the records just
+        # read follow the ones already applied.
+        if (head[0] if head else None) == cached["head"]:
+            for record in records:
+                _fold(cached["entries"], record)
+            cached["position"] += len(records)
+            cached["records"] += len(records)
+            return cached["entries"]
+    records = storage.read(log)
+    if not records:
+        return _rebuild_index(username)
+    cached = _index_cache[username] = {"entries": {}, "position": len(records), "records": len(records),
+                                       "head": records[0]}
+    for record in records:
+        _fold(cached["entries"], record)
+    return cached["entries"]
+
+
+def _update_index(username, chat_id, title=None, messages=None, added=(), deleted=False, updated=None):
+    """
+    Appends one record to the index log. A record sets the message count only when `messages` is
+    given (a new or migrated chat); otherwise it carries the number of messages added, so
+    processes saving to the same chat at once add up instead of overwriting each other's counts.
+    """
+    with _index_lock:
+        if username not in _index_cache:
+            _load_index(username)  # Builds the index from the chat logs if the user has none yet.
+        if deleted:
+            record = {"id": chat_id, "deleted": True}
+        elif messages is not None:
+            record = {"id": chat_id, "title": title or _title_for(added), "updated": updated or time.time(),
+                      "messages": messages + len(added)}
+        else:
+            record = {"id": chat_id, "added": len(added), "updated": updated or time.time()}
+            entry = _index_cache[username]["entries"].get(chat_id)
+            if not (entry and entry["title"]):
+                record["title"] = title or _title_for(added)
+        get_storage().append(_index_log(username), [record])
+        entries = _load_index(username)
+        # Compact once superseded records clearly outnumber live ones.
+        cached = _index_cache[username]
+        if cached["records"] > 2 * len(entries) + 50:
+            _write_snapshot(username, dict(entries), cached["position"], cached["head"])
+
+
+def get_chat_index(username):
+    """
+    Returns the user's conversations, most recently updated first, without opening any chat log.
+    """
+    with _index_lock:
+        entries = list(_load_index(username).values())
+    return sorted(entries, key=lambda e: e["updated"], reverse=True)
+
+
+# =================================================================================================
+# SEARCH
+# =================================================================================================
+def search_db_path(username):
+    os.makedirs(SEARCH_INDEX_DIR, exist_ok=True)
+    return os.path.join(SEARCH_INDEX_DIR, urllib.parse.quote(username, safe="") + chat_search.SEARCH_DB_EXT)
+
+
+def sync_search_index(username):
+    """
+    Indexes any conversation whose indexed message count differs from the conversation index,
+    e.g. chats saved before search existed, migrated from legacy files or saved by another app
+    process. Returns how many chats were (re)indexed; when nothing changed no chat log is read.
+    """
+    db_path = search_db_path(username)
+    with _index_lock:
+        entries = _load_index(username)
+        cached = _index_cache[username]
+        version = (cached["head"], cached["position"])
+        if _search_synced.get(username) == version:
+            return 0  # No chat was saved, added or deleted since the last check.
+        counts = {chat_id: entry["messages"] for chat_id, entry in entries.items()}
+    indexed = chat_search.indexed_counts(db_path)
+    stale = [chat_id for chat_id, count in counts.items() if indexed.get(chat_id) != count]
+    for chat_id in stale:
+        if chat_id in indexed:
+            chat_search.remove_chat(db_path, chat_id)
+        chat_search.index_messages(db_path, chat_id, load_chat(username, chat_id), start=0, total=counts[chat_id])
+    for chat_id in indexed.keys() - counts.keys():
+        chat_search.remove_chat(db_path, chat_id)
+    _search_synced[username] = version
+    return len(stale)
+
+
+def search_chats(username, text, limit=10):
+    """
+    Ranked full-text search over the user's saved conversations. Each result carries the chat's
+    index entry (id, title, updated, messages) plus the best-matching message's position and a
+    snippet (see chat_search.search).
+    """
+    sync_search_index(username)
+    with _index_lock:
+        entries = _load_index(username)
+        results = [dict(entries[hit["chat_id"]], **hit) for hit in chat_search.search(search_db_path(username), text, limit)
+                   if hit["chat_id"] in entries]
+    return results
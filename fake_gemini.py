@@ -0,0 +1,76 @@
+import time
+
+# =================================================================================================
+# LOCAL STAND-IN FOR GEMINI
+# =================================================================================================
+# A model with the parts of the google.generativeai GenerativeModel interface the app uses
+# (generate_content, streamed or not, start_chat and usage metadata). It answers every prompt with
+# a fixed-length reply after a set latency, so batch_answers.py --fake-model and the benchmarks run
+# without an API key or network access.
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeChunk:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_chars, chunk_words=4, chunk_delay=0.0):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt_chars // 4, len(text) // 4)
+        self._chunk_words = chunk_words
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self):
+        words = self.text.split(" ")
+        for i in range(0, len(words), self._chunk_words):
+            time.sleep(self._chunk_delay)
+            yield FakeChunk(" ".join(words[i:i + self._chunk_words]) + " ", self.usage_metadata)
+
+
+def _chars(contents):
+    if isinstance(contents, str):
+        return len(contents)
+    total = 0
+    for content in contents:
+        parts = content["parts"] if isinstance(content, dict) else [content]
+        total += sum(len(p) if isinstance(p, str) else 0 for p in (parts if isinstance(parts, list) else [parts]))
+    return total
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        response = self.model.generate_content(self.history + [{"role": "user", "parts": [prompt]}])
+        self.history += [{"role": "user", "parts": [prompt]}, {"role": "model", "parts": [response.text]}]
+        return response
+
+
+class FakeModel:
+    """
+    Answers every prompt with a fixed-length reply after `latency` seconds.
+    """
+
+    def __init__(self, latency=0.0, reply_words=80):
+        self.latency = latency
+        self.reply_words = reply_words
+        self.calls = 0
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history)
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        text = " ".join(f"word{i}" for i in range(self.reply_words))
+        return FakeResponse(text, _chars(contents))
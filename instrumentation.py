@@ -0,0 +1,213 @@
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =================================================================================================
+# INSTRUMENTATION
+# =================================================================================================
+# Hot paths are wrapped in spans (`with span("chat.append") as s:` or `@instrumented("user.lookup")`)
+# that record duration, errors and any numeric fields set on them (bytes, tokens, ...). Sampled
+# spans are aggregated for a Prometheus text endpoint and, optionally, written to a rotating JSONL
+# log. Everything is off unless METRICS_ENABLED=1; a disabled span costs one flag check.
+#
+#   METRICS_ENABLED=1         turn recording on
+#   METRICS_SAMPLE_RATE=0.1   fraction of spans and observed events recorded (default 1.0)
+#   METRICS_PORT=9464         serve Prometheus text at http://<host>:9464/metrics
+#   METRICS_LOG=metrics.jsonl append one JSON line per span (rotated at 10 MB, 5 backups)
+
+METRIC_PREFIX = "studybuddy"
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOG_MAX_BYTES = 10 * 2 ** 20
+LOG_BACKUPS = 5
+
+_enabled = False
+_sample_rate = 1.0
+_logger = None
+_server = None
+_lock = threading.Lock()
+_spans = {}  # name -> {"count", "errors", "sum", "buckets": [...], "fields": {field: total}}
+
+
+class _NullSpan(dict):
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(dict):
+    recording = True
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only real errors count; st.rerun() / st.stop() unwind with BaseException subclasses.
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        _record(self.name, time.perf_counter() - self._start, error=error, **self)
+        return False
+
+
+def configure(enabled=None, sample_rate=None, log_path=None, port=None):
+    """
+    Sets up recording; arguments left as None are read from the METRICS_* environment variables.
+    """
+    global _enabled, _sample_rate, _logger
+    if enabled is None:
+        enabled = os.environ.get("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("METRICS_SAMPLE_RATE", 1.0))
+    log_path = log_path or os.environ.get("METRICS_LOG")
+    port = port or os.environ.get("METRICS_PORT")
+    with _lock:
+        _sample_rate = sample_rate
+        if enabled and log_path and _logger is None:
+            _logger = logging.getLogger("studybuddy.metrics")
+            _logger.propagate = False
+            _logger.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+        _enabled = enabled
+    if enabled and port:
+        start_metrics_server(int(port))
+
+
+def _sampled():
+    return _enabled and (_sample_rate >= 1.0 or random.random() < _sample_rate)
+
+
+def span(name):
+    """
+    Times the enclosed block. Numeric values assigned on the span (s["bytes"] = n) are summed
+    per span name; `s.recording` is False when the block is not sampled, so costly values can be
+    skipped.
+    """
+    if not _sampled():
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def instrumented(name=None):
+    """
+    Decorator form of `span` for functions; the span defaults to module.function.
+    """
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds=None, error=False, **fields):
+    """
+    Records one already-measured event (e.g. token counts reported by the model), sampled at
+    METRICS_SAMPLE_RATE like spans.
+    """
+    if _sampled():
+        _record(name, seconds, error, **fields)
+
+
+def _record(name, seconds=None, error=False, **fields):
+    with _lock:
+        stats = _spans.setdefault(name, {"count": 0, "errors": 0, "sum": 0.0,
+                                         "buckets": [0] * len(DURATION_BUCKETS), "fields": {}})
+        stats["count"] += 1
+        stats["errors"] += bool(error)
+        if seconds is not None:
+            stats["sum"] += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+        for field, value in fields.items():
+            if isinstance(value, (int, float)):
+                stats["fields"][field] = stats["fields"].get(field, 0) + value
+    if _logger is not None:
+        _logger.info(json.dumps({"ts": time.time(), "span": name, "seconds": seconds, "error": bool(error), **fields},
+                                default=str))
+
+
+def render_prometheus():
+    lines = [f"# HELP {METRIC_PREFIX}_span_duration_seconds Duration of sampled spans.",
+             f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram"]
+    with _lock:
+        spans = {name: {**s, "buckets": list(s["buckets"]), "fields": dict(s["fields"])} for name, s in _spans.items()}
+    for name, s in sorted(spans.items()):
+        for bound, count in zip(DURATION_BUCKETS, s["buckets"]):
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {s["count"]}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{span="{name}"}} {s["sum"]}')
+        lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{span="{name}"}} {s["count"]}')
+    lines += [f"# HELP {METRIC_PREFIX}_span_errors_total Sampled spans that raised.",
+              f"# TYPE {METRIC_PREFIX}_span_errors_total counter"]
+    lines += [f'{METRIC_PREFIX}_span_errors_total{{span="{name}"}} {s["errors"]}' for name, s in sorted(spans.items())]
+    fields = sorted({field for s in spans.values() for field in s["fields"]})
+    for field in fields:
+        lines += [f"# HELP {METRIC_PREFIX}_{field}_total Sum of '{field}' over sampled spans.",
+                  f"# TYPE {METRIC_PREFIX}_{field}_total counter"]
+        lines += [f'{METRIC_PREFIX}_{field}_total{{span="{name}"}} {s["fields"][field]}'
+                  for name, s in sorted(spans.items()) if field in s["fields"]]
+    lines += [f"# HELP {METRIC_PREFIX}_sample_rate Fraction of spans recorded.",
+              f"# TYPE {METRIC_PREFIX}_sample_rate gauge", f"{METRIC_PREFIX}_sample_rate {_sample_rate}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    """
+    Serves /metrics on `port` from a daemon thread; later calls are no-ops.
+    """
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError:
+            return None  # Another worker process on this host already serves the port.
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+
+configure()
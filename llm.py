@@ -0,0 +1,100 @@
+import time
+
+from instrumentation import observe
+from llm_gateway import get_gateway
+
+# =================================================================================================
+# CHAT SESSIONS
+# =================================================================================================
+def normalize_history(messages):
+    """
+    Maps stored roles onto the ones Gemini accepts ("user" / "model"). Older chat files saved
+    replies with role "assistant".
+    """
+    return [{"role": "user" if m.get("role") == "user" else "model", "parts": m.get("parts", "")} for m in messages]
+
+
+def to_gemini_history(messages):
+    return [{"role": m["role"], "parts": m["parts"] if isinstance(m["parts"], list) else [m["parts"]]}
+            for m in normalize_history(messages)]
+
+
+def get_chat_session(session_state, model, username, chat_name, history, max_history=None):
+    """
+    Returns the live Gemini chat for (username, chat_name), starting it from `history` only the
+    first time it is needed in this browser session. Other chats' sessions are left untouched.
+    Once a live chat holds more than `max_history` messages it is restarted from `history`, so it
+    cannot grow without bound.
+    """
+    sessions = session_state.setdefault("chat_sessions", {})
+    key = (username, chat_name)
+    chat = sessions.get(key)
+    if chat is None or (max_history is not None and len(chat.history) > max_history):
+        chat = sessions[key] = model.start_chat(history=to_gemini_history(history))
+    return chat
+
+
+def drop_chat_session(session_state, username, chat_name):
+    session_state.setdefault("chat_sessions", {}).pop((username, chat_name), None)
+
+
+# =================================================================================================
+# GEMINI RESPONSE STREAMING
+# =================================================================================================
+MAX_METRICS_PER_SESSION = 50
+
+
+def stream_reply(chat, prompt, metrics, gateway=None):
+    """
+    Sends `prompt` on a Gemini chat session through the shared gateway with streaming on and
+    yields text chunks as they arrive.
+    Fills `metrics` with time-to-first-token, total latency (seconds), the number of characters
+    received and token usage (see `usage_metrics`); errors are recorded in metrics["error"] and re-raised to the caller.
+    """
+    gateway = gateway or get_gateway()
+    start = time.perf_counter()
+    metrics.update({"ttft": None, "total": None, "chars": 0, "error": None})
+    try:
+        for chunk in gateway.stream(chat.send_message, prompt, stream=True,
+                                    request_options={"timeout": gateway.deadline}):
+            # Every chunk carries the usage so far; the last one has the totals for the turn.
+            metrics.update(usage_metrics(getattr(chunk, "usage_metadata", None)))
+            text = chunk.text
+            if not text:
+                continue
+            if metrics["ttft"] is None:
+                metrics["ttft"] = time.perf_counter() - start
+            metrics["chars"] += len(text)
+            yield text
+    except Exception as e:
+        metrics["error"] = str(e)
+        raise
+    finally:
+        metrics["total"] = time.perf_counter() - start
+
+
+def usage_metrics(usage):
+    """
+    Extracts input and output token counts from a response's usage_metadata.
+    """
+    if usage is None:
+        return {}
+    return {"input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0}
+
+
+def record_turn_metrics(session_state, metrics):
+    observe("llm.turn", metrics.get("total"), error=bool(metrics.get("error")),
+            **{k: metrics[k] for k in ("input_tokens", "output_tokens", "chars") if k in metrics})
+    history = session_state.setdefault("llm_metrics", [])
+    history.append(dict(metrics))
+    del history[:-MAX_METRICS_PER_SESSION]
+
+
+def format_turn_metrics(metrics):
+    if metrics.get("ttft") is None:
+        return f"No response after {metrics['total']:.2f}s"
+    text = f"First token in {metrics['ttft']:.2f}s · {metrics['total']:.2f}s total"
+    if metrics.get("input_tokens"):
+        text += f" · {metrics['input_tokens']} input tokens, {metrics['output_tokens']} output tokens"
+    return text
@@ -0,0 +1,290 @@
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import span
+
+# =================================================================================================
+# SHARED LLM GATEWAY
+# =================================================================================================
+# Every Gemini call from every session goes through one process-wide gateway, which
+#   - spaces calls with a token bucket sized to the API quota,
+#   - runs them on a bounded worker pool so a slow call cannot hold a script thread forever,
+#   - enforces a deadline per call,
+#   - retries quota / transient errors with exponential backoff and jitter, and
+#   - stops calling for a while (circuit breaker) after repeated failures.
+# The gateway only sees callables, so a local fake model can stand in for Gemini.
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                         "DeadlineExceeded", "GatewayTimeout", "BadGateway"}
+
+
+class GatewayError(Exception):
+    pass
+
+
+class RateLimited(GatewayError):
+    pass
+
+
+class CircuitOpen(GatewayError):
+    pass
+
+
+class DeadlineExceeded(GatewayError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """
+        Takes one token, waiting up to `timeout` seconds for the bucket to refill. Returns False
+        if no token became available in time.
+        """
+        end = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > end:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True  # Half-open: let a single call through to probe the API.
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release_trial(self):
+        # A call that ended without a verdict (its caller went away) lets the next call probe instead.
+        with self._lock:
+            self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+
+class LLMGateway:
+    def __init__(self, rate_per_minute=60, burst=10, max_workers=8, deadline=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_cap=8.0, failure_threshold=5, reset_timeout=30.0):
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-gateway")
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def _backoff(self, attempt, end):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= end:
+            raise DeadlineExceeded("Deadline reached while backing off after a failed LLM call.")
+        time.sleep(delay)
+
+    def _admit(self, end):
+        if not self.bucket.acquire(max(0.0, end - time.monotonic())):
+            raise RateLimited("Too many requests right now; please try again shortly.")
+        if not self._slots.acquire(timeout=max(0.0, end - time.monotonic())):
+            raise RateLimited("All AI workers are busy; please try again shortly.")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise CircuitOpen("The AI service is failing repeatedly; calls are paused for a moment.")
+
+    def _record_error(self, error):
+        # Only transient failures count against the breaker; anything else means the API answered.
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _run(self, fn, args, kwargs, events, stop=None):
+        try:
+            result = fn(*args, **kwargs)
+            if events is None:
+                return result
+            for chunk in result:
+                if stop.is_set():
+                    break
+                events.put(("chunk", chunk))
+            events.put(("done", None))
+        except BaseException as e:
+            if events is None:
+                raise
+            events.put(("error", e))
+        finally:
+            self._slots.release()
+
+    def call(self, fn, *args, deadline=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the worker pool and returns its result, retrying retryable
+        errors until `deadline` seconds (default: the gateway's) have passed.
+        """
+        with span("llm.call") as s:
+            end = time.monotonic() + (deadline or self.deadline)
+            attempt = 0
+            while True:
+                self._admit(end)
+                future = self._executor.submit(self._run, fn, args, kwargs, None)
+                try:
+                    result = future.result(timeout=max(0.0, end - time.monotonic()))
+                except Exception as e:
+                    if not future.done():
+                        self.breaker.record_failure()
+                        raise DeadlineExceeded("The AI took too long to answer.")
+                    self._record_error(e)
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    self._backoff(attempt, end)
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                s["retries"] = attempt
+                return result
+
+    def stream(self, fn, *args, deadline=None, **kwargs):
+        """
+        Like `call`, for a callable that returns an iterable of chunks; yields the chunks as the
+        worker receives them. Failures are only retried before the first chunk has been yielded.
+        """
+        with span("llm.stream") as s:
+            end = time.monotonic() + (deadline or self.deadline)
+            attempt = 0
+            stop = threading.Event()
+            in_flight = False
+            try:
+                while True:
+                    self._admit(end)
+                    in_flight = True
+                    events = queue.Queue()
+                    self._executor.submit(self._run, fn, args, kwargs, events, stop)
+                    started = False
+                    while True:
+                        try:
+                            kind, value = events.get(timeout=max(0.0, end - time.monotonic()))
+                        except queue.Empty:
+                            in_flight = False
+                            self.breaker.record_failure()
+                            raise DeadlineExceeded("The AI took too long to answer.")
+                        if kind == "chunk":
+                            started = True
+                            s["chunks"] = s.get("chunks", 0) + 1
+                            yield value
+                        elif kind == "done":
+                            in_flight = False
+                            self.breaker.record_success()
+                            s["retries"] = attempt
+                            return
+                        else:
+                            break
+                    in_flight = False
+                    self._record_error(value)
+                    if started or not is_retryable(value) or attempt >= self.max_retries:
+                        raise value
+                    self._backoff(attempt, end)
+                    attempt += 1
+            finally:
+                # The caller can stop reading at `yield` (a Streamlit rerun mid-answer closes the
+                # generator); the worker then stops forwarding chunks, and if this call was the
+                # breaker's half-open trial, the next call gets to probe instead.
+                stop.set()
+                if in_flight:
+                    self.breaker.release_trial()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+_models = {}
+_configured = False
+
+
+def get_gateway():
+    """
+    Returns the process-wide gateway. Limits come from LLM_RATE_PER_MINUTE, LLM_BURST,
+    LLM_MAX_WORKERS and LLM_DEADLINE_SECONDS in the environment.
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(rate_per_minute=float(os.environ.get("LLM_RATE_PER_MINUTE", 60)),
+                                  burst=int(os.environ.get("LLM_BURST", 10)),
+                                  max_workers=int(os.environ.get("LLM_MAX_WORKERS", 8)),
+                                  deadline=float(os.environ.get("LLM_DEADLINE_SECONDS", 60)))
+        return _gateway
+
+
+def get_model(api_key, model_name, system_instruction=None, **model_kwargs):
+    """
+    Configures the Gemini client once per process and returns a shared GenerativeModel for
+    `model_name` with `system_instruction` (the persona) set once instead of being resent as a
+    chat turn.
+    """
+    import google.generativeai as genai
+
+    global _configured
+    key = (model_name, system_instruction, repr(sorted(model_kwargs.items())))
+    with _gateway_lock:
+        model = _models.get(key)
+        if model is None:
+            if not _configured:
+                genai.configure(api_key=api_key)
+                _configured = True
+            model = _models[key] = genai.GenerativeModel(model_name, system_instruction=system_instruction,
+                                                         **model_kwargs)
+        return model
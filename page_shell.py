@@ -0,0 +1,188 @@
+import re
+
+import streamlit as st
+
+import llm_gateway
+from assets import THEME_IMAGE_WIDTH, get_asset_url
+
+# =================================================================================================
+# SHARED PAGE SHELL
+# =================================================================================================
+# What every page needs before its own content: the login check, the Gemini client and the theme.
+# Each theme's CSS is compiled once per process (placeholders filled in, comments and whitespace
+# stripped) into the <style> tag the pages inject, so a rerun only looks the tag up. Background
+# images are not inlined: they are optimized files in the local asset cache, referenced by their
+# static URL, which the browser downloads once. (The stylesheet itself cannot be served that way:
+# Streamlit serves static .css files as text/plain with nosniff, and browsers ignore them.)
+
+LOGIN_REQUIRED_MESSAGE = "Please log in from the Home page to use the application."
+
+COLOR_THEMES = {
+    "⚪ Light": {"primary": "#000000", "background": "#FFFFFF", "secondary_bg": "#F0F2F6", "text": "#000000"},
+    "⚫ Dark": {"primary": "#FFFFFF", "background": "#0E1117", "secondary_bg": "#1C1C1C", "text": "#FFFFFF"},
+    "🔴 Red": {"primary": "#FFFFFF", "background": "#7B241C", "secondary_bg": "#A93226", "text": "#FFFFFF"},
+    "🔵 Blue": {"primary": "#FFFFFF", "background": "#154360", "secondary_bg": "#1F618D", "text": "#FFFFFF"},
+    "🟢 Green": {"primary": "#FFFFFF", "background": "#145A32", "secondary_bg": "#1E8449", "text": "#FFFFFF"},
+    "🩷 Pink": {"primary": "#FFFFFF", "background": "#880E4F", "secondary_bg": "#C2185B", "text": "#FFFFFF"},
+    "🩵 Light Blue": {"primary": "#000000", "background": "#E1F5FE", "secondary_bg": "#B3E5FC", "text": "#01579B"},
+    "💜 Lavender": {"primary": "#FFFFFF", "background": "#4A148C", "secondary_bg": "#6A1B9A", "text": "#FFFFFF"},
+    "💛 Yellow": {"primary": "#000000", "background": "#FFFDE7", "secondary_bg": "#FFF9C4", "text": "#F57F17"},
+}
+DEFAULT_COLOR_THEME = "⚪ Light"
+_color_themes_by_emoji = {name.split(" ")[0]: name for name in COLOR_THEMES}
+
+COLOR_THEME_CSS = """
+.stApp { background-color: {background}; color: {text}; }
+.st-emotion-cache-16txtl3 { background-color: {secondary_bg}; }
+.stButton>button, .stDownloadButton>button {
+    background-color: {primary}; color: {background};
+    border: 2px solid {background};
+}
+h1, h2, h3, h4, h5, h6, p, li, label, .st-emotion-cache-16txtl3 { color: {text} !important; }
+.st-emotion-cache-16txtl3 h1, .st-emotion-cache-16txtl3 h2, .st-emotion-cache-16txtl3 h3, .st-emotion-cache-16txtl3 p, .st-emotion-cache-16txtl3 b { color: {primary} !important; }
+"""
+
+# Pebble's picture themes. "{image}" is replaced by the theme's image from the local asset cache.
+SCENE_THEMES = {
+    "Spiderman": {"image": "spider.jpeg", "css": """
+.stApp {
+    background-image: url("{image}");
+    background-color: #a30000;
+    background-size: contain; /* 'contain' works well for character images */
+    background-position: 95% 100%; /* Position to the bottom right */
+    background-repeat: no-repeat;
+    background-attachment: fixed;
+    color: white;
+}
+.main .block-container {
+    background-color: rgba(0, 0, 0, 0.3);
+    border-radius: 10px;
+    padding: 2rem;
+}
+.st-emotion-cache-16txtl3 { background-color: rgba(0, 86, 179, 0.7); }
+.stButton>button { background-color: #0056b3; color: white; }
+"""},
+    "Barbie": {"css": """
+.stApp {
+    background-color: #f9d9ea; /* Light Pink */
+    color: #5b0d38; /* Dark Pink text */
+}
+.st-emotion-cache-16txtl3 { background-color: #fce4ec; /* Lighter Pink for sidebar */ }
+.stButton>button { background-color: #e91e63; /* Hot Pink */ color: white; }
+"""},
+    "Football": {"image": "greenBg.jpeg", "css": """
+.stApp {
+    background-image: url("{image}");
+    background-color: #006400; /* Dark Green */
+    background-size: cover;
+    color: white;
+}
+.st-emotion-cache-16txtl3 { background-color: #2e8b57; /* Sea Green */ }
+.stButton>button { background-color: #ffffff; color: #006400; }
+"""},
+    "Normal Dark": {"css": """
+.stApp { background-color: #0e1117; color: white; }
+.st-emotion-cache-16txtl3 { background-color: #1c1c1c; }
+.stButton>button { background-color: #4a90e2; color: white; }
+"""},
+    "Colorful": {"css": """
+.stApp {
+    background-image: linear-gradient(to right top, #d16ba5, #c777b9, #ba83ca, #aa8fd8, #9a9ae1, #8aa7ec, #79b3f4, #69bff8, #52cffe, #41dfff, #46eefa, #5ffbf1);
+    color: #000000;
+}
+.st-emotion-cache-16txtl3 { background-color: rgba(255, 255, 255, 0.7); }
+.stButton>button { background-color: #ff4b4b; color: white; }
+"""},
+    "Default Light": None,
+}
+
+
+# =================================================================================================
+# LOGIN AND CLIENTS
+# =================================================================================================
+def require_login():
+    """
+    Stops the page unless the student is logged in; returns their username.
+    """
+    if not st.session_state.get("logged_in", False):
+        st.warning(LOGIN_REQUIRED_MESSAGE)
+        st.stop()
+    return st.session_state.get("username", "default_user")
+
+
+def current_username(default="guest"):
+    # For pages that also work without an account.
+    return st.session_state.get("username") if st.session_state.get("logged_in", False) else default
+
+
+def load_model(model_name, system_instruction, error_message="Failed to configure Gemini API."):
+    """
+    Returns the shared Gemini model, or shows `error_message` and stops the page.
+    """
+    try:
+        return llm_gateway.get_model(st.secrets["GEMINI_API_KEY"], model_name, system_instruction=system_instruction)
+    except Exception:
+        st.error(error_message)
+        st.stop()
+
+
+# =================================================================================================
+# PRECOMPILED THEMES
+# =================================================================================================
+def _fill(template, values):
+    # str.format would trip over the CSS braces.
+    for name, value in values.items():
+        template = template.replace("{" + name + "}", value)
+    return template
+
+
+def _minify(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).replace(";}", "}").strip()
+
+
+@st.cache_resource(show_spinner=False)
+def _style_tag(css):
+    return f"<style>{_minify(css)}</style>"
+
+
+@st.cache_resource(show_spinner=False)
+def compile_color_theme(name):
+    return _style_tag(_fill(COLOR_THEME_CSS, COLOR_THEMES[name]))
+
+
+@st.cache_resource(show_spinner=False)
+def compile_scene_theme(name):
+    theme = SCENE_THEMES[name]
+    if theme is None:
+        return None
+    image = get_asset_url(theme["image"], max_width=THEME_IMAGE_WIDTH) if theme.get("image") else None
+    return _style_tag(_fill(theme["css"], {"image": image or ""}))
+
+
+def inject_style(style):
+    if style:
+        st.markdown(style, unsafe_allow_html=True)
+
+
+def color_theme_picker():
+    """
+    Draws the color theme picker in the sidebar, applies the chosen theme and returns its colors.
+    """
+    if st.session_state.get("selected_theme_emoji") not in COLOR_THEMES:
+        st.session_state.selected_theme_emoji = DEFAULT_COLOR_THEME
+    # Streamlit forgets a widget's value while another page is shown, and clicking the selected
+    # option clears it; either way the picker is reset to the theme in use.
+    if st.session_state.get("theme_picker") not in _color_themes_by_emoji:
+        st.session_state.theme_picker = st.session_state.selected_theme_emoji.split(" ")[0]
+    emoji = st.sidebar.segmented_control("Choose a theme:", list(_color_themes_by_emoji), key="theme_picker")
+    name = st.session_state.selected_theme_emoji = _color_themes_by_emoji[emoji]
+    inject_style(compile_color_theme(name))
+    return COLOR_THEMES[name]
+
+
+def scene_theme_picker():
+    name = st.sidebar.selectbox("Choose a theme", list(SCENE_THEMES), key="theme_selector")
+    inject_style(compile_scene_theme(name))
+    return name
@@ -1,174 +1,154 @@
 import streamlit as st
 import datetime
-import json
-import time
-import base64
 import os
-import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import google.generativeai as genai
-from PIL import Image
-import pandas as pd
-import plotly.express as px
+import uuid
+from assistant import MODEL_NAME, ASSISTANT_PERSONA, assistant_cache_key
+from page_shell import color_theme_picker, load_model, require_login
+from llm import stream_reply, record_turn_metrics, format_turn_metrics, get_chat_session, drop_chat_session
+from response_cache import ResponseCache
+from chat_store import create_chat, delete_chat, get_chat_index, migrate_legacy_chats, search_chats
+from calendar_sync import CREDENTIALS_FILE, CalendarSyncQueue
+from instrumentation import span, instrumented
+from session_memory import ChatWindow, HOT_MESSAGES, get_session_memory
+from plan_store import PRIORITIES, add_task, set_task_done, get_plan_version, tasks_between, tasks_for_date, priority_counts
+
+CHATS_PER_PAGE = 20
+HISTORY_PAGE_SIZE = 20
+SYNC_LABELS = {"pending": "⏳ Waiting to sync", "syncing": "🔄 Syncing to Calendar", "synced": "✅ In Google Calendar",
+               "retrying": "🔁 Calendar sync failed, retrying", "failed": "⚠️ Couldn't add to Calendar"}
 
 # =================================================================================================
 # HELPER FUNCTIONS
 # =================================================================================================
-def get_base64_of_bin_file(bin_file):
-    try:
-        with open(bin_file, 'rb') as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
-    except FileNotFoundError:
-        return None
-
-def create_priority_chart(priority_level, plan, theme_colors):
-    tasks = [t for t in plan if t['priority'] == priority_level]
-    if not tasks: return None
-    completed = len([t for t in tasks if t['done']])
-    not_completed = len(tasks) - completed
-    df = pd.DataFrame({'Status': ['Completed', 'Not Completed'], 'Count': [completed, not_completed]})
+def create_priority_chart(priority_level, counts, text_color):
+    if not counts['done'] + counts['open']: return None
+    # Imported here so pages without a plan never pay for pandas / plotly.
+    import pandas as pd
+    import plotly.express as px
+
+    df = pd.DataFrame({'Status': ['Completed', 'Not Completed'], 'Count': [counts['done'], counts['open']]})
     
     fig = px.pie(df, values='Count', names='Status', title=f'{priority_level} Priority Tasks',
                  color_discrete_map={'Completed':'#4CAF50', 'Not Completed':'#F44336'})
     fig.update_traces(textposition='inside', textinfo='percent+label', hole=.3)
     fig.update_layout(showlegend=False, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', 
-                      font_color=theme_colors["text"]) # Use theme text color
+                      font_color=text_color) # Use theme text color
     return fig
 
-def get_user_chat_dir(username):
-    user_chat_dir = os.path.join("chats", username)
-    if not os.path.exists(user_chat_dir):
-        os.makedirs(user_chat_dir)
-    return user_chat_dir
+@st.cache_data(show_spinner=False, max_entries=256)
+@instrumented("planner.charts")
+def build_priority_charts(username, plan_version, text_color):
+    # `plan_version` only keys the cache: charts are rebuilt after the plan changes, not on every rerun.
+    counts = priority_counts(username)
+    return [chart for priority in PRIORITIES if (chart := create_priority_chart(priority, counts[priority], text_color))]
 
-def save_chat_history(username, chat_history, filename):
-    user_chat_dir = get_user_chat_dir(username)
-    with open(os.path.join(user_chat_dir, filename), "w") as f:
-        json.dump(chat_history, f, indent=4)
+def open_chat_window(memory, username, chat_id):
+    # Only the newest messages stay in memory; older ones are read from the chat store on demand.
+    return memory.track(ChatWindow(username, chat_id))
 
-def load_chat_history(username, filename):
-    user_chat_dir = get_user_chat_dir(username)
-    try:
-        with open(os.path.join(user_chat_dir, filename), "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+def chat_display_name(entry):
+    return entry["title"] or entry["id"].replace("chat_", "").replace("_", " at ")
 
-def delete_chat_history(username, filename):
-    user_chat_dir = get_user_chat_dir(username)
-    file_path = os.path.join(user_chat_dir, filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+@st.cache_resource(show_spinner=False)
+def get_calendar_sync():
+    # Cheap to create: the Calendar client is built by the sync thread when the first task is sent.
+    # Creating it also re-queues tasks whose sync a restart interrupted.
+    return CalendarSyncQueue(calendar_id=st.secrets.get("CALENDAR_ID", "primary"))
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache()
 
 # =================================================================================================
-# COLOR THEME LOGIC
-# =================================================================================================
-COLOR_THEMES = {
-    "⚪ Light": {"primary": "#000000", "background": "#FFFFFF", "secondary_bg": "#F0F2F6", "text": "#000000"},
-    "⚫ Dark": {"primary": "#FFFFFF", "background": "#0E1117", "secondary_bg": "#1C1C1C", "text": "#FFFFFF"},
-    "🔴 Red": {"primary": "#FFFFFF", "background": "#7B241C", "secondary_bg": "#A93226", "text": "#FFFFFF"},
-    "🔵 Blue": {"primary": "#FFFFFF", "background": "#154360", "secondary_bg": "#1F618D", "text": "#FFFFFF"},
-    "🟢 Green": {"primary": "#FFFFFF", "background": "#145A32", "secondary_bg": "#1E8449", "text": "#FFFFFF"},
-    "🩷 Pink": {"primary": "#FFFFFF", "background": "#880E4F", "secondary_bg": "#C2185B", "text": "#FFFFFF"},
-    "🩵 Light Blue": {"primary": "#000000", "background": "#E1F5FE", "secondary_bg": "#B3E5FC", "text": "#01579B"},
-    "💜 Lavender": {"primary": "#FFFFFF", "background": "#4A148C", "secondary_bg": "#6A1B9A", "text": "#FFFFFF"},
-    "💛 Yellow": {"primary": "#000000", "background": "#FFFDE7", "secondary_bg": "#FFF9C4", "text": "#F57F17"},
-}
-
-def apply_color_theme(theme_colors):
-    css = f"""
-    <style>
-        .stApp {{ background-color: {theme_colors["background"]}; color: {theme_colors["text"]}; }}
-        .st-emotion-cache-16txtl3 {{ background-color: {theme_colors["secondary_bg"]}; }}
-        .stButton>button, .stDownloadButton>button {{
-            background-color: {theme_colors["primary"]}; color: {theme_colors["background"]};
-            border: 2px solid {theme_colors["background"]};
-        }}
-        h1, h2, h3, h4, h5, h6, p, li, label, .st-emotion-cache-16txtl3 {{ color: {theme_colors["text"]} !important; }}
-        .st-emotion-cache-16txtl3 h1, .st-emotion-cache-16txtl3 h2, .st-emotion-cache-16txtl3 h3, .st-emotion-cache-16txtl3 p, .st-emotion-cache-16txtl3 b {{ color: {theme_colors["primary"]} !important; }}
-    </style>
-    """
-    st.markdown(css, unsafe_allow_html=True)
-
-if "selected_theme_emoji" not in st.session_state:
-    st.session_state.selected_theme_emoji = "⚪ Light"
-
-st.sidebar.write("Choose a theme:")
-cols = st.sidebar.columns(5)
-col_index = 0
-for emoji_and_name, colors in COLOR_THEMES.items():
-    with cols[col_index]:
-        if st.button(emoji_and_name.split(" ")[0], use_container_width=True, key=f"theme_{emoji_and_name}"):
-            st.session_state.selected_theme_emoji = emoji_and_name
-            st.rerun()
-    col_index = (col_index + 1) % 5
-
-selected_theme_colors = COLOR_THEMES[st.session_state.selected_theme_emoji]
-apply_color_theme(selected_theme_colors)
+# PAGE SHELL: THEME, LOGIN AND CLIENTS
 # =================================================================================================
+selected_theme_colors = color_theme_picker()
 
 # --- MAIN APP ---
-if not st.session_state.get("logged_in", False):
-    st.warning("Please log in from the Home page to use the application.")
-    st.stop()
-
-username = st.session_state.get("username", "default_user")
+username = require_login()
 
 # --- API CONFIGURATIONS ---
-try:
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-except Exception:
-    st.error("Failed to configure Gemini API.")
-    st.stop()
-try:
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
-    creds = service_account.Credentials.from_service_account_file("credentials.json", scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
-    st.sidebar.success("Connected to Google Calendar.")
-except FileNotFoundError:
+model = load_model(MODEL_NAME, ASSISTANT_PERSONA)
+calendar_sync = None
+if os.path.exists(CREDENTIALS_FILE):
+    calendar_sync = get_calendar_sync()
+    st.sidebar.success("Google Calendar sync is on.")
+else:
     st.sidebar.error("`credentials.json` not found for Google Calendar.")
-except Exception as e:
-    st.sidebar.error(f"Google Calendar Error: {e}")
 
 # --- SESSION STATE INITIALIZATION ---
-if "plan" not in st.session_state: st.session_state.plan = []
 if 'active_chat' not in st.session_state: st.session_state.active_chat = None
-if 'chat_history' not in st.session_state: st.session_state.chat_history = []
+if 'chat_window' not in st.session_state: st.session_state.chat_window = None
+if 'chat_list_limit' not in st.session_state: st.session_state.chat_list_limit = CHATS_PER_PAGE
+if 'visible_messages' not in st.session_state: st.session_state.visible_messages = HISTORY_PAGE_SIZE
+if 'chats_migrated' not in st.session_state:
+    migrate_legacy_chats(username)
+    st.session_state.chats_migrated = True
+memory = get_session_memory(st.session_state)
+memory.touch()
 
 # --- Sidebar for Chat History Navigation ---
 st.sidebar.title(f"{username}'s Chats")
 if st.sidebar.button("➕ New Chat"):
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    st.session_state.active_chat = f"chat_{timestamp}.json"
-    st.session_state.chat_history = []
-    save_chat_history(username, [], st.session_state.active_chat)
+    st.session_state.active_chat = f"chat_{timestamp}"
+    st.session_state.visible_messages = HISTORY_PAGE_SIZE
+    create_chat(username, st.session_state.active_chat)
+    st.session_state.chat_window = open_chat_window(memory, username, st.session_state.active_chat)
     st.rerun()
 
-st.sidebar.write("---")
-st.sidebar.subheader("Saved Conversations")
-try:
-    user_chat_dir = get_user_chat_dir(username)
-    chat_files = sorted([f for f in os.listdir(user_chat_dir) if f.endswith(".json")], reverse=True)
-    for chat_file in chat_files:
-        col1, col2 = st.sidebar.columns([0.8, 0.2])
-        with col1:
-            display_name = chat_file.replace("chat_", "").replace(".json", "").replace("_", " at ")
-            if st.button(display_name, key=f"load_{chat_file}", use_container_width=True):
-                st.session_state.active_chat = chat_file
-                st.session_state.chat_history = load_chat_history(username, chat_file)
-                st.rerun()
-        with col2:
-            if st.button("🗑️", key=f"delete_{chat_file}", help=f"Delete chat {display_name}"):
-                delete_chat_history(username, chat_file)
-                if st.session_state.active_chat == chat_file:
-                    st.session_state.active_chat = None
-                    st.session_state.chat_history = []
+with span("page.sidebar"):
+    st.sidebar.write("---")
+    st.sidebar.subheader("Saved Conversations")
+    try:
+        search_text = st.sidebar.text_input("🔍 Search your chats", placeholder="e.g. photosynthesis")
+        if search_text.strip():
+            search_results = search_chats(username, search_text)
+            if not search_results:
+                st.sidebar.caption("No messages match your search.")
+            for result in search_results:
+                if st.sidebar.button(chat_display_name(result), key=f"hit_{result['id']}", use_container_width=True,
+                                     help=f"{result['hits']} matching messages"):
+                    st.session_state.active_chat = result["id"]
+                    st.session_state.chat_window = open_chat_window(memory, username, result["id"])
+                    # Show enough of the conversation that the best match is on screen.
+                    st.session_state.visible_messages = max(HISTORY_PAGE_SIZE, result["messages"] - result["seq"])
+                    st.rerun()
+                st.sidebar.caption(result["snippet"])
+            st.sidebar.write("---")
+        chat_index = get_chat_index(username)
+        for entry in chat_index[:st.session_state.chat_list_limit]:
+            chat_file = entry["id"]
+            col1, col2 = st.sidebar.columns([0.8, 0.2])
+            with col1:
+                display_name = chat_display_name(entry)
+                if st.button(display_name, key=f"load_{chat_file}", use_container_width=True,
+                             help=f"{entry['messages']} messages"):
+                    st.session_state.active_chat = chat_file
+                    st.session_state.chat_window = open_chat_window(memory, username, chat_file)
+                    st.session_state.visible_messages = HISTORY_PAGE_SIZE
+                    st.rerun()
+            with col2:
+                if st.button("🗑️", key=f"delete_{chat_file}", help=f"Delete chat {display_name}"):
+                    delete_chat(username, chat_file)
+                    drop_chat_session(st.session_state, username, chat_file)
+                    if st.session_state.active_chat == chat_file:
+                        st.session_state.active_chat = None
+                        st.session_state.chat_window = None
+                    st.rerun()
+        if len(chat_index) > st.session_state.chat_list_limit:
+            if st.sidebar.button(f"Load more ({len(chat_index) - st.session_state.chat_list_limit} older)"):
+                st.session_state.chat_list_limit += CHATS_PER_PAGE
                 st.rerun()
-except Exception as e:
-    st.sidebar.error(f"Error loading chat files: {e}")
+    except Exception as e:
+        st.sidebar.error(f"Error loading chat files: {e}")
+
+response_cache = get_response_cache()
+with st.sidebar.expander("⚡ Response cache"):
+    cache_stats = response_cache.stats()
+    st.write(f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · Coalesced: {cache_stats['coalesced']}")
+    st.write(f"Hit rate: {cache_stats['hit_rate']:.0%} · Time saved: {cache_stats['saved_seconds']:.1f}s")
+    st.write(f"Entries: {cache_stats['entries']} / {response_cache.max_entries}")
 
 # --- MAIN PAGE TABS ---
 planner_tab, assistant_tab = st.tabs(["🗓️ Study Planner", "🤖 AI Assistant"])
@@ -185,38 +165,91 @@ with planner_tab:
         submitted = st.form_submit_button("➕ Add to Plan & Calendar")
 
     if submitted and subject:
-        # (Add task logic here...)
+        task = {"id": uuid.uuid4().hex, "date": task_date.isoformat(), "subject": subject, "priority": priority,
+                "start": start_time.isoformat(), "end": end_time.isoformat(), "done": False}
+        add_task(username, task)
+        if calendar_sync:
+            # Sent to Calendar by the background sync thread; its status shows in the task list.
+            calendar_sync.enqueue(username, task["id"])
         st.toast(f"Task '{subject}' added!")
 
     st.subheader("📌 Today's Plan & Priority Breakdown")
     dash_col1, dash_col2 = st.columns([2, 1])
     with dash_col1:
-        # (Task list and progress bar logic here...)
-        pass
+        today = datetime.date.today()
+        todays_tasks = tasks_for_date(username, today.isoformat())
+        if todays_tasks:
+            for task in todays_tasks:
+                label = f"{task['start'][:5]}–{task['end'][:5]} · {task['subject']} ({task['priority']})"
+                done = st.checkbox(label, value=task["done"], key=f"done_{task['id']}")
+                if done != task["done"]:
+                    set_task_done(username, task["id"], done)
+                    task["done"] = done
+                # Saved on the task by whichever process syncs it; a failure to build the Calendar
+                # client (bad credentials) also shows up here.
+                sync = task.get("sync") or {}
+                if sync.get("state"):
+                    st.caption(SYNC_LABELS[sync["state"]] + (f": {sync['error']}" if sync["state"] == "failed" else ""))
+            completed = sum(t["done"] for t in todays_tasks)
+            st.progress(completed / len(todays_tasks), text=f"{completed}/{len(todays_tasks)} tasks done today")
+        else:
+            st.info("Nothing planned for today yet.")
+        week_tasks = tasks_between(username, today.isoformat(), (today + datetime.timedelta(days=6)).isoformat())
+        st.caption(f"{len(week_tasks)} tasks planned for the next 7 days.")
     with dash_col2:
-        if st.session_state.plan:
-            for priority in ["High", "Medium", "Low"]:
-                chart = create_priority_chart(priority, st.session_state.plan, selected_theme_colors)
-                if chart:
-                    st.plotly_chart(chart, use_container_width=True)
+        for chart in build_priority_charts(username, get_plan_version(username), selected_theme_colors["text"]):
+            st.plotly_chart(chart, use_container_width=True)
 
 with assistant_tab:
     st.header("Your Doubt-Solving Bestie!")
     if st.session_state.active_chat:
-        st.caption(f"Continuing chat: `{st.session_state.active_chat.replace('.json', '')}`")
-        for message in st.session_state.chat_history:
-            with st.chat_message(message["role"]):
+        st.caption(f"Continuing chat: `{st.session_state.active_chat}`")
+        chat_window = st.session_state.chat_window
+        if chat_window is None:
+            chat_window = st.session_state.chat_window = open_chat_window(memory, username, st.session_state.active_chat)
+        # Only the latest messages are drawn on each rerun; older ones are a click away.
+        hidden_messages = max(0, len(chat_window) - st.session_state.visible_messages)
+        if hidden_messages:
+            if st.button(f"Show earlier messages ({hidden_messages} hidden)"):
+                st.session_state.visible_messages += HISTORY_PAGE_SIZE
+                st.rerun()
+        for message in chat_window.latest(st.session_state.visible_messages):
+            with st.chat_message("user" if message["role"] == "user" else "assistant"):
                 st.markdown(message["parts"])
         
         if user_prompt := st.chat_input("What can I help you with?"):
-            st.session_state.chat_history.append({"role": "user", "parts": user_prompt})
+            recent_messages = chat_window.latest(HOT_MESSAGES)
+            prompt_key = assistant_cache_key(user_prompt, recent_messages)
+            chat = get_chat_session(st.session_state, model, username, st.session_state.active_chat,
+                                    recent_messages, max_history=2 * HOT_MESSAGES)
             with st.chat_message("user"): st.markdown(user_prompt)
             with st.chat_message("assistant"):
+                turn_metrics = {}
                 with st.spinner("Thinking..."):
-                    chat = model.start_chat(history=st.session_state.chat_history)
-                    response = chat.send_message(user_prompt)
-                    st.markdown(response.text)
-            st.session_state.chat_history.append({"role": "assistant", "parts": response.text})
-            save_chat_history(username, st.session_state.chat_history, st.session_state.active_chat)
+                    reply = response_cache.lookup(prompt_key)
+                if reply is not None:
+                    st.markdown(reply)
+                    st.caption("Answered from cache")
+                    # The live session never saw this turn; restart it from the saved history next time.
+                    drop_chat_session(st.session_state, username, st.session_state.active_chat)
+                else:
+                    try:
+                        reply = st.write_stream(stream_reply(chat, user_prompt, turn_metrics))
+                    except Exception as e:
+                        st.error(f"The AI couldn't finish its answer: {e}")
+                    finally:
+                        if reply:
+                            response_cache.fulfil(prompt_key, reply, turn_metrics["total"])
+                        else:
+                            response_cache.abandon(prompt_key)
+                if turn_metrics:
+                    record_turn_metrics(st.session_state, turn_metrics)
+                    st.caption(format_turn_metrics(turn_metrics))
+            if reply:
+                chat_window.append([{"role": "user", "parts": user_prompt}, {"role": "model", "parts": reply}])
+            else:
+                # An unanswered prompt is never written to the chat file; the broken live session is
+                # dropped so it is restarted from the saved history next time.
+                drop_chat_session(st.session_state, username, st.session_state.active_chat)
     else:
         st.info("To talk to the AI, start a '➕ New Chat' from the sidebar.")
\ No newline at end of file
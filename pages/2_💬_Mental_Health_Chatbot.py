@@ -1,131 +1,21 @@
 import streamlit as st
-import google.generativeai as genai
-import time
+import uuid
+from llm_gateway import get_gateway
+from assets import PEBBLE_ICON_URL, get_remote_asset_url
+from page_shell import current_username, load_model, scene_theme_picker
+from chat_context import ConversationContext, summarize_turns
+from llm import record_turn_metrics, usage_metrics
+from session_memory import ChatWindow, get_session_memory
+from pebble_triage import DISCLAIMER, add_disclaimer, strip_disclaimer, triage
+from instrumentation import span
 
 # =================================================================================================
-# THEME SELECTOR CODE - PASTE THIS AT THE TOP OF EACH PAGE SCRIPT
-# =================================================================================================
-def apply_theme(theme_name):
-    """
-    Applies a theme by injecting custom CSS into the Streamlit app.
-    """
-    css = ""
-    # --- Spiderman Theme ---
-    if theme_name == "Spiderman":
-        css = """
-        .stApp {
-            /* This is a new, different URL for the online photo */
-            background-image: url("https://i.pinimg.com/originals/c8/15/33/c815332f813a303dd5347f631122a16d.png");
-            background-color: #a30000;
-            background-size: contain; /* 'contain' works well for character images */
-            background-position: 95% 100%; /* Position to the bottom right */
-            background-repeat: no-repeat;
-            background-attachment: fixed;
-            color: white;
-        }
-        .main .block-container {
-            background-color: rgba(0, 0, 0, 0.3);
-            border-radius: 10px;
-            padding: 2rem;
-        }
-        .st-emotion-cache-16txtl3 {
-            background-color: rgba(0, 86, 179, 0.7);
-        }
-        .stButton>button {
-            background-color: #0056b3;
-            color: white;
-        }
-        """
-    # --- Barbie Theme ---
-    elif theme_name == "Barbie":
-        css = """
-        .stApp {
-            background-color: #f9d9ea; /* Light Pink */
-            color: #5b0d38; /* Dark Pink text */
-        }
-        .st-emotion-cache-16txtl3 {
-            background-color: #fce4ec; /* Lighter Pink for sidebar */
-        }
-        .stButton>button {
-            background-color: #e91e63; /* Hot Pink */
-            color: white;
-        }
-        """
-    # --- Football Theme ---
-    elif theme_name == "Football":
-        css = """
-        .stApp {
-            background-image: url("https://www.transparenttextures.com/patterns/diagmonds.png");
-            background-color: #006400; /* Dark Green */
-            color: white;
-        }
-        .st-emotion-cache-16txtl3 {
-            background-color: #2e8b57; /* Sea Green */
-        }
-        .stButton>button {
-            background-color: #ffffff;
-            color: #006400;
-        }
-        """
-    # --- Normal Dark Theme ---
-    elif theme_name == "Normal Dark":
-        css = """
-        .stApp {
-            background-color: #0e1117;
-            color: white;
-        }
-        .st-emotion-cache-16txtl3 {
-            background-color: #1c1c1c;
-        }
-        .stButton>button {
-            background-color: #4a90e2;
-            color: white;
-        }
-        """
-    # --- Colorful Theme ---
-    elif theme_name == "Colorful":
-        css = """
-        .stApp {
-            background-image: linear-gradient(to right top, #d16ba5, #c777b9, #ba83ca, #aa8fd8, #9a9ae1, #8aa7ec, #79b3f4, #69bff8, #52cffe, #41dfff, #46eefa, #5ffbf1);
-            color: #000000;
-        }
-        .st-emotion-cache-16txtl3 {
-            background-color: rgba(255, 255, 255, 0.7);
-        }
-        .stButton>button {
-            background-color: #ff4b4b;
-            color: white;
-        }
-        """
-    
-    # Inject the CSS into the app
-    if css:
-        st.markdown(f'<style>{css}</style>', unsafe_allow_html=True)
-
-
-# --- Theme Selector in Sidebar ---
-theme_list = ["Spiderman", "Barbie", "Football", "Normal Dark", "Colorful", "Default Light"]
-selected_theme = st.sidebar.selectbox("Choose a theme", theme_list, key="theme_selector")
-
-# Apply the theme if it's not the default
-if selected_theme != "Default Light":
-    apply_theme(selected_theme)
-
-# =================================================================================================
-# END OF THEME SELECTOR CODE
+# PAGE SHELL: THEME AND CLIENTS
 # =================================================================================================
+# Pebble is open to everyone; logged-in students' transcripts are kept under their own name.
+scene_theme_picker()
 
 # Your original page code (st.title, chatbot logic, etc.) starts here...
-# --- CONFIGURATION ---
-# (Your Gemini configuration code remains here)
-try:
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-except Exception as e:
-    st.error("Failed to configure the Gemini API. Please make sure your API key is set correctly in st.secrets.")
-    st.stop()
-
-
 # --- PAGE SETUP ---
 st.set_page_config(page_title="Friendly Study Companion", page_icon="🌱")
 
@@ -133,7 +23,8 @@ st.set_page_config(page_title="Friendly Study Companion", page_icon="🌱")
 # --- NEW: CREATIVE HEADER ---
 col1, col2 = st.columns([1, 4])
 with col1:
-    st.image("https://cdn-icons-png.flaticon.com/512/3653/3653195.png", width=100) # A simple, friendly icon
+    icon_url = get_remote_asset_url(PEBBLE_ICON_URL, max_width=200)  # A simple, friendly icon
+    st.markdown(f'<img src="{icon_url}" alt="Pebble" width="100">' if icon_url else "# 🌱", unsafe_allow_html=True)
 with col2:
     st.title("Your Friendly Study Companion")
     st.write("A safe space to talk about study stress and well-being.")
@@ -153,46 +44,52 @@ Your purpose is to be a safe space for students to talk about their study-relate
 'I'm here to listen, but I'm an AI. If you're feeling overwhelmed, please consider talking to a trusted adult or a mental health professional. You are not alone.'
 """
 
-# Initialize chat history
-if "chat_session" not in st.session_state:
-    st.session_state.chat_session = model.start_chat(history=[]) # Start with an empty history
+# --- CONFIGURATION ---
+# Pebble's persona is the model's system instruction, set once on the shared model.
+model = load_model('gemini-1.5-flash-latest', SYSTEM_PROMPT,
+                   "Failed to configure the Gemini API. Please make sure your API key is set correctly in st.secrets.")
+
+# Initialize chat history. Only the recent turns are resent verbatim; older ones are folded into a
+# rolling summary so each request stays under CONTEXT_TOKEN_BUDGET however long the chat runs.
+# The full transcript shown on screen is spilled to a per-session chat log with only its newest
+# messages kept in memory; the log is removed when the session ends.
+CONTEXT_TOKEN_BUDGET = 2000
+HISTORY_PAGE_SIZE = 20
+memory = get_session_memory(st.session_state)
+memory.touch()
+if "pebble_context" not in st.session_state:
+    st.session_state.pebble_context = ConversationContext(token_budget=CONTEXT_TOKEN_BUDGET)
+context = st.session_state.pebble_context
+if "pebble_transcript" not in st.session_state:
+    st.session_state.pebble_transcript = memory.track(ChatWindow(current_username(),
+                                                                 f"_pebble_{uuid.uuid4().hex}", transient=True))
+transcript = st.session_state.pebble_transcript
+if "pebble_visible_turns" not in st.session_state:
+    st.session_state.pebble_visible_turns = HISTORY_PAGE_SIZE
 
 
 # --- CHAT INTERFACE ---
-# Display previous messages
-# Display previous messages
-# Display previous messages
-for message in st.session_state.chat_session.history[1:]:
-    # FIX: Check if the message is a dictionary or a Gemini object
-    if isinstance(message, dict):
-        role = message['role']
-        text = message['parts'][0]
-    else: # It's a Gemini Content object
-        role = message.role
-        text = message.parts[0].text
-
-    # Set avatar and display the message
-    avatar_icon = "🌱" if role == 'model' else "😊"
-    with st.chat_message(name=role, avatar=avatar_icon):
-        st.markdown(text)
-
-# Welcome message with typing animation
-if len(st.session_state.chat_session.history) == 0:
-    # Add the system prompt to the history without displaying it
-    st.session_state.chat_session.history.append({'role': 'user', 'parts': [SYSTEM_PROMPT]})
-    
+# Display previous messages. Only the latest turns are drawn, so a rerun costs the same however
+# long the conversation is; older ones are a click away.
+hidden_turns = max(0, len(transcript) - st.session_state.pebble_visible_turns)
+if hidden_turns:
+    if st.button(f"Show earlier messages ({hidden_turns} hidden)"):
+        st.session_state.pebble_visible_turns += HISTORY_PAGE_SIZE
+        st.rerun()
+for turn in transcript.latest(st.session_state.pebble_visible_turns):
+    avatar_icon = "🌱" if turn['role'] == 'model' else "😊"
+    with st.chat_message(name=turn['role'], avatar=avatar_icon):
+        st.markdown(turn['parts'])
+
+# Welcome message, written at once so a new session never blocks the script thread
+if not transcript:
     welcome_message = "Hello! I'm Pebble, your friendly study companion. What's on your mind today? I'm here to listen."
     with st.chat_message(name="model", avatar="🌱"):
-        message_placeholder = st.empty()
-        full_response = ""
-        for chunk in welcome_message.split():
-            full_response += chunk + " "
-            time.sleep(0.1)  # Control typing speed
-            message_placeholder.markdown(full_response + "▌")
-        message_placeholder.markdown(full_response)
+        st.markdown(welcome_message)
     
     # Add the welcome message to the history
-    st.session_state.chat_session.history.append({'role': 'model', 'parts': [welcome_message]})
+    context.add('model', welcome_message)
+    transcript.append([{"role": "model", "parts": welcome_message}])
 
 
 # Get user input
@@ -201,12 +98,36 @@ if user_prompt := st.chat_input("Share your thoughts here..."):
     with st.chat_message("user", avatar="😊"):
         st.markdown(user_prompt)
 
-    # Send the message to the Gemini model and get a response
-    with st.spinner("Pebble is thinking..."):
-        try:
-            response = st.session_state.chat_session.send_message(user_prompt)
-            # Display the AI's response
-            with st.chat_message("model", avatar="🌱"):
-                st.markdown(response.text)
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
\ No newline at end of file
+    # Triage locally first: trivial messages are answered from templates, and a distressed student
+    # sees the disclaimer at once, whatever the model later says.
+    with span("pebble.triage") as s:
+        last_reply = next((m["parts"] for m in transcript.latest(1) if m["role"] == "model"), "")
+        triaged = triage(user_prompt, last_reply)
+        s["fast_path"] = triaged["reply"] is not None
+        s["distressed"] = triaged["distressed"]
+    if triaged["reply"] is not None:
+        with st.chat_message("model", avatar="🌱"):
+            st.markdown(triaged["reply"])
+        context.add('user', user_prompt)
+        context.add('model', triaged["reply"])
+        transcript.append([{"role": "user", "parts": user_prompt}, {"role": "model", "parts": triaged["reply"]}])
+    else:
+        with st.chat_message("model", avatar="🌱"):
+            if triaged["distressed"]:
+                st.markdown(DISCLAIMER)
+            # Send the message to the Gemini model and get a response
+            with st.spinner("Pebble is thinking..."):
+                try:
+                    gateway = get_gateway()
+                    response = gateway.call(model.generate_content, context.request_contents(user_prompt),
+                                            request_options={"timeout": gateway.deadline})
+                    reply = add_disclaimer(response.text) if triaged["distressed"] else response.text
+                    # Display the AI's response
+                    st.markdown(strip_disclaimer(reply) if triaged["distressed"] else reply)
+                    record_turn_metrics(st.session_state, usage_metrics(getattr(response, "usage_metadata", None)))
+                    context.add('user', user_prompt)
+                    context.add('model', reply)
+                    transcript.append([{"role": "user", "parts": user_prompt}, {"role": "model", "parts": reply}])
+                    context.compact(lambda summary, turns: summarize_turns(model, summary, turns))
+                except Exception as e:
+                    st.error(f"An error occurred: {e}")
@@ -0,0 +1,209 @@
+import random
+import re
+
+# =================================================================================================
+# PEBBLE MESSAGE TRIAGE
+# =================================================================================================
+# Runs locally on every message to Pebble before any Gemini call, in well under a millisecond.
+# Messages that are nothing but a greeting, thanks, a goodbye or a bare acknowledgement are
+# answered from templates, with no model round-trip. Every other message is scored against a small
+# lexicon of distress signals, and a high-distress message always gets Pebble's disclaimer, shown
+# at once instead of relying on the model to follow its system prompt.
+
+DISCLAIMER = ("I'm here to listen, but I'm an AI. If you're feeling overwhelmed, please consider talking to a "
+              "trusted adult or a mental health professional. You are not alone.")
+DISTRESS_THRESHOLD = 3.0
+MAX_FAST_PATH_WORDS = 8
+
+# Phrases a trivial message may consist of, by intent. Longer phrases are matched first.
+PHRASES = {
+    "goodbye": ["bye", "bye bye", "goodbye", "good bye", "see you", "see ya", "see you later", "good night",
+                "gn", "talk later", "talk to you later", "ttyl", "take care", "cya"],
+    "thanks": ["thanks", "thank you", "thankyou", "thx", "ty", "tysm", "thanks a lot", "thank you so much",
+               "many thanks", "appreciate it", "i appreciate it", "that helps", "that helped", "that was helpful",
+               "very helpful", "this helps"],
+    "how_are_you": ["how are you", "how are u", "how r u", "how are you doing", "how is it going",
+                    "how's it going", "what's up", "whats up", "sup", "wassup"],
+    "greeting": ["hi", "hii", "hiii", "hello", "helo", "hey", "heya", "hiya", "yo", "howdy", "namaste",
+                 "good morning", "good afternoon", "good evening", "greetings"],
+    "ack": ["ok", "okay", "okk", "k", "kk", "cool", "got it", "alright", "all right", "nice", "great",
+            "sounds good", "i see", "makes sense", "that makes sense", "noted", "awesome", "perfect"],
+}
+FILLERS = {"pebble", "there", "so", "much", "very", "again", "buddy", "friend", "everyone", "oh", "and", "um",
+           "well", "lol", "haha", "a", "lot", "too", "you", "then"}
+# When a message mixes intents, the reply answers the one that matters most.
+INTENT_ORDER = ["goodbye", "thanks", "how_are_you", "greeting", "ack"]
+
+TEMPLATES = {
+    "goodbye": ["Take care of yourself! Come back whenever you want to talk. 🌱",
+                "Bye for now! Remember to take breaks and be kind to yourself. 🌱"],
+    "thanks": ["You're very welcome! I'm always here if you want to talk more. 🌱",
+               "Anytime! Is there anything else on your mind?"],
+    "how_are_you": ["I'm doing well, thanks for asking! How are you feeling about your studies today?",
+                    "All good here! What's on your mind today?"],
+    "greeting": ["Hi there! I'm Pebble. How are you feeling today?",
+                 "Hello! It's good to see you. What's on your mind today?"],
+    "ack": ["Okay! Is there anything else you'd like to talk about?",
+            "Got it. I'm here whenever you want to share more."],
+}
+
+# (pattern, weight) pairs; each pattern counts once per message. A single strong signal reaches
+# DISTRESS_THRESHOLD on its own, weaker ones only in combination.
+DISTRESS_SIGNALS = [
+    (r"\b(kill|hurt|harm|cut|cutting|killing|hurting|harming) myself\b", 3.0),
+    # Not when suicide is the topic of schoolwork or an event ("suicide prevention day", "an essay on suicide").
+    (r"\bsuicid\w*(?! (prevention|awareness) (day|week|month|campaign|event|program)\b)"
+     r"(?!.*\b(my|an|the|our) (essay|report|project|presentation|assignment)\b)", 3.0),
+    (r"\bself[- ]?harm\w*", 3.0),
+    (r"\b(end|ending) (it all|my (own )?life|everything)\b", 3.0),
+    (r"\btak(e|ing) my (own )?life\b", 3.0),
+    (r"\b(going to|gonna|want to|wanna|plan(ning)? to|ready to|about to) end it\b(?! (with|by|on|in|at|after|before)\b)", 3.0),
+    (r"\b(want|wanted|wanna|going) to die\b", 3.0),
+    (r"\bwish i (was|were) dead\b", 3.0),
+    (r"\b(wish i (wasn'?t|weren'?t|was not|were not) (alive|here|born)|never been born)\b", 3.0),
+    (r"\bbetter off (dead|without me)\b", 3.0),
+    (r"\b(would|'d) be (fine|ok|okay|better|happier) without me\b", 3.0),
+    (r"\b(i'?m|i am) (a|such a|just a) burden\b", 3.0),
+    (r"\b(feel|feeling|felt) like (i'?m |i am )?(a|such a|just a) burden\b", 3.0),
+    (r"\b(think|thinking|thought) (a lot |so much |constantly )?about (dying|death|being dead)\b", 3.0),
+    (r"\b(my )?life (has|had) no (purpose|meaning|point)\b", 3.0),
+    (r"\b(sleep|go to sleep) and never wake up\b|\bnever wake up again\b", 3.0),
+    (r"\b(better off|happier|notice|care|miss me) if i (was|were) (gone|dead|not here|not around)\b", 3.0),
+    (r"\bif i (died|disappeared|killed myself)\b", 3.0),
+    (r"\b(no|what'?s the|what is the) (reason|point) (to live|(in|of) (living|being alive|going on|anything))\b", 3.0),
+    (r"\b(keep|go on|carry on) living like this\b", 3.0),
+    (r"\btired of (being alive|life|existing|living)\b(?! (in|at|with|here|there)\b)", 3.0),
+    (r"\b(been|started|keep|still) cutting( again)?\b(?! (class|classes|school|back|down|out|corners|paper|it|the|my|some|a)\b)",
+     3.0),
+    (r"\b(not|isn'?t|never) worth living\b", 3.0),
+    (r"\blife('s| is)? ?(not|isn'?t) worth it\b", 3.0),
+    (r"\b(don'?t|do not) want to (live|be alive|be here(?! (at|for|on|in|all|until|during|today|tomorrow|this|next)\b)|exist|wake up)\b",
+     3.0),
+    (r"\b(can'?t|cannot|can not) (go on|take (it|this) any ?more|do this any ?more)\b", 3.0),
+    (r"\bpanic attacks?\b", 3.0),
+    (r"\b(being abused|abuses me|hits me|beats me)\b", 3.0),
+    (r"\bworthless\b", 3.0),
+    (r"\bhopeless\b", 2.0),
+    (r"\bhate (myself|my life)\b", 2.0),
+    (r"\b(depressed|depression)\b", 2.0),
+    (r"\b(can'?t|cannot|unable to) cope\b", 2.0),
+    (r"\b(can'?t stop|keep) crying\b", 2.0),
+    (r"\bcrying (every|all) (day|night)\b", 2.0),
+    (r"\b(falling apart|breaking down|numb)\b", 2.0),
+    (r"\b(empty|hollow) (inside|all the time|every ?day|most days)\b", 2.0),
+    (r"\b(want|wanna|wish i could) (to )?disappear\b", 2.0),
+    (r"\bnever (come|coming|wake|waking) (back|up)\b", 2.0),
+    (r"\b(no ?one|nobody) (cares|would care|would notice)\b", 2.0),
+    (r"\b(so|completely|totally|all) alone\b", 2.0),
+    (r"\bi'?m (a|such a|a complete) (failure|disappointment)\b", 2.0),
+    (r"\bwant (it|this|everything) to (be over|end|stop)\b", 2.0),
+    (r"\bhaven'?t (slept|eaten) (in|for) (days|a week|weeks)\b", 2.0),
+    (r"\b(life|everything|it all) (feels|is|seems) (pointless|meaningless)\b", 3.0),
+    (r"\b(don'?t|do not|can'?t|cannot) see (a|any) future\b", 3.0),
+    (r"\bdisappear(ing)? forever\b", 3.0),
+    (r"\b(giving|gave) away my (things|stuff|belongings)\b", 3.0),
+    (r"\bnothing (feels|is|seems) worth\b", 2.0),
+    (r"\b(no|(can'?t|cannot|don'?t) (see|find) (a|any)) way out\b"
+     r"(?! of (\w+ )?(homework|assignment|exam|test|class|detention|essay|project)\b)", 3.0),
+    (r"\b(nothing|none of (it|this)) (really )?matters\b", 2.0),
+    (r"\btrapped\b", 1.0),
+    (r"\boverwhelmed\b", 1.0),
+    (r"\b(anxious|anxiety)\b", 1.0),
+    (r"\b(terrified|scared)\b", 1.0),
+    (r"\b(exhausted|burn(ed|t)? out)\b", 1.0),
+    (r"\b(give|giving) up\b", 1.0),
+    (r"\b(can'?t|cannot) sleep\b", 1.0),
+    (r"\bstressed\b", 1.0),
+]
+# An intensifier right before (or after) a signal of weight INTENSIFIED_WEIGHT or more adds one point.
+INTENSIFIER = re.compile(r"\b(so|really|very|completely|totally|extremely|always)\s+$")
+TRAILING_INTENSIFIER = re.compile(r"\s+(so much|so bad(ly)?|every (single )?day|all the time)\b")
+INTENSIFIED_WEIGHT = 2.0
+NEGATION = re.compile(r"\b(not|never|no longer|don'?t|do not|isn'?t|am not|i'?m not)\s+(\w+\s+)?$")
+
+_distress_patterns = [(re.compile(pattern), weight) for pattern, weight in DISTRESS_SIGNALS]
+_phrase_intents = {tuple(p.split()): intent for intent, phrases in PHRASES.items() for p in phrases}
+_longest_phrase = max(len(p) for p in _phrase_intents)
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text.lower().replace("’", "'")).strip()
+
+
+def distress_score(text):
+    """
+    Sums the weights of the distress signals in `text`, ignoring directly negated ones
+    ("I'm not hopeless") and adding a point for intensified ones ("completely hopeless",
+    "hate my life so much").
+    """
+    text = normalize(text)
+    score = 0.0
+    for pattern, weight in _distress_patterns:
+        for match in pattern.finditer(text):
+            before = text[max(0, match.start() - 24):match.start()]
+            if not NEGATION.search(before):
+                intensified = INTENSIFIER.search(before) or TRAILING_INTENSIFIER.match(text, match.end())
+                score += weight + (1.0 if weight >= INTENSIFIED_WEIGHT and intensified else 0.0)
+                break
+    return score
+
+
+def is_distressed(text):
+    return distress_score(text) >= DISTRESS_THRESHOLD
+
+
+def trivial_intents(text):
+    """
+    Returns the intents (see PHRASES) if `text` is only greetings, thanks, goodbyes or
+    acknowledgements plus filler words and punctuation, else None.
+    """
+    words = re.sub(r"[^a-z' ]+", " ", normalize(text)).split()
+    if not words or len(words) > MAX_FAST_PATH_WORDS:
+        return None
+    intents = set()
+    i = 0
+    while i < len(words):
+        for size in range(min(_longest_phrase, len(words) - i), 0, -1):
+            intent = _phrase_intents.get(tuple(words[i:i + size]))
+            if intent:
+                intents.add(intent)
+                i += size
+                break
+        else:
+            if words[i] not in FILLERS:
+                return None
+            i += 1
+    return intents or None
+
+
+def triage(text, last_reply=""):
+    """
+    Classifies a message to Pebble. Returns {"reply": template answer or None, "intent": ...,
+    "distressed": bool, "score": float}. A reply is only given for non-distressed trivial messages;
+    a bare acknowledgement after Pebble asked a question still goes to the model, since it answers
+    that question.
+    """
+    score = distress_score(text)
+    result = {"reply": None, "intent": None, "distressed": score >= DISTRESS_THRESHOLD, "score": score}
+    if result["distressed"]:
+        return result
+    intents = trivial_intents(text)
+    if not intents:
+        return result
+    intent = next(i for i in INTENT_ORDER if i in intents)
+    if intent == "ack" and last_reply.rstrip().endswith("?"):
+        return result
+    result["intent"] = intent
+    result["reply"] = random.choice(TEMPLATES[intent])
+    return result
+
+
+def strip_disclaimer(reply):
+    """
+    Removes any copy of the disclaimer the model added itself, so it is shown only once.
+    """
+    return reply.replace(DISCLAIMER, "").strip()
+
+
+def add_disclaimer(reply):
+    return f"{DISCLAIMER}\n\n{strip_disclaimer(reply)}"
@@ -0,0 +1,172 @@
+import bisect
+import threading
+
+from storage import get_storage, key
+
+# =================================================================================================
+# STUDY PLAN STORE
+# =================================================================================================
+# Planner tasks are documents under plans/<username>/ in the shared storage backend. Every write
+# bumps the user's plan version, which pages use as a cache key for anything derived from the plan
+# (e.g. the dashboard charts); this process also keeps each user's tasks, sorted by date and start
+# time, for as long as the version is unchanged, so "today" and "this week" cost one version read
+# and a binary search for the first and last date. Writes made by this process are applied to that
+# copy in place; only a version moved by another process makes it scan the user's tasks again.
+# A task's Google Calendar sync status (see calendar_sync.py) is kept on the task itself, so every
+# replica shows it and it survives restarts; tasks whose sync is unfinished are also listed in a
+# shared outbox so a restarted process can pick them up again.
+
+PLANS = "plans"
+PLAN_VERSIONS = "plan_versions"
+CALENDAR_OUTBOX = "calendar_outbox"
+PRIORITIES = ["High", "Medium", "Low"]
+
+_plans_cache = {}  # username -> {"version", "tasks" sorted by date and start, "order" and "dates" to bisect, "by_id"}
+_cache_lock = threading.Lock()
+_update_lock = threading.Lock()  # Serializes the writes of this process, so they reach the cache in order.
+
+
+def _order(task):
+    return task["date"], task["start"], task["id"]
+
+
+def _build_cache(version, tasks):
+    tasks = sorted(tasks, key=_order)
+    return {"version": version, "tasks": tasks, "order": [_order(t) for t in tasks],
+            "dates": [t["date"] for t in tasks], "by_id": {t["id"]: t for t in tasks}}
+
+
+def _apply_change(cached, task_id, task):
+    """
+    Replaces (or with task=None, removes) one task in a cached plan, keeping it sorted.
+    """
+    old = cached["by_id"].pop(task_id, None)
+    if old is not None:
+        index = bisect.bisect_left(cached["order"], _order(old))
+        for items in (cached["tasks"], cached["order"], cached["dates"]):
+            del items[index]
+    if task is not None:
+        cached["by_id"][task_id] = task
+        index = bisect.bisect_left(cached["order"], _order(task))
+        cached["tasks"].insert(index, task)
+        cached["order"].insert(index, _order(task))
+        cached["dates"].insert(index, task["date"])
+
+
+def _bump_version(storage, username, task_id=None, task=None):
+    """
+    Bumps the user's plan version after a write. If the cached plan was current just before it, the
+    written task (None when deleted) is applied to it instead of dropping it; callers passing a task
+    hold _update_lock, so that the writes of this process reach the cache in the order they were made.
+    """
+    version = storage.incr(key(PLAN_VERSIONS, username))
+    with _cache_lock:
+        cached = _plans_cache.get(username)
+        if cached is None or task_id is None or cached["version"] != version - 1:
+            return  # Another process wrote in between; the next read scans the tasks again.
+        _apply_change(cached, task_id, task)
+        cached["version"] = version
+
+
+def add_task(username, task, storage=None):
+    storage = storage or get_storage()
+    task = {**task, "done": bool(task["done"])}
+    with _update_lock:
+        storage.put(key(PLANS, username, task["id"]), task)
+        _bump_version(storage, username, task["id"], task)
+
+
+def get_task(username, task_id, storage=None):
+    return (storage or get_storage()).get(key(PLANS, username, task_id))
+
+
+def _update_task(username, task_id, update, storage):
+    with _update_lock:
+        task = storage.get(key(PLANS, username, task_id))
+        if task is None:
+            return None
+        task = update(task)
+        storage.put(key(PLANS, username, task_id), task)
+        _bump_version(storage, username, task_id, task)
+    return task
+
+
+def set_task_done(username, task_id, done, storage=None):
+    _update_task(username, task_id, lambda task: {**task, "done": bool(done)}, storage or get_storage())
+
+
+def set_task_sync(username, task_id, unfinished, storage=None, **changes):
+    """
+    Merges `changes` (state, event_id, error, ...) into the task's "sync" record and lists the task
+    in the outbox while its sync is `unfinished`. Returns the updated task, or None if it is gone.
+    """
+    storage = storage or get_storage()
+    outbox_key = key(CALENDAR_OUTBOX, key(username, task_id))
+    task = _update_task(username, task_id, lambda t: {**t, "sync": {**(t.get("sync") or {}), **changes}}, storage)
+    if task is not None and unfinished:
+        storage.put(outbox_key, {"username": username, "task_id": task_id})
+    else:
+        storage.delete(outbox_key)
+    return task
+
+
+def unfinished_syncs(storage=None):
+    """
+    Returns [(username, task_id)] for every task whose Calendar sync has not finished.
+    """
+    return [(entry["username"], entry["task_id"]) for entry in (storage or get_storage()).scan(CALENDAR_OUTBOX).values()]
+
+
+def delete_task(username, task_id, storage=None):
+    storage = storage or get_storage()
+    with _update_lock:
+        storage.delete(key(PLANS, username, task_id))
+        storage.delete(key(CALENDAR_OUTBOX, key(username, task_id)))
+        _bump_version(storage, username, task_id, None)
+
+
+def get_plan_version(username, storage=None):
+    return (storage or get_storage()).get(key(PLAN_VERSIONS, username)) or 0
+
+
+def _plan(username, storage):
+    """
+    Returns the cached plan for `username`, scanning the tasks again if the version moved.
+    """
+    version = get_plan_version(username, storage)
+    with _cache_lock:
+        cached = _plans_cache.get(username)
+        if cached and cached["version"] == version:
+            return cached
+    cached = _build_cache(version, storage.scan(key(PLANS, username)).values())
+    with _cache_lock:
+        _plans_cache[username] = cached
+    return cached
+
+
+def tasks_between(username, first_date, last_date, storage=None):
+    """
+    Returns the user's tasks dated first_date..last_date (ISO strings, inclusive), in time order.
+    """
+    cached = _plan(username, storage or get_storage())
+    with _cache_lock:
+        start = bisect.bisect_left(cached["dates"], first_date)
+        stop = bisect.bisect_right(cached["dates"], last_date)
+        return [dict(t) for t in cached["tasks"][start:stop]]
+
+
+def tasks_for_date(username, date, storage=None):
+    return tasks_between(username, date, date, storage)
+
+
+def priority_counts(username, storage=None):
+    """
+    Returns {priority: {"done": n, "open": n}} for every priority.
+    """
+    counts = {priority: {"done": 0, "open": 0} for priority in PRIORITIES}
+    cached = _plan(username, storage or get_storage())
+    with _cache_lock:
+        tasks = list(cached["tasks"])
+    for task in tasks:
+        counts.setdefault(task["priority"], {"done": 0, "open": 0})["done" if task["done"] else "open"] += 1
+    return counts
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# =================================================================================================
+# RESPONSE CACHE
+# =================================================================================================
+# Answers are cached by the normalized prompt plus a hash of the last few turns before it, so the
+# same textbook question asked at the start of a chat is answered once and reused by everyone.
+# Entries live in SQLite so they survive restarts, expire after `ttl` seconds, and the least
+# recently used ones are evicted past `max_entries`. Identical requests that arrive while an answer
+# is being generated wait for that answer instead of calling Gemini again.
+
+RESPONSE_CACHE_DB = "response_cache.db"
+CONTEXT_TURNS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    response  TEXT NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL,
+    latency   REAL NOT NULL
+)
+"""
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip().lower().rstrip("?!. ")
+
+
+def cache_key(prompt, context, model_name=""):
+    """
+    Builds the cache key for `prompt` asked after the messages in `context`. Only the last
+    CONTEXT_TURNS messages are hashed, since older turns rarely change the answer.
+    """
+    recent = [(m["role"], m["parts"]) for m in context[-CONTEXT_TURNS:]]
+    digest = hashlib.sha256()
+    digest.update(model_name.encode())
+    digest.update(json.dumps(recent, ensure_ascii=False).encode())
+    digest.update(normalize_prompt(prompt).encode())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path=RESPONSE_CACHE_DB, max_entries=5000, ttl=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "saved_seconds": 0.0}
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created, latency FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created, latency = row
+            if now - created > self.ttl:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._stats["saved_seconds"] += latency
+        return response
+
+    def lookup(self, key, wait_timeout=120):
+        """
+        Returns the cached answer for `key`, waiting for an identical request that is already
+        being answered. Returns None when the caller should generate the answer itself; it must
+        then call `fulfil` or `abandon` with the same key.
+        """
+        while True:
+            response = self._get(key)
+            if response is not None:
+                with self._lock:
+                    self._stats["hits"] += 1
+                return response
+            with self._lock:
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    self._in_flight[key] = threading.Event()
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["coalesced"] += 1
+            if not flight.wait(wait_timeout):
+                with self._lock:
+                    self._stats["misses"] += 1
+                return None
+            # The leader finished (or gave up); loop to read its answer or take over.
+
+    def fulfil(self, key, response, latency):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO responses (key, response, created, last_used, latency) "
+                                   "VALUES (?, ?, ?, ?, ?)", (key, response, now, now, latency))
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._conn.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                                   "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        self._release(key)
+
+    def abandon(self, key):
+        self._release(key)
+
+    def _release(self, key):
+        with self._lock:
+            flight = self._in_flight.pop(key, None)
+        if flight is not None:
+            flight.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
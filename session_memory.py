@@ -0,0 +1,142 @@
+import threading
+import time
+import weakref
+
+from chat_store import (append_messages, create_transient_chat, delete_transient_chat, read_message_range, read_tail,
+                        sweep_transient_chats, touch_transient_chat)
+
+# =================================================================================================
+# BOUNDED SESSION MEMORY
+# =================================================================================================
+# A browser tab should not hold a whole conversation in server memory. A ChatWindow keeps only the
+# newest HOT_MESSAGES of a chat in memory; older messages stay in the chat store and are read back
+# only when the page asks for them (e.g. "Show earlier messages"). Every session's evictable state
+# is registered with its SessionMemory, and a session that has not rerun for IDLE_EVICT_SECONDS
+# drops it: windows forget their tail and live Gemini chats are closed, to be rebuilt from disk if
+# the student comes back. Once an hour the same sweep also deletes transient chat files left
+# behind by sessions of processes that have since died.
+
+HOT_MESSAGES = 40
+IDLE_EVICT_SECONDS = 15 * 60
+SWEEP_INTERVAL_SECONDS = 60
+TRANSIENT_SWEEP_INTERVAL_SECONDS = 60 * 60
+TOUCH_INTERVAL_SECONDS = 60
+
+_sessions = weakref.WeakSet()
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+_last_transient_sweep = 0.0
+
+
+class ChatWindow:
+    def __init__(self, username, chat_id, hot_messages=HOT_MESSAGES, transient=False):
+        """
+        A transient window's chat file is deleted once the window is garbage collected, i.e. when
+        the session that owns it ends, or by a later sweep if the process dies first.
+        """
+        self.username = username
+        self.chat_id = chat_id
+        self.hot_messages = hot_messages
+        self._tail = None   # newest messages; None until loaded or after eviction
+        self._total = 0
+        self._lock = threading.Lock()
+        self.transient = transient
+        self._touched = time.monotonic()
+        if transient:
+            create_transient_chat(username, chat_id)
+            weakref.finalize(self, delete_transient_chat, username, chat_id)
+
+    def _load(self):
+        # Must be called with _lock held.
+        if self._tail is None:
+            self._tail, self._total = read_tail(self.username, self.chat_id, self.hot_messages)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return self._total
+
+    def latest(self, count):
+        """
+        Returns the newest `count` messages, reading any beyond the hot tail from the chat store.
+        """
+        with self._lock:
+            self._load()
+            if count <= len(self._tail):
+                return self._tail[len(self._tail) - count:]
+            older_end = self._total - len(self._tail)
+            older = read_message_range(self.username, self.chat_id, max(0, self._total - count), older_end)
+            return older + self._tail
+
+    def append(self, messages):
+        with self._lock:
+            append_messages(self.username, self.chat_id, messages)
+            if self.transient and time.monotonic() - self._touched >= TOUCH_INTERVAL_SECONDS:
+                self._touched = time.monotonic()
+                touch_transient_chat(self.username, self.chat_id)
+            if self._tail is not None:
+                self._tail.extend(messages)
+                del self._tail[:-self.hot_messages]
+            self._total += len(messages)
+
+    def evict(self):
+        with self._lock:
+            self._tail = None
+
+
+class SessionMemory:
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self._windows = weakref.WeakSet()
+        self._caches = []
+
+    def track(self, window):
+        self._windows.add(window)
+        return window
+
+    def track_cache(self, cache):
+        """
+        Registers a dict (e.g. live Gemini chats) that is cleared when the session goes idle.
+        """
+        if all(c is not cache for c in self._caches):
+            self._caches.append(cache)
+        return cache
+
+    def evict(self):
+        for window in list(self._windows):
+            window.evict()
+        for cache in self._caches:
+            cache.clear()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+        global _last_sweep, _last_transient_sweep
+        if self.last_used - _last_sweep >= SWEEP_INTERVAL_SECONDS:
+            _last_sweep = self.last_used
+            evict_idle()
+        if self.last_used - _last_transient_sweep >= TRANSIENT_SWEEP_INTERVAL_SECONDS:
+            _last_transient_sweep = self.last_used
+            sweep_transient_chats()
+
+
+def get_session_memory(session_state):
+    memory = session_state.get("session_memory")
+    if memory is None:
+        memory = session_state["session_memory"] = SessionMemory()
+        memory.track_cache(session_state.setdefault("chat_sessions", {}))
+        _sessions.add(memory)
+    return memory
+
+
+def evict_idle(max_idle=IDLE_EVICT_SECONDS, now=None):
+    """
+    Evicts every session that has not been used for `max_idle` seconds. Returns how many were evicted.
+    """
+    now = time.monotonic() if now is None else now
+    evicted = 0
+    with _sweep_lock:
+        for memory in list(_sessions):
+            if now - memory.last_used >= max_idle:
+                memory.evict()
+                evicted += 1
+    return evicted
@@ -0,0 +1,721 @@
+import contextlib
+import json
+import os
+import select
+import socket
+import sqlite3
+import threading
+import urllib.parse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# =================================================================================================
+# SHARED STORAGE BACKENDS
+# =================================================================================================
+# Users, chats and plans are kept through one small storage interface, so several app processes
+# (or machines) can share them. Two kinds of data are stored:
+#   - documents: one JSON value per key ("users/alice"), with atomic create-if-absent and counters;
+#   - logs: append-only lists of JSON records addressed by position ("chats/alice/chat_1").
+# Keys are "/"-separated paths; build them with `key()` so user input cannot add separators.
+#
+# Backends (STORAGE_BACKEND):
+#   file    files under STORAGE_PATH (default "."), with OS file locks; several processes on one
+#           machine, or on a shared filesystem with working locks. Chats keep their usual layout.
+#   sqlite  one SQLite database at STORAGE_PATH (default "storage.db") in WAL mode; processes on
+#           one machine.
+#   redis   any Redis-protocol server at REDIS_URL (default redis://localhost:6379/0); replicas
+#           on any number of machines.
+# Derived, rebuildable data (search index, response cache) stays local to each process.
+
+DEFAULT_BACKEND = "file"
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def key(*parts):
+    """
+    Joins path segments into a storage key, escaping "/" and "%" inside each segment.
+    """
+    return "/".join(str(p).replace("%", "%25").replace("/", "%2F") for p in parts)
+
+
+def unescape(segment):
+    return segment.replace("%2F", "/").replace("%25", "%")
+
+
+def _split_directory(directory):
+    return directory.rstrip("/")
+
+
+class StorageBackend:
+    """
+    Interface implemented by every backend. Log positions count every record ever appended; a
+    record that cannot be read back (e.g. torn by a crash) is returned as None so positions stay
+    aligned.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, value):
+        raise NotImplementedError
+
+    def add(self, key, value):
+        """
+        Stores `value` only if `key` has no value yet. Returns True if it was stored.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key):
+        """
+        Atomically adds one to the integer at `key` (missing counts as 0) and returns the new value.
+        """
+        raise NotImplementedError
+
+    def scan(self, directory):
+        """
+        Returns {name: value} for the documents directly inside `directory` ("plans/alice"), with
+        names unescaped (the segment originally passed to `key`).
+        """
+        raise NotImplementedError
+
+    def append(self, log, records):
+        raise NotImplementedError
+
+    def read(self, log, start=0, stop=None):
+        raise NotImplementedError
+
+    def length(self, log):
+        raise NotImplementedError
+
+    def replace(self, log, records):
+        """
+        Atomically replaces the whole log.
+        """
+        raise NotImplementedError
+
+    def replace_head(self, log, count, records, head):
+        """
+        Atomically replaces the first `count` records of the log with `records`, keeping the records
+        after them, provided its first record still equals `head` (None for an empty log). Returns
+        whether it did. Compacts a log that other processes may be appending to at the same time.
+        """
+        raise NotImplementedError
+
+    def drop(self, log):
+        raise NotImplementedError
+
+    def logs(self, directory):
+        """
+        Returns the (unescaped) names of the logs directly inside `directory`.
+        """
+        raise NotImplementedError
+
+
+# =================================================================================================
+# LOCAL FILES
+# =================================================================================================
+@contextlib.contextmanager
+def _file_lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _fsync_write(path, payload):
+    with open(path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class FileBackend(StorageBackend):
+    """
+    Documents are <root>/<key>.json, written to a temporary file and renamed into place. Logs are
+    <root>/<log>.jsonl with one record per line; appends are a single locked write. Each process
+    remembers where it stopped reading a log, so reading what was appended since costs only the
+    new lines.
+    """
+
+    DOCUMENT_EXT = ".json"
+    LOG_EXT = ".jsonl"
+
+    def __init__(self, root="."):
+        self.root = root
+        self._positions = {}  # path -> (inode, position, byte offset) of the last complete line read
+        self._positions_lock = threading.Lock()
+
+    def _path(self, name, ext):
+        segments = [urllib.parse.quote(s, safe=" +,;=@~^&()[]{}!#$'") for s in name.split("/")]
+        segments = [s.replace(".", "%2E") if s in (".", "..") else s for s in segments]
+        return os.path.join(self.root, *segments) + ext
+
+    def _directory(self, directory):
+        return self._path(_split_directory(directory), "")
+
+    @staticmethod
+    def _write_new(path, payload):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _fsync_write(tmp_path, payload)
+        return tmp_path
+
+    def get(self, key):
+        try:
+            with open(self._path(key, self.DOCUMENT_EXT), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value):
+        path = self._path(key, self.DOCUMENT_EXT)
+        os.replace(self._write_new(path, json.dumps(value).encode("utf-8")), path)
+
+    def add(self, key, value):
+        path = self._path(key, self.DOCUMENT_EXT)
+        tmp_path = self._write_new(path, json.dumps(value).encode("utf-8"))
+        try:
+            os.link(tmp_path, path)  # Fails if the key exists, atomically.
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def delete(self, key):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key, self.DOCUMENT_EXT))
+
+    def incr(self, key):
+        path = self._path(key, self.DOCUMENT_EXT)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".lock", "a+b") as lock, _file_lock(lock):
+            value = (self.get(key) or 0) + 1
+            self.put(key, value)
+        return value
+
+    def scan(self, directory):
+        path = self._directory(directory)
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            return {}
+        documents = {}
+        for name in names:
+            if not name.endswith(self.DOCUMENT_EXT):
+                continue
+            try:
+                with open(os.path.join(path, name), "rb") as f:
+                    value = json.loads(f.read())
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # Deleted, or being replaced, while listing.
+            documents[unescape(urllib.parse.unquote(name[:-len(self.DOCUMENT_EXT)]))] = value
+        return documents
+
+    @contextlib.contextmanager
+    def _open_log_locked(self, path):
+        """
+        Opens the log for appending with an exclusive lock, reopening it if another process
+        replaced the file while this one waited for the lock.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        while True:
+            f = open(path, "ab+")
+            try:
+                with _file_lock(f):
+                    try:
+                        current = os.stat(path).st_ino
+                    except FileNotFoundError:
+                        current = None
+                    if current == os.fstat(f.fileno()).st_ino:
+                        yield f
+                        return
+            finally:
+                f.close()
+
+    def append(self, log, records):
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with self._open_log_locked(self._path(log, self.LOG_EXT)) as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    payload = b"\n" + payload  # Terminate a torn line so it cannot swallow these records.
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _line_ends_at(f, offset):
+        # Guards the remembered position against a replaced log that reused the old inode number.
+        if offset == 0:
+            return True
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+    def _lines(self, path, start, stop):
+        """
+        Returns the raw complete lines at positions start..stop-1 and the log length when stop is None.
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return [], 0
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            with self._positions_lock:
+                cached = self._positions.get(path)
+            position, offset = 0, 0
+            if cached and cached[0] == inode and cached[1] <= start and self._line_ends_at(f, cached[2]):
+                position, offset = cached[1], cached[2]
+            f.seek(offset)
+            lines = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn or in-progress tail.
+                if stop is not None and position >= stop:
+                    break
+                if line.strip():
+                    if position >= start:
+                        lines.append(line)
+                    position += 1
+                offset += len(line)
+            with self._positions_lock:
+                # Reading the head of a log must not make the next read of its tail start over.
+                if not cached or cached[0] != inode or position >= cached[1]:
+                    self._positions[path] = (inode, position, offset)
+            return lines, position
+
+    def read(self, log, start=0, stop=None):
+        records = []
+        for line in self._lines(self._path(log, self.LOG_EXT), start, stop)[0]:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                records.append(None)
+        return records
+
+    def length(self, log):
+        path = self._path(log, self.LOG_EXT)
+        with self._positions_lock:
+            cached = self._positions.get(path)
+        return self._lines(path, cached[1] if cached else 0, None)[1]
+
+    def replace(self, log, records):
+        path = self._path(log, self.LOG_EXT)
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with self._open_log_locked(path):
+            os.replace(self._write_new(path, payload), path)
+
+    def replace_head(self, log, count, records, head):
+        path = self._path(log, self.LOG_EXT)
+        with self._open_log_locked(path) as f:
+            f.seek(0)
+            lines = [line for line in f.read().splitlines(keepends=True) if line.strip()]
+            try:
+                first = json.loads(lines[0]) if lines else None
+            except json.JSONDecodeError:
+                first = None
+            if first != head:
+                return False
+            kept = [line if line.endswith(b"\n") else line + b"\n" for line in lines[count:]]
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+            os.replace(self._write_new(path, payload + b"".join(kept)), path)
+        return True
+
+    def drop(self, log):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(log, self.LOG_EXT))
+
+    def logs(self, directory):
+        try:
+            names = os.listdir(self._directory(directory))
+        except FileNotFoundError:
+            return []
+        return [unescape(urllib.parse.unquote(n[:-len(self.LOG_EXT)])) for n in names if n.endswith(self.LOG_EXT)]
+
+
+# =================================================================================================
+# SQLITE
+# =================================================================================================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    directory TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    PRIMARY KEY (directory, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS log_records (
+    log      TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value    TEXT NOT NULL,
+    PRIMARY KEY (log, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS logs (
+    directory TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    length    INTEGER NOT NULL,
+    PRIMARY KEY (directory, name)
+) WITHOUT ROWID;
+"""
+
+
+def _split_key(key):
+    directory, _, name = key.rpartition("/")
+    return directory, name
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path="storage.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextlib.contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value FROM documents WHERE directory = ? AND name = ?",
+                                         _split_key(key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        self._connection().execute("INSERT OR REPLACE INTO documents (directory, name, value) VALUES (?, ?, ?)",
+                                   (*_split_key(key), json.dumps(value)))
+
+    def add(self, key, value):
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO documents (directory, name, value) VALUES (?, ?, ?)",
+            (*_split_key(key), json.dumps(value)))
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM documents WHERE directory = ? AND name = ?", _split_key(key))
+
+    def incr(self, key):
+        row = self._connection().execute(
+            "INSERT INTO documents (directory, name, value) VALUES (?, ?, '1') "
+            "ON CONFLICT (directory, name) DO UPDATE SET value = CAST(value AS INTEGER) + 1 RETURNING value",
+            _split_key(key)).fetchone()
+        return int(row[0])
+
+    def scan(self, directory):
+        rows = self._connection().execute("SELECT name, value FROM documents WHERE directory = ?",
+                                          (_split_directory(directory),)).fetchall()
+        return {unescape(name): json.loads(value) for name, value in rows}
+
+    def _length(self, conn, log):
+        row = conn.execute("SELECT length FROM logs WHERE directory = ? AND name = ?", _split_key(log)).fetchone()
+        return row[0] if row else 0
+
+    def _insert(self, conn, log, start, records):
+        conn.executemany("INSERT INTO log_records (log, position, value) VALUES (?, ?, ?)",
+                         [(log, start + i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(records)])
+        conn.execute("INSERT OR REPLACE INTO logs (directory, name, length) VALUES (?, ?, ?)",
+                     (*_split_key(log), start + len(records)))
+
+    def append(self, log, records):
+        with self._write() as conn:
+            self._insert(conn, log, self._length(conn, log), records)
+
+    def read(self, log, start=0, stop=None):
+        rows = self._connection().execute(
+            "SELECT value FROM log_records WHERE log = ? AND position >= ? AND position < ? ORDER BY position",
+            (log, start, stop if stop is not None else 2 ** 62)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def length(self, log):
+        return self._length(self._connection(), log)
+
+    def replace(self, log, records):
+        with self._write() as conn:
+            conn.execute("DELETE FROM log_records WHERE log = ?", (log,))
+            self._insert(conn, log, 0, records)
+
+    def replace_head(self, log, count, records, head):
+        with self._write() as conn:
+            row = conn.execute("SELECT value FROM log_records WHERE log = ? AND position = 0", (log,)).fetchone()
+            if (json.loads(row[0]) if row else None) != head:
+                return False
+            kept = [json.loads(value) for (value,) in conn.execute(
+                "SELECT value FROM log_records WHERE log = ? AND position >= ? ORDER BY position", (log, count))]
+            conn.execute("DELETE FROM log_records WHERE log = ?", (log,))
+            self._insert(conn, log, 0, list(records) + kept)
+        return True
+
+    def drop(self, log):
+        with self._write() as conn:
+            conn.execute("DELETE FROM log_records WHERE log = ?", (log,))
+            conn.execute("DELETE FROM logs WHERE directory = ? AND name = ?", _split_key(log))
+
+    def logs(self, directory):
+        rows = self._connection().execute("SELECT name FROM logs WHERE directory = ?",
+                                          (_split_directory(directory),)).fetchall()
+        return [unescape(row[0]) for row in rows]
+
+
+# =================================================================================================
+# REDIS PROTOCOL
+# =================================================================================================
+class RedisError(Exception):
+    pass
+
+
+class _RespConnection:
+    """
+    Minimal RESP2 client: sends commands (pipelined when several are given) and parses replies.
+    """
+
+    def __init__(self, host, port, db, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if db:
+            self.execute([("SELECT", db)])
+
+    @staticmethod
+    def _encode(command):
+        parts = [str(arg).encode("utf-8") if not isinstance(arg, bytes) else arg for arg in command]
+        return b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in parts)
+
+    def _reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the storage server.")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = self.reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._reply() for _ in range(size)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def send(self, commands):
+        self.sock.sendall(b"".join(self._encode(c) for c in commands))
+
+    def receive(self, count):
+        replies = [self._reply() for _ in range(count)]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def execute(self, commands):
+        self.send(commands)
+        return self.receive(len(commands))
+
+    def closed_by_server(self):
+        # An idle connection has nothing to read unless the server closed it (or it is out of step).
+        return bool(select.select([self.sock], [], [], 0)[0])
+
+    def close(self):
+        self.sock.close()
+
+
+class RedisBackend(StorageBackend):
+    """
+    Documents in a directory are fields of one hash ("doc:<directory>"), so listing a directory is
+    a single HGETALL. Logs are lists ("log:<name>"), and each directory's log names are a set.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", timeout=10):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.closed_by_server():
+            self._reset()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = _RespConnection(self.host, self.port, self.db, self.timeout)
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _execute(self, *commands, idempotent=False):
+        """
+        Runs `commands` on this thread's connection. If the connection fails before they are sent
+        they are tried once more on a new one. If it fails while waiting for the replies they may
+        already have been applied, so they are only sent again when `idempotent`: a repeated
+        RPUSH, HINCRBY or HSETNX would append twice, count twice or report its own write as taken.
+        """
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(commands)
+            except OSError:
+                self._reset()
+                if attempt:
+                    raise
+                continue
+            try:
+                return conn.receive(len(commands))
+            except OSError:
+                self._reset()
+                if attempt or not idempotent:
+                    raise
+
+    @staticmethod
+    def _doc(key):
+        directory, name = _split_key(key)
+        return "doc:" + directory, name
+
+    def get(self, key):
+        value = self._execute(("HGET", *self._doc(key)), idempotent=True)[0]
+        return json.loads(value) if value is not None else None
+
+    def put(self, key, value):
+        self._execute(("HSET", *self._doc(key), json.dumps(value)), idempotent=True)
+
+    def add(self, key, value):
+        return self._execute(("HSETNX", *self._doc(key), json.dumps(value)))[0] == 1
+
+    def delete(self, key):
+        self._execute(("HDEL", *self._doc(key)), idempotent=True)
+
+    def incr(self, key):
+        return self._execute(("HINCRBY", *self._doc(key), 1))[0]
+
+    def scan(self, directory):
+        flat = self._execute(("HGETALL", "doc:" + _split_directory(directory)), idempotent=True)[0]
+        return {unescape(flat[i].decode()): json.loads(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def _log_commands(self, log, records):
+        directory, name = _split_key(log)
+        commands = [("SADD", "logs:" + directory, name)]
+        if records:
+            commands.insert(0, ("RPUSH", "log:" + log, *(json.dumps(r, ensure_ascii=False) for r in records)))
+        return commands
+
+    def append(self, log, records):
+        self._execute(("MULTI",), *self._log_commands(log, records), ("EXEC",))
+
+    def read(self, log, start=0, stop=None):
+        if stop is not None and stop <= start:
+            return []
+        values = self._execute(("LRANGE", "log:" + log, start, -1 if stop is None else stop - 1), idempotent=True)[0]
+        return [json.loads(v) for v in values]
+
+    def length(self, log):
+        return self._execute(("LLEN", "log:" + log), idempotent=True)[0]
+
+    def replace(self, log, records):
+        self._execute(("MULTI",), ("DEL", "log:" + log), *self._log_commands(log, records), ("EXEC",), idempotent=True)
+
+    def replace_head(self, log, count, records, head):
+        # WATCH belongs to the connection, so both steps run on the same one, and neither is retried:
+        # the transaction is simply abandoned (and the next compaction tries again).
+        directory, name = _split_key(log)
+        conn = self._connection()
+        try:
+            first = conn.execute([("WATCH", "log:" + log), ("LINDEX", "log:" + log, 0)])[1]
+            if (json.loads(first) if first is not None else None) != head:
+                conn.execute([("UNWATCH",)])
+                return False
+            commands = [("MULTI",), ("LTRIM", "log:" + log, count, -1)]
+            if records:
+                commands.append(("LPUSH", "log:" + log, *(json.dumps(r, ensure_ascii=False) for r in reversed(records))))
+            commands += [("SADD", "logs:" + directory, name), ("EXEC",)]
+            return conn.execute(commands)[-1] is not None  # EXEC answers nil if the log changed meanwhile.
+        except Exception:
+            self._reset()  # Never leave a WATCH behind on a connection other calls will reuse.
+            raise
+
+    def drop(self, log):
+        directory, name = _split_key(log)
+        self._execute(("MULTI",), ("DEL", "log:" + log), ("SREM", "logs:" + directory, name), ("EXEC",),
+                      idempotent=True)
+
+    def logs(self, directory):
+        return [unescape(n.decode()) for n in self._execute(("SMEMBERS", "logs:" + _split_directory(directory)),
+                                                             idempotent=True)[0]]
+
+
+# =================================================================================================
+def create_storage(backend=None, path=None, url=None):
+    """
+    Builds a backend; arguments left as None are read from STORAGE_BACKEND, STORAGE_PATH and REDIS_URL.
+    """
+    backend = backend or os.environ.get("STORAGE_BACKEND", DEFAULT_BACKEND)
+    path = path or os.environ.get("STORAGE_PATH")
+    if backend == "file":
+        return FileBackend(path or ".")
+    if backend == "sqlite":
+        return SQLiteBackend(path or "storage.db")
+    if backend == "redis":
+        return RedisBackend(url or os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown storage backend {backend!r}; expected file, sqlite or redis.")
+
+
+def get_storage():
+    """
+    Returns the process-wide storage backend configured from the environment.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage()
+        return _storage
+
+
+def set_storage(storage):
+    """
+    Replaces the process-wide backend (benchmarks and tools).
+    """
+    global _storage
+    with _storage_lock:
+        _storage = storage
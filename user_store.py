@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+from instrumentation import instrumented
+from storage import get_storage, key
+
+# =================================================================================================
+# USER STORE
+# =================================================================================================
+# Accounts are documents keyed by username in the shared storage backend (see storage.py), so a
+# login is a single lookup and concurrent sign-ups of the same name are settled atomically by
+# the backend, whichever app process they arrive at.
+
+USERS = "users"
+LEGACY_USERS_FILE = "users.json"
+
+
+@instrumented("user.lookup")
+def get_user(username, storage=None):
+    return (storage or get_storage()).get(key(USERS, username))
+
+
+@instrumented("user.create")
+def create_user(username, password_hash, mobile_number, storage=None):
+    """
+    Stores a new account. Returns False if the username is already taken.
+    """
+    record = {"username": username, "password_hash": password_hash, "mobile_number": mobile_number,
+              "created": time.time()}
+    return (storage or get_storage()).add(key(USERS, username), record)
+
+
+def _import_users(users, storage):
+    # Existing usernames are kept.
+    return sum(create_user(name, info["password_hash"], info.get("mobile_number"), storage)
+               for name, info in users.items())
+
+
+def migrate_from_json(json_path=LEGACY_USERS_FILE, storage=None):
+    """
+    Copies accounts from the old users.json into storage and renames the file to
+    users.json.migrated so the import runs only once. Returns the number of accounts imported.
+    """
+    try:
+        with open(json_path, "r") as f:
+            users = json.load(f)
+    except FileNotFoundError:
+        return 0
+    imported = _import_users(users, storage or get_storage())
+    os.replace(json_path, json_path + ".migrated")
+    return imported